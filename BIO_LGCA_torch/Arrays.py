@@ -0,0 +1,112 @@
+"""
+The few array operations of the automata and of the vectorized models, on torch tensors or on np.ndarray (numpy
+backend of ExecutionPolicy): the namespace is chosen from the type of the array, so that the same code runs on both,
+with the same results. The dtypes are given by name ("int8", "float32", ...). torch is optional.
+"""
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # only np.ndarray
+    torch = None
+
+
+def is_numpy(x):
+    return torch is None or isinstance(x, np.ndarray)
+
+
+def zeros(shape, dtype, numpy=False):
+    """
+    @param numpy: (bool) if True (or without torch), a np.ndarray, else a cpu tensor
+    """
+    if numpy or torch is None:
+        return np.zeros(shape, dtype=dtype)
+    return torch.zeros(shape, dtype=getattr(torch, dtype))
+
+
+def arange(n, numpy=False, device=None):
+    if numpy or torch is None:
+        return np.arange(n)
+    return torch.arange(n, device=device)
+
+
+def empty_like(x):
+    return np.empty_like(x) if is_numpy(x) else torch.empty_like(x)
+
+
+def cast(x, dtype):
+    return x.astype(dtype) if is_numpy(x) else x.to(getattr(torch, dtype))
+
+
+def stack(arrays, dim):
+    return np.stack(arrays, axis=dim) if is_numpy(arrays[0]) else torch.stack(arrays, dim=dim)
+
+
+def where(condition, x, y):
+    return np.where(condition, x, y) if is_numpy(condition) else torch.where(condition, x, y)
+
+
+def amin(x, dim):
+    return x.min(axis=dim) if is_numpy(x) else torch.min(x, dim=dim).values
+
+
+def amax(x, dim):
+    return x.max(axis=dim) if is_numpy(x) else torch.max(x, dim=dim).values
+
+
+def roll(x, shift, dim):
+    return np.roll(x, shift, axis=dim) if is_numpy(x) else x.roll(shift, dims=dim)
+
+
+def clone(x):
+    return x.copy() if is_numpy(x) else x.clone()
+
+
+def to_numpy(x):
+    """
+    @return: (np.ndarray) the array on the host, x itself if it already is one
+    """
+    return x if is_numpy(x) else x.cpu().numpy()
+
+
+def device(x):
+    # "numpy" for a np.ndarray, so that it never equals the device of a tensor
+    return "numpy" if is_numpy(x) else x.device
+
+
+def any(x, dim):
+    return x.any(axis=dim) if is_numpy(x) else x.any(dim=dim)
+
+
+def pad(x, after):
+    """
+    @param after: (tuple) number of zeros added at the end of each dimension
+    """
+    if is_numpy(x):
+        return np.pad(x, [(0, n) for n in after])
+    return torch.nn.functional.pad(x, [p for n in reversed(after) for p in (0, n)])
+
+
+def cummin(x, dim):
+    return np.minimum.accumulate(x, axis=dim) if is_numpy(x) else torch.cummin(x, dim=dim).values
+
+
+def flip(x, dim):
+    return np.flip(x, axis=dim) if is_numpy(x) else x.flip(dim)
+
+
+def minimum(x, y):
+    return np.minimum(x, y) if is_numpy(x) else torch.minimum(x, y)
+
+
+def cat(arrays, dim):
+    return np.concatenate(arrays, axis=dim) if is_numpy(arrays[0]) else torch.cat(arrays, dim=dim)
+
+
+def movedim(x, source, destination):
+    return np.moveaxis(x, source, destination) if is_numpy(x) else x.movedim(source, destination)
+
+
+def flatnonzero(x):
+    # indices of the non zero elements of the flattened array
+    return np.flatnonzero(x) if is_numpy(x) else x.reshape(-1).nonzero().view(-1)
@@ -1,7 +1,16 @@
+import copy
 import numpy as np
-import torch
 import time
 
+try:
+    import torch
+except ImportError:  # only the numpy backend of BioLgcaSquaredAuto is available
+    torch = None
+
+import Arrays
+from ExecutionPolicy import ExecutionPolicy
+from Profiler import Profiler
+
 class Automaton:
     """
         Class that internalizes the rules and evolution of 
@@ -38,34 +47,205 @@ class Automaton:
         # We convert the float [0.,1.] worldmap to uint [[0,255]]
         return (255 * self._worldmap).astype(dtype=np.uint8)
 
+    def worldmap_region(self, rect):
+        # Same as worldmap, only on the region of a pygame.Rect (x along the width, y along the height)
+        return (255 * self._worldmap[rect.left:rect.right, rect.top:rect.bottom]).astype(dtype=np.uint8)
+
+    def draw_rects(self, world, rects):
+        """
+        Redraws only the regions of the worldmap in rects (pygame.Rect in frame coordinates, see DirtyRects): only
+        their cells are transferred to the host and given to the draw function, which is cellwise, each cell being
+        drawn in a fixed block of pixels
+        """
+        sx, sy = self._worldmap.shape[0] // world.shape[0], self._worldmap.shape[1] // world.shape[1]
+        for rect in rects:
+            x0, y0 = rect.left // sx, rect.top // sy
+            x1, y1 = -(-rect.right // sx), -(-rect.bottom // sy)
+            with self.profiler.phase("transfer"):
+                region = Arrays.to_numpy(world[x0:x1, y0:y1])
+            with self.profiler.phase("draw_function"):
+                pixels = self.draw_function(region)
+            w, h = min(pixels.shape[0], self._worldmap.shape[0] - x0 * sx), min(pixels.shape[1], self._worldmap.shape[1] - y0 * sy)
+            self._worldmap[x0 * sx:x0 * sx + w, y0 * sy:y0 * sy + h] = pixels[:w, :h]
+
 
 class BioLgcaSquaredAuto(Automaton):
-    def __init__(self, size, init_world, interaction_function, draw_function, device=None):
+    # (dx, dy) shift of each communication channel during one transport
+    SHIFTS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+
+    def __init__(self, size, init_world, interaction_function, draw_function, device=None, policy=None):
         """
             BIO LGCA on GPU, with a square grid.
 
             @param size: (W,H) for the drawing function
             @param init_world: (torch.IntTensor: WidthxHeighx(R+4)) initial state of the world, R = size of the rest channel
             @param interaction_function: torch.IntTensor -> torch.IntTensor. Must only use native torch function for better performances
+            @param device: (torch.device) shortcut for ExecutionPolicy(device=device), when no policy is given
+            @param policy: (ExecutionPolicy) device, dtype, threads and backend, the interaction function being compiled
+                           with the "compile" backend. With the numpy backend, the world is a np.ndarray, and the
+                           interaction function must support it (Model.numpy_compatible)
         """
         super().__init__(size)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu") if device is None else device
-        print(f"Running on {'GPU' if torch.cuda.is_available() else 'CPU'}")
+        self.policy = ExecutionPolicy(device=device) if policy is None else policy
+        self.policy.apply()
+        self.device = self.policy.device
 
-        self.interaction = interaction_function
+        self.interaction = self.policy.compile(interaction_function)
         self.draw_function = draw_function
-        self.world = init_world.to(self.device)
+        self.world = self.policy.prepare(init_world)
+
+        # replaced by an enabled Profiler to measure the phases of the step
+        self.profiler = Profiler(enabled=False)
+        # number of steps done, and optional CycleDetector updated after each step
+        self.steps = 0
+        self.cycle_detector = None
 
     def transport(self):
-        self.world[:, :, 0] = self.world[:, :, 0].roll(-1, dims=0)
-        self.world[:, :, 1] = self.world[:, :, 1].roll(-1, dims=1)
-        self.world[:, :, 2] = self.world[:, :, 2].roll(1, dims=0)
-        self.world[:, :, 3] = self.world[:, :, 3].roll(1, dims=1)
+        # no lazy transport as in LGCAAuto: the interaction reads every site at each step, the shift could only be deferred
+        self.world[:, :, 0] = Arrays.roll(self.world[:, :, 0], -1, 0)
+        self.world[:, :, 1] = Arrays.roll(self.world[:, :, 1], -1, 1)
+        self.world[:, :, 2] = Arrays.roll(self.world[:, :, 2], 1, 0)
+        self.world[:, :, 3] = Arrays.roll(self.world[:, :, 3], 1, 1)
 
     def step(self):
-        self.world = self.interaction(self.world)
-        self.transport()
+        with self.profiler.phase("interaction"):
+            self.world = self.interaction(self.world)
+        with self.profiler.phase("transport"):
+            self.transport()
+        self.steps += 1
 
-    def draw(self):
-        self._worldmap = self.draw_function(self.world.cpu().numpy())
+        if self.cycle_detector is not None:
+            with self.profiler.phase("cycle_detector"):
+                self.cycle_detector.update(self)
+
+    def draw(self, rects=None):
+        """
+        @param rects: (list of pygame.Rect) regions of the frame that changed (see DirtyRects), None to draw it all
+        """
+        if rects is not None:
+            self.draw_rects(self.world, rects)
+            return
+        with self.profiler.phase("transfer"):
+            world = self.world if self.policy.numpy else self.world.cpu().numpy()
+        with self.profiler.phase("draw_function"):
+            self._worldmap = self.draw_function(world)
+        return
+
+
+class SparseBioLgcaAuto(Automaton):
+    # (dx, dy) shift of each communication channel during one transport
+    SHIFTS = BioLgcaSquaredAuto.SHIFTS
+
+    def __init__(self, size, init_world, interaction_function, draw_function, locate=None, tiles=None, policy=None):
+        """
+            BIO LGCA for worlds that are mostly air, with a square grid. Only the occupied sites (a site is occupied if
+            one of its channels is not 0: lattices and signals in flight) are kept, as a list of coordinates and a list
+            of values, sorted by flat index x*H+y. The interaction is evaluated on them only, and the transport moves
+            each signal to the key of its new site, the values of the same site being merged through the unique keys
+            (a sort-based spatial hash). A step costs O(occupied sites) instead of O(W*H).
+
+            The interaction function must leave the air (all the channels at 0) unchanged, which is checked on a copy
+            of it, and be local to each site. It is given a (Nx1xC) world of the occupied sites.
+
+            @param size: (W,H) of the world
+            @param init_world: (torch.Tensor: WidthxHeighx(R+4)) initial state of the world, R = size of the rest channel
+            @param locate: function(x, y) receiving the global coordinates (Nx1 tensors) of the sites given to the
+                           interaction function before each call, for the random numbers of the models (model.locate)
+            @param tiles: (w,h) if given, the world is a mosaic of independent tori of this size, whose signals wrap
+                          around their own borders (batched runs, see search.py)
+            @param policy: (ExecutionPolicy) device, dtype, threads and backend
+        """
+        super().__init__(size)
+        self.policy = ExecutionPolicy() if policy is None else policy
+        if self.policy.numpy:
+            raise ValueError("SparseBioLgcaAuto has no numpy backend")
+        self.policy.apply()
+        self.device = self.policy.device
+
+        self.interaction = self.policy.compile(interaction_function)
+        self.draw_function = draw_function
+        self.locate = locate
+        self.tiles = tiles
+        self.world = self.policy.prepare(init_world)
+
+        air = torch.zeros((1, 1, self.values.shape[1]), dtype=self.values.dtype, device=self.device)
+        if copy.deepcopy(interaction_function)(air.clone()).ne(air).any():
+            raise ValueError("The interaction function changes the air, the world can not be sparse")
+
+        # replaced by an enabled Profiler to measure the phases of the step
+        self.profiler = Profiler(enabled=False)
+        # number of steps done, and optional CycleDetector updated after each step
+        self.steps = 0
+        self.cycle_detector = None
+
+    @property
+    def world(self):
+        """
+        Dense (WxHxC) world, built on demand (for drawing and the analyses)
+        """
+        world = torch.zeros(self.shape, dtype=self.values.dtype, device=self.device)
+        world[self.x, self.y] = self.values
+        return world
+
+    @world.setter
+    def world(self, world):
+        # shape of the dense world, which can differ from the size of the drawing (Weird_LGCA)
+        self.shape = tuple(world.shape)
+        self.x, self.y = world.ne(0).any(dim=-1).nonzero(as_tuple=True)
+        self.values = world[self.x, self.y]
+
+    def interact(self):
+        if self.locate is not None:
+            self.locate(self.x.view(-1, 1), self.y.view(-1, 1))
+        self.values = self.interaction(self.values.unsqueeze(1)).squeeze(1)
+
+    def transport(self):
+        """
+        The rest channels stay on their site, and each communication channel moves to the neighbouring site
+        """
+        H = self.shape[1]
+        w, h = self.shape[:2] if self.tiles is None else self.tiles
+        keys, sources = [], []
+        rest = self.values[:, len(self.SHIFTS):].ne(0).any(dim=1)
+        keys.append(self.x[rest] * H + self.y[rest])
+        sources.append(rest.nonzero(as_tuple=True)[0])
+        for c, (dx, dy) in enumerate(self.SHIFTS):
+            moving = self.values[:, c] != 0
+            x, y = self.x[moving], self.y[moving]
+            # the signals wrap around the borders of their tile (the whole world without tiles)
+            keys.append((x - x % w + (x + dx) % w) * H + y - y % h + (y + dy) % h)
+            sources.append(moving.nonzero(as_tuple=True)[0])
+
+        unique_keys, sites = torch.unique(torch.cat(keys), return_inverse=True)
+        values = torch.zeros((len(unique_keys), self.values.shape[1]), dtype=self.values.dtype, device=self.device)
+        sites = sites.split([len(source) for source in sources])
+        values[sites[0], len(self.SHIFTS):] = self.values[sources[0], len(self.SHIFTS):]
+        for c in range(len(self.SHIFTS)):
+            values[sites[c + 1], c] = self.values[sources[c + 1], c]
+
+        self.x, self.y, self.values = unique_keys // H, unique_keys % H, values
+
+    def step(self):
+        with self.profiler.phase("interaction"):
+            self.interact()
+        with self.profiler.phase("transport"):
+            self.transport()
+        self.steps += 1
+
+        if self.cycle_detector is not None:
+            with self.profiler.phase("cycle_detector"):
+                self.cycle_detector.update(self)
+
+    def draw(self, rects=None):
+        """
+        @param rects: (list of pygame.Rect) regions of the frame that changed (see DirtyRects), None to draw it all
+        """
+        if rects is not None:
+            self.draw_rects(self.world, rects)
+            return
+        with self.profiler.phase("transfer"):
+            world = self.world.cpu().numpy()
+        with self.profiler.phase("draw_function"):
+            self._worldmap = self.draw_function(world)
         return
+
@@ -0,0 +1,86 @@
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # the random numbers are then np.ndarray
+    torch = None
+
+MASK = 0xFFFFFFFF
+
+
+def mix32(x):
+    """
+    Bijective mixing of 32 bits integers (lowbias32 of C. Wellons), on python ints, int64 tensors or int64 arrays.
+    The values are kept in [0, 2^32) in int64: the overflows of the products only affect the bits above 32.
+    """
+    x = x & MASK
+    x = x ^ (x >> 16)
+    x = (x * 0x7FEB352D) & MASK
+    x = x ^ (x >> 15)
+    x = (x * 0x846CA68B) & MASK
+    return x ^ (x >> 16)
+
+
+class CellRandom:
+    """
+        Counter-based random numbers for the stochastic rules: the numbers of a cell are a hash of
+        (seed, step, x, y, stream), computed in bulk for all the cells at once. They do not depend on the order
+        in which the cells are processed, nor on how the world is split (tiles, batches, processes, sparse sites),
+        as long as the global coordinates of the cells are given. They are np.ndarray when the coordinates are (see
+        grid), with the same values as the tensors.
+
+        step identifies the interaction (-1 by convention for the initialization), stream distinguishes the
+        different random numbers needed by a cell at the same step. For random draws that are not attached to a
+        cell (positions of the initial lattices, ...), x is the index of the draw and y is 0.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def __repr__(self):
+        return f"CellRandom({self.seed})"
+
+    def bits(self, step, x, y, stream=0):
+        """
+        @return: (torch.LongTensor) random integers in [0, 2^32), with the broadcasted shape of x and y
+        """
+        key = mix32(mix32(mix32(self.seed) ^ (step & MASK)) ^ (stream & MASK))
+        if torch is None or isinstance(x, np.ndarray):
+            return mix32(mix32(np.asarray(x, dtype=np.int64) ^ key) ^ np.asarray(y, dtype=np.int64))
+        return mix32(mix32(torch.as_tensor(x, dtype=torch.int64) ^ key) ^ torch.as_tensor(y, dtype=torch.int64))
+
+    def uniform(self, step, x, y, stream=0):
+        """
+        @return: (torch.FloatTensor) random floats in [0, 1)
+        """
+        bits = self.bits(step, x, y, stream) >> 8
+        if isinstance(bits, np.ndarray):
+            return bits.astype(np.float32) / 2**24
+        return bits.to(torch.float32) / 2**24
+
+    def bernoulli(self, p, step, x, y, stream=0):
+        """
+        @return: (torch.BoolTensor) True with probability p
+        """
+        return self.bits(step, x, y, stream) < int(p * 2**32)
+
+    def randint(self, low, high, step, x, y, stream=0):
+        """
+        @return: (torch.LongTensor) random integers in [low, high)
+        """
+        return low + ((self.bits(step, x, y, stream) * (high - low)) >> 32)
+
+    @staticmethod
+    def grid(shape, device=None, origin=(0, 0), numpy=False):
+        """
+        Coordinates of the cells of a world of shape (W,H), whose cell (0,0) is at origin in the global world
+        @param numpy: (bool) if True (or without torch), the coordinates are np.ndarray
+        @return: x (Wx1) and y (1xH) tensors, to give to the random functions
+        """
+        if numpy or torch is None:
+            x = np.arange(origin[0], origin[0] + shape[0]).reshape(-1, 1)
+            y = np.arange(origin[1], origin[1] + shape[1]).reshape(1, -1)
+            return x, y
+        x = torch.arange(origin[0], origin[0] + shape[0], device=device).view(-1, 1)
+        y = torch.arange(origin[1], origin[1] + shape[1], device=device).view(1, -1)
+        return x, y
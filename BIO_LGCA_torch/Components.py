@@ -0,0 +1,130 @@
+import csv
+import math
+
+import torch
+
+# (dx, dy) of the neighbours of a cell, for 4 and 8 connectivity
+NEIGHBOURS = {4: ((1, 0), (-1, 0), (0, 1), (0, -1))}
+NEIGHBOURS[8] = NEIGHBOURS[4] + ((1, 1), (1, -1), (-1, 1), (-1, -1))
+COLUMNS = ("component", "size", "x", "y", "x0", "y0", "width", "height")
+
+
+class Components:
+    """
+        Connected components of the cells of the world that satisfy a predicate (organisms, aggregates, objects),
+        labelled on the device of the automaton every k steps. Only their table (size, centroid and bounding box of
+        each component) is transferred to the host, kept in self.table and appended to a CSV file.
+    """
+
+    def __init__(self, auto, predicate, path=None, every=10, connectivity=4, torus=True, min_size=1):
+        """
+            @param auto: (Automaton) automaton whose world is analysed, not on the numpy backend (the labelling is done
+                         with torch)
+            @param predicate: function(world) -> (torch.BoolTensor, WxH) cells of the components, see Model.components
+            @param path: (str) CSV file of the tables, None to only keep the last one in self.table
+            @param every: (int) number of steps between 2 labellings
+            @param connectivity: (int) 4 or 8 neighbours
+            @param torus: (bool) if True, the components continue across the borders of the world
+            @param min_size: (int) smaller components are not in the tables
+        """
+        if auto.policy.numpy:
+            raise ValueError("Components has no numpy backend, use an ExecutionPolicy with torch")
+        self.auto = auto
+        self.predicate = predicate
+        self.every = every
+        self.connectivity = connectivity
+        self.torus = torus
+        self.min_size = min_size
+        self.table = None
+        self.file = None
+        if path is not None:
+            self.file = open(path, "w", newline="")
+            self.writer = csv.writer(self.file)
+            self.writer.writerow(("step",) + COLUMNS)
+
+    def update(self):
+        """
+        Must be called after each step of the automaton
+        """
+        if self.auto.steps % self.every == 0:
+            self.record()
+
+    def record(self):
+        self.table = component_table(self.predicate(self.auto.world), self.connectivity, self.torus, self.min_size)
+        if self.file is not None:
+            step = self.auto.steps
+            self.writer.writerows((step,) + row for row in zip(*(self.table[column].tolist() for column in COLUMNS)))
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def label(mask, connectivity=4, torus=True):
+    """
+    Labels the connected components of a mask by label propagation on the device: each cell and the root of its
+    label take the minimum label of its neighbours (hooking, which merges whole trees of labels at once), then each
+    cell takes the label of its label until they are roots (pointer jumping), until nothing changes.
+
+    @param mask: (torch.BoolTensor, WxH)
+    @return: (torch.LongTensor, WxH) label of each cell: the smallest flat index of its component, W*H outside the mask
+    """
+    W, H = mask.shape
+    background = W * H
+    labels = torch.where(mask, torch.arange(W * H, device=mask.device).view(W, H), background)
+    while True:
+        propagated = labels
+        for dx, dy in NEIGHBOURS[connectivity]:
+            neighbour = labels.roll((dx, dy), dims=(0, 1))
+            if not torus:
+                # the cells on the opposite border are not neighbours
+                if dx: neighbour[0 if dx > 0 else -1, :] = background
+                if dy: neighbour[:, 0 if dy > 0 else -1] = background
+            propagated = torch.minimum(propagated, neighbour)
+        propagated = torch.where(mask, propagated, background)
+        # hooking: the root of the label of each cell also takes the minimum
+        propagated = propagated.view(-1).scatter_reduce(0, labels[mask], propagated[mask], "amin").view(W, H)
+
+        # the labels are flat indices of cells of the same component, with smaller labels
+        while True:
+            jumped = torch.where(mask, propagated.view(-1)[propagated.clamp(max=background - 1)], background)
+            if torch.equal(jumped, propagated):
+                break
+            propagated = jumped
+
+        if torch.equal(propagated, labels):
+            return labels
+        labels = propagated
+
+
+def component_table(mask, connectivity=4, torus=True, min_size=1):
+    """
+    @return: dict column -> np.ndarray, a row per component: its label, size, centroid (x, y), and bounding box
+             (x0, y0, width, height), which wraps around the borders on the torus
+    """
+    W, H = mask.shape
+    cells = mask.nonzero()
+    roots, ids = torch.unique(label(mask, connectivity, torus)[mask], return_inverse=True)
+    n = len(roots)
+    size = torch.bincount(ids, minlength=n)
+
+    table = {"component": roots, "size": size}
+    for axis, (coordinate, length) in enumerate(((cells[:, 0], W), (cells[:, 1], H))):
+        reference = torch.zeros(n, dtype=torch.long, device=mask.device)
+        if torus:
+            # the coordinates are taken relatively to the circular mean of the component, then unwrapped
+            angle = coordinate * (2 * math.pi / length)
+            cos = torch.zeros(n, device=mask.device).index_add_(0, ids, torch.cos(angle))
+            sin = torch.zeros(n, device=mask.device).index_add_(0, ids, torch.sin(angle))
+            reference = torch.round(torch.atan2(sin, cos) * (length / (2 * math.pi))).long() % length
+            coordinate = (coordinate - reference[ids] + length // 2) % length - length // 2
+
+        low = torch.full((n,), length, device=mask.device).scatter_reduce(0, ids, coordinate, "amin")
+        high = torch.full((n,), -length, device=mask.device).scatter_reduce(0, ids, coordinate, "amax")
+        mean = torch.zeros(n, dtype=torch.float64, device=mask.device).index_add_(0, ids, coordinate.double()) / size
+        table["xy"[axis]] = (reference + mean) % length if torus else mean
+        table[("x0", "y0")[axis]] = (reference + low) % length
+        table[("width", "height")[axis]] = high - low + 1
+
+    keep = size >= min_size
+    return {column: table[column][keep].cpu().numpy() for column in COLUMNS}
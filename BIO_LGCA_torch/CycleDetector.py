@@ -0,0 +1,123 @@
+from collections import deque
+
+import torch
+
+
+class CycleDetector:
+    """
+        Detects that an automaton reached a fixed point or a cycle of period p, from a hash of its world
+        computed on its device at each step, and kept in a bounded history.
+        It is attached with auto.cycle_detector = CycleDetector(...), the automaton updates it after each step.
+
+        The state of the model that drives the next steps (model.cycle_state(world): Game_Of_Life.step, the step t
+        of the random numbers of Moving_Lattices while a lattice moves, ...) is part of the hash when the model is
+        given: a repeated world is only a cycle if the model is in the same state too. The step counters and the random
+        numbers are left out once they cannot change the evolution, e.g. Moving_Lattices once every lattice is at rest.
+
+        Once a cycle is found, the run can be stopped (the callback returns True, see stop_requested), or jumped to
+        any future step: the world and the model at step t are the ones at step start + (t - start) % period.
+    """
+
+    def __init__(self, history=1024, on_cycle=None, confirm=True, model=None):
+        """
+            @param history: (int) number of last hashes kept, longest period that can be detected
+            @param on_cycle: function(start, period) called once when a cycle is detected, start being the first step
+                             of the cycle. If it returns True, stop_requested is set.
+            @param confirm: (bool) if True, a cycle is only reported once a whole period has been repeated,
+                            which rules out hash collisions
+            @param model: (Model) model whose cycle_state is hashed with the world, None if its state is entirely in
+                          the world
+        """
+        self.hashes = deque(maxlen=history)
+        self.model = model
+        self.on_cycle = on_cycle
+        self.confirm = confirm
+        self.weights = None
+        self.reset()
+
+    def reset(self):
+        self.clear_history()
+        self.cycle = None  # (start, period) of the detected cycle
+        self.stop_requested = False
+
+    def clear_history(self):
+        self.hashes.clear()
+        self.last_seen = {}  # hash -> last step where it was seen
+        self.first_step = 0  # step of self.hashes[0]
+        self.candidate = None  # (start, period) of a cycle being confirmed
+        self.matched = 0
+
+    def world_hash(self, world):
+        """
+        Two independent 64 bits hashes of the world: sums of its values multiplied by random odd weights that are the
+        product of a weight per x, per y and per channel (so that the weights take W+H+C values in memory).
+        The integer overflows of torch wrap around, which makes the sums modulo 2^64.
+        """
+        values = world.reshape(world.shape[0], world.shape[1], -1)
+        if self.weights is None or [w.shape[-1] for w in self.weights[0]] != list(values.shape) or self.weights[0][0].device != values.device:
+            generator = torch.Generator().manual_seed(0)
+            self.weights = [[(torch.randint(-2**62, 2**62, (n,), generator=generator) * 2 + 1).to(values.device) for n in values.shape] for _ in range(2)]
+
+        values = values.long()
+        hashes = []
+        for wx, wy, wc in self.weights:
+            hashes.append(((values * wc).sum(2) * wy).sum(1).mul(wx).sum())
+        return tuple(torch.stack(hashes).tolist())
+
+    def model_state(self, world):
+        """
+        @return: the state of the model that drives the next steps besides the world (see Model.cycle_state)
+        """
+        if self.model is None:
+            return None
+        return self.model.cycle_state(world)
+
+    def update(self, auto):
+        step = auto.steps
+        world = auto.world
+        h = self.world_hash(world) + (self.model_state(world),)
+        if self.hashes and step != self.first_step + len(self.hashes):
+            # the automaton was not updated at each step (jump, world replaced, ...)
+            self.reset()
+        if not self.hashes:
+            self.first_step = step
+
+        if self.candidate is not None:
+            period = self.candidate[1]
+            if self.hashes[step - period - self.first_step] == h:
+                self.matched += 1
+            else:
+                self.candidate = None
+        if self.candidate is None and h in self.last_seen:
+            self.candidate = (self.last_seen[h], step - self.last_seen[h])
+            self.matched = 1
+
+        if len(self.hashes) == self.hashes.maxlen:
+            # the oldest hash leaves the history
+            if self.last_seen[self.hashes[0]] == self.first_step:
+                del self.last_seen[self.hashes[0]]
+            self.first_step += 1
+        self.hashes.append(h)
+        self.last_seen[h] = step
+
+        if self.cycle is None and self.candidate is not None and self.matched >= (self.candidate[1] if self.confirm else 1):
+            self.cycle = self.candidate
+            if self.on_cycle is not None and self.on_cycle(*self.cycle):
+                self.stop_requested = True
+
+    def jump(self, auto, step):
+        """
+        Brings the automaton to a future step of the detected cycle, with at most period-1 steps, which also bring
+        the model to its state at that step
+        """
+        if self.cycle is None:
+            raise ValueError("No cycle has been detected")
+        if step < auto.steps:
+            raise ValueError(f"Cannot jump backward, from step {auto.steps} to step {step}")
+
+        auto.cycle_detector = None
+        for _ in range((step - auto.steps) % self.cycle[1]):
+            auto.step()
+        auto.cycle_detector = self
+        auto.steps = step
+        self.clear_history()
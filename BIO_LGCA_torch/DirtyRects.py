@@ -0,0 +1,90 @@
+import numpy as np
+import pygame
+
+import Arrays
+
+
+class DirtyRects:
+    """
+        Finds the regions of the frame that changed since the previous frame, so that only them are
+        redrawn and sent to pygame.display.update(rects).
+        The worlds are compared on their device, by tiles of tile x tile cells, and only the small map of the changed
+        tiles is transferred to the host, where the tiles are merged into rectangles.
+        It assumes that the frame is a cellwise drawing of the world (each cell is drawn in a fixed block of pixels).
+    """
+
+    def __init__(self, world_size, frame_size=None, tile=16, max_rects=64, max_area=0.5):
+        """
+            @param world_size: (W,H) size of the world
+            @param frame_size: (W,H) size of the frame, world_size by default, must be a multiple of world_size
+            @param tile: (int) side of the tiles compared, in cells
+            @param max_rects: (int) above this number of rectangles, the whole frame is updated instead
+            @param max_area: (float) above this proportion of changed tiles, the whole frame is updated instead
+        """
+        self.world_size = world_size
+        self.frame_size = world_size if frame_size is None else frame_size
+        self.scale = (self.frame_size[0] // world_size[0], self.frame_size[1] // world_size[1])
+        self.tile = tile
+        self.max_rects = max_rects
+        self.max_area = max_area
+        self.previous = None
+
+    def invalidate(self):
+        """
+        Forces the next update to redraw the whole frame
+        """
+        self.previous = None
+
+    def update(self, world):
+        """
+        @param world: (torch.Tensor or np.ndarray, WxHx...) new world
+        @return: list of pygame.Rect in frame coordinates, or None if the whole frame must be redrawn
+        """
+        if self.previous is None or self.previous.shape != world.shape or Arrays.device(self.previous) != Arrays.device(world):
+            self.previous = Arrays.clone(world)
+            return None
+
+        changed = Arrays.any((world != self.previous).reshape(world.shape[0], world.shape[1], -1), 2)
+        self.previous[...] = world
+
+        # a tile changed if any of its cells changed
+        w, h = changed.shape
+        pad_w, pad_h = -w % self.tile, -h % self.tile
+        changed = Arrays.pad(changed, (pad_w, pad_h))
+        tiles = Arrays.to_numpy(Arrays.any(Arrays.any(changed.reshape((w + pad_w) // self.tile, self.tile, (h + pad_h) // self.tile, self.tile), 3), 1))
+
+        if tiles.mean() > self.max_area:
+            return None
+        rects = self.merge(tiles)
+        if len(rects) > self.max_rects:
+            return None
+        return rects
+
+    def merge(self, tiles):
+        """
+        Merges the changed tiles into rectangles: runs of tiles along y, then identical runs of consecutive x
+        """
+        rects = []
+        open_runs = {}  # (y0, y1) -> [x0, x1] of a rectangle that can still grow along x
+        for x in range(tiles.shape[0] + 1):
+            runs = set()
+            if x < tiles.shape[0]:
+                column = np.concatenate(([False], tiles[x], [False]))
+                edges = np.flatnonzero(column[1:] != column[:-1])
+                runs = set(zip(edges[0::2], edges[1::2]))
+
+            for run in list(open_runs):
+                if run in runs:
+                    open_runs[run][1] = x + 1
+                    runs.remove(run)
+                else:
+                    rects.append(self.to_frame(*open_runs.pop(run), *run))
+            for run in runs:
+                open_runs[run] = [x, x + 1]
+        return rects
+
+    def to_frame(self, x0, x1, y0, y1):
+        # tiles -> frame pixels, clipped to the frame
+        x0, x1 = x0 * self.tile * self.scale[0], min(x1 * self.tile * self.scale[0], self.frame_size[0])
+        y0, y1 = y0 * self.tile * self.scale[1], min(y1 * self.tile * self.scale[1], self.frame_size[1])
+        return pygame.Rect(int(x0), int(y0), int(x1 - x0), int(y1 - y0))
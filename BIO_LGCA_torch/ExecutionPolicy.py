@@ -0,0 +1,196 @@
+import json
+import os
+import platform
+import time
+
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # only the numpy backend is available
+    torch = None
+
+BACKENDS = ("eager", "compile", "numpy")
+
+
+class ExecutionPolicy:
+    """
+        How an automaton is executed: its device, the dtype of its world, the threads of torch, and the backend of its
+        step (eager torch operations, compiled with torch.compile, or numpy arrays on the cpu, which does not need
+        torch). The same policy is given to GOLAuto, LGCAAuto and BioLgcaSquaredAuto. The threads of torch are global
+        to the process, they are set when the policy is applied.
+
+        ExecutionPolicy.autotune times candidate policies on a short run, and keeps the fastest one in a JSON cache,
+        per model, grid size and machine.
+    """
+
+    def __init__(self, device=None, dtype=None, intra_threads=None, inter_threads=None, backend=None, verbose=True):
+        """
+            @param device: (str or torch.device) device of the world, cuda if available by default ("cpu" for numpy)
+            @param dtype: (torch.dtype, or numpy dtype for numpy) dtype of the world, the one of the initial world if None
+            @param intra_threads: (int) threads of torch inside an operation (torch.set_num_threads), default if None
+            @param inter_threads: (int) threads of torch between operations (torch.set_num_interop_threads), it can only
+                                  be set before torch starts any parallel work, default if None
+            @param backend: (str) "eager", "compile" or "numpy", eager by default (numpy if torch is not installed)
+            @param verbose: (bool) if True, prints where the automaton runs
+        """
+        if backend is None:
+            backend = "eager" if torch is not None else "numpy"
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend {backend}, expected one of {BACKENDS}")
+        if backend == "numpy":
+            if device is not None and str(device) != "cpu":
+                raise ValueError(f"The numpy backend only runs on the cpu, not on {device}")
+            self.device = "cpu"
+        elif torch is None:
+            raise ImportError(f"The {backend} backend needs torch, use ExecutionPolicy(backend=\"numpy\") without it")
+        else:
+            self.device = torch.device(device if device is not None else "cuda" if torch.cuda.is_available() else "cpu")
+        self.dtype = dtype
+        self.intra_threads = intra_threads
+        self.inter_threads = inter_threads
+        self.backend = backend
+        self.verbose = verbose
+
+    def __repr__(self):
+        return "ExecutionPolicy(" + ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items()) + ")"
+
+    @property
+    def numpy(self):
+        return self.backend == "numpy"
+
+    def apply(self):
+        """
+        Sets the threads of torch, called by the automata when they are built
+        """
+        if self.numpy:
+            if self.verbose:
+                print("Running on cpu, numpy backend")
+            return
+        if self.intra_threads is not None:
+            torch.set_num_threads(self.intra_threads)
+        if self.inter_threads is not None and self.inter_threads != torch.get_num_interop_threads():
+            try:
+                torch.set_num_interop_threads(self.inter_threads)
+            except RuntimeError:
+                if self.verbose:
+                    print(f"The inter-op threads of torch are already in use, kept at {torch.get_num_interop_threads()}")
+        if self.verbose:
+            print(f"Running on {self.device}, {torch.get_num_threads()} threads, {self.backend} backend")
+
+    def prepare(self, tensor):
+        """
+        @return: the tensor on the device, with the dtype of the policy (a numpy array for numpy)
+        """
+        if self.numpy:
+            if torch is not None and isinstance(tensor, torch.Tensor):
+                tensor = tensor.cpu().numpy()
+            return np.array(tensor, dtype=self.dtype)
+        tensor = torch.as_tensor(tensor)
+        return tensor.to(self.device) if self.dtype is None else tensor.to(self.device, self.dtype)
+
+    def compile(self, function):
+        """
+        @return: the function, compiled if the backend is "compile"
+        """
+        if self.backend == "compile":
+            return torch.compile(function)
+        return function
+
+    def synchronize(self):
+        # waits for the operations queued on the device, to time them
+        if not self.numpy and self.device.type == "cuda":
+            torch.cuda.synchronize(self.device)
+
+    def to_dict(self):
+        return {"device": str(self.device), "dtype": None if self.dtype is None else str(np.dtype(self.dtype) if self.numpy else self.dtype).replace("torch.", ""),
+                "intra_threads": self.intra_threads, "inter_threads": self.inter_threads, "backend": self.backend}
+
+    @classmethod
+    def from_dict(cls, d, verbose=True):
+        d = dict(d)
+        if d.get("dtype") is not None:
+            d["dtype"] = np.dtype(d["dtype"]) if d.get("backend") == "numpy" else getattr(torch, d["dtype"])
+        return cls(verbose=verbose, **d)
+
+    @staticmethod
+    def candidates(dtypes=(None,), backends=("eager",)):
+        """
+        @return: list of the policies worth trying on this machine: each device, with 1, half and all the cores on cpu
+                 (the numpy backend is only tried once, on the cpu)
+        """
+        devices = ["cpu"] + [f"cuda:{i}" for i in range(torch.cuda.device_count() if torch is not None else 0)]
+        cores = os.cpu_count() or 1
+        policies = []
+        for device in devices:
+            threads = sorted({1, max(cores // 2, 1), cores}) if device == "cpu" else [None]
+            for n in threads:
+                for dtype in dtypes:
+                    for backend in backends:
+                        if backend == "numpy" and (device != "cpu" or n != threads[0] or dtype is not None):
+                            continue
+                        policies.append(ExecutionPolicy(device, dtype, intra_threads=n, backend=backend, verbose=False))
+        return policies
+
+    @staticmethod
+    def machine():
+        """
+        @return: (str) identifier of the machine, part of the keys of the autotune cache
+        """
+        gpus = [torch.cuda.get_device_name(i) for i in range(torch.cuda.device_count())] if torch is not None else []
+        return "|".join([platform.node(), platform.machine(), str(os.cpu_count())] + gpus)
+
+    @classmethod
+    def autotune(cls, factory, key, candidates=None, steps=20, warmup=3, cache="./execution_policies.json", retune=False, verbose=True):
+        """
+        Returns the fastest policy for a model and a grid size on this machine, measured once and then read from the cache.
+
+        @param factory: function(policy) -> automaton, building the automaton to time with a policy
+        @param key: (model name, W, H) or any other JSON values identifying the run
+        @param candidates: list of ExecutionPolicy to time, ExecutionPolicy.candidates() by default
+        @param steps: (int) steps timed for each candidate, after warmup steps
+        @param cache: (str) path of the JSON cache, None to not use one
+        @param retune: (bool) if True, the cached policy is measured again
+        @return: (ExecutionPolicy) applied
+        """
+        key = json.dumps([cls.machine()] + list(key))
+        cached = {}
+        if cache is not None and os.path.exists(cache):
+            with open(cache) as f:
+                cached = json.load(f)
+        if key in cached and not retune:
+            best = cls.from_dict(cached[key]["policy"], verbose=verbose)
+            best.apply()
+            return best
+
+        results = []
+        for policy in cls.candidates() if candidates is None else candidates:
+            try:
+                policy.apply()
+                auto = factory(policy)
+                for _ in range(warmup):
+                    auto.step()
+                policy.synchronize()
+                start = time.perf_counter()
+                for _ in range(steps):
+                    auto.step()
+                policy.synchronize()
+                speed = steps / (time.perf_counter() - start)
+            except Exception as e:
+                if verbose:
+                    print(f"{policy} failed: {type(e).__name__}: {e}")
+                continue
+            if verbose:
+                print(f"{policy}: {speed:.1f} steps/s")
+            results.append((speed, policy))
+        if not results:
+            raise RuntimeError("No candidate policy could run")
+
+        speed, best = max(results, key=lambda result: result[0])
+        if cache is not None:
+            cached[key] = {"policy": best.to_dict(), "steps_per_second": speed}
+            with open(cache, "w") as f:
+                json.dump(cached, f, indent=1)
+        best.verbose = verbose
+        best.apply()
+        return best
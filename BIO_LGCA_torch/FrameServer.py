@@ -0,0 +1,242 @@
+import contextlib
+import os
+import tempfile
+import threading
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: the heartbeat slots are claimed without lock
+    fcntl = None
+
+MAGIC = 0x4C474341  # marks a frame server block that is open
+# header of the shared memory, in int64: magic, W, H, number of slots, number of viewers, sequence number of the last
+# frame, last heartbeat of the server (ns), timeout of the heartbeats (ns), then the sequence number of the frame of
+# each slot (-1 while it is written), then the last heartbeat of each viewer (ns), then the owner of each heartbeat
+# slot (a token of the viewer, 0 if free)
+HEADER = 8
+
+
+class FrameServer:
+    """
+        Publishes the frames of a simulation in a ring buffer of shared memory, that viewer processes (see viewer.py)
+        attach to, read without copy and detach from whenever they want. Publishing a frame is a single copy in the
+        ring, and the frames can be skipped entirely when no viewer is watching (see watched).
+
+        A frame is written in the slot after the last one, its sequence number being set to -1 during the copy, so
+        that a viewer reading the last frame has len(slots) - 1 frames of time before it is overwritten, and can check
+        that it was not (see FrameViewer.valid).
+
+        The server sends a heartbeat from a daemon thread, whatever the duration of the steps between two frames: a
+        shared memory of the same name whose server stopped beating was left by a crash, and is replaced, while a live
+        one is never taken over.
+    """
+
+    def __init__(self, name, size, slots=3, max_viewers=8, timeout=2.0):
+        """
+            @param name: (str) name of the shared memory, given to the viewers
+            @param size: (W,H) size of the frames
+            @param slots: (int) number of frames of the ring
+            @param max_viewers: (int) number of viewers that can watch at the same time
+            @param timeout: (float) seconds after the last heartbeat of a viewer (or of the server) before it is
+                            considered gone
+        """
+        self.name = name
+        self.size = tuple(size)
+        self.slots = slots
+        self.timeout = timeout
+        header = (HEADER + slots + 2 * max_viewers) * 8
+        frame = size[0] * size[1] * 3
+        try:
+            self.shm = shared_memory.SharedMemory(name, create=True, size=header + slots * frame)
+        except FileExistsError:
+            stale = attach(name)
+            alive = server_alive(stale)
+            stale.close()
+            if alive:
+                raise FileExistsError(f"The frame server {name} is already running") from None
+            # left by a server that crashed
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=header + slots * frame)
+
+        self.header, self.slot_seqs, self.heartbeats, self.owners, self.frames = layout(self.shm, size, slots, max_viewers)
+        self.slot_seqs[:] = -1
+        self.heartbeats[:] = 0
+        self.owners[:] = 0
+        self.header[1:] = (size[0], size[1], slots, max_viewers, -1, time.monotonic_ns(), int(timeout * 1e9))
+        self.header[0] = MAGIC
+        self.seq = -1
+
+        self.stopped = threading.Event()
+        self.heart = threading.Thread(target=self.beat_forever, daemon=True)
+        self.heart.start()
+
+    def beat_forever(self):
+        # several beats per timeout, so that a late one is not taken for a crash
+        while not self.stopped.wait(self.timeout / 4):
+            self.header[6] = time.monotonic_ns()
+
+    def watched(self):
+        """
+        @return: (bool) True if a viewer sent a heartbeat recently
+        """
+        return bool((self.heartbeats > time.monotonic_ns() - self.timeout * 1e9).any())
+
+    def publish(self, frame):
+        """
+        @param frame: (np.ndarray, WxHx3) uint8 frame, like auto.worldmap
+        """
+        self.seq += 1
+        slot = self.seq % self.slots
+        self.slot_seqs[slot] = -1
+        np.copyto(self.frames[slot], frame)
+        self.slot_seqs[slot] = self.seq
+        self.header[5] = self.seq
+
+    def close(self):
+        self.stopped.set()
+        self.heart.join()
+        self.header[0] = 0  # the viewers see that the server is gone
+        del self.header, self.slot_seqs, self.heartbeats, self.owners, self.frames
+        self.shm.close()
+        self.shm.unlink()
+        with contextlib.suppress(OSError):
+            os.remove(lock_path(self.name))
+
+
+class FrameViewer:
+    """
+        Viewer side of a FrameServer: attaches to its shared memory, and reads its last frame without copy.
+        The viewer must call beat() regularly, so that the server keeps publishing.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.shm = attach(name)
+        header = np.ndarray((HEADER,), dtype=np.int64, buffer=self.shm.buf)
+        if header[0] != MAGIC:
+            raise ValueError(f"{name} is not an open frame server")
+        self.size = (int(header[1]), int(header[2]))
+        slots, max_viewers = int(header[3]), int(header[4])
+        del header
+        self.header, self.slot_seqs, self.heartbeats, self.owners, self.frames = layout(self.shm, self.size, slots, max_viewers)
+
+        # the heartbeat slot of this viewer: a free one, or one whose viewer stopped beating, claimed with a
+        # compare-and-set of its owner, so that two viewers attaching together never share a slot
+        self.token = (os.getpid() << 20) | (time.monotonic_ns() & 0xFFFFF) or 1
+        self.index = None
+        with claim_lock(name):
+            expired = time.monotonic_ns() - int(self.header[7])
+            for i in range(max_viewers):
+                owner = int(self.owners[i])
+                if owner == 0 or self.heartbeats[i] < expired:
+                    if compare_and_set(self.owners, i, owner, self.token):
+                        self.index = i
+                        self.beat()
+                        break
+        if self.index is None:
+            self.close()
+            raise RuntimeError(f"The frame server {name} already has {max_viewers} viewers")
+
+    @property
+    def open(self):
+        """
+        False once the server is closed
+        """
+        return self.header[0] == MAGIC
+
+    def beat(self):
+        self.heartbeats[self.index] = time.monotonic_ns()
+
+    def latest(self):
+        """
+        @return: (seq, frame) last published frame, a view of the shared memory valid until the server overwrites
+                 it (check with valid(seq) after using it), or (None, None) if there is none
+        """
+        seq = int(self.header[5])
+        if seq < 0:
+            return None, None
+        slot = seq % len(self.frames)
+        if self.slot_seqs[slot] != seq:
+            return None, None
+        return seq, self.frames[slot]
+
+    def valid(self, seq):
+        """
+        @return: (bool) True if the frame seq was not overwritten
+        """
+        return self.slot_seqs[seq % len(self.frames)] == seq
+
+    def close(self):
+        if self.index is not None:
+            self.heartbeats[self.index] = 0
+            with claim_lock(self.name):
+                compare_and_set(self.owners, self.index, self.token, 0)
+        del self.header, self.slot_seqs, self.heartbeats, self.owners, self.frames
+        self.shm.close()
+
+
+def layout(shm, size, slots, max_viewers):
+    # numpy views of the header, the sequence numbers of the slots, the heartbeats, their owners and the frames of the block
+    header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+    slot_seqs = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=HEADER * 8)
+    heartbeats = np.ndarray((max_viewers,), dtype=np.int64, buffer=shm.buf, offset=(HEADER + slots) * 8)
+    owners = np.ndarray((max_viewers,), dtype=np.int64, buffer=shm.buf, offset=(HEADER + slots + max_viewers) * 8)
+    frames = np.ndarray((slots, size[0], size[1], 3), dtype=np.uint8, buffer=shm.buf, offset=(HEADER + slots + 2 * max_viewers) * 8)
+    return header, slot_seqs, heartbeats, owners, frames
+
+
+def server_alive(shm):
+    """
+    @return: (bool) True if the shared memory is an open frame server whose server sent a heartbeat recently
+    """
+    if shm.size < HEADER * 8:
+        return False
+    header = np.ndarray((HEADER,), dtype=np.int64, buffer=shm.buf)
+    alive = header[0] == MAGIC and time.monotonic_ns() - header[6] < header[7]
+    del header
+    return bool(alive)
+
+
+def lock_path(name):
+    return os.path.join(tempfile.gettempdir(), f"{name}.lock")
+
+
+@contextlib.contextmanager
+def claim_lock(name):
+    # lock shared by the processes attaching to the frame server name, the compare-and-set of the owners is atomic under it
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path(name), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def compare_and_set(values, i, expected, value):
+    """
+    Sets values[i] to value if it is expected, must be called under claim_lock
+    @return: (bool) True if it was set
+    """
+    if values[i] != expected:
+        return False
+    values[i] = value
+    return True
+
+
+def attach(name):
+    # attaches to an existing shared memory, without letting the resource tracker of this process unlink it on exit
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # python < 3.13
+        shm = shared_memory.SharedMemory(name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
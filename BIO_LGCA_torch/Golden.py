@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+
+def as_tensor(world):
+    # the worlds of the numpy backend are compared as cpu tensors
+    return torch.from_numpy(world) if isinstance(world, np.ndarray) else world.detach().cpu()
+
+
+def world_hash(world):
+    """
+    @return: (str) hash of the values and the shape of a world, independent of its device, dtype and backend
+    """
+    world = as_tensor(world)
+    digest = hashlib.blake2b(str(tuple(world.shape)).encode(), digest_size=16)
+    digest.update(world.to(torch.float64).contiguous().numpy().tobytes())
+    return digest.hexdigest()
+
+
+def trajectory(factory, steps, warmup=2):
+    """
+    Runs an automaton and hashes its world after each step (and before the first one)
+    @param factory: function() -> automaton, built the same way at each call (fixed seed and size)
+    @param warmup: (int) number of steps of another automaton run first, not timed: compilation (once per parity of
+                   the models alternating 2 kinds of steps), caches and allocations of the first calls
+    @return: (hashes, seconds spent in the steps)
+    """
+    warm = factory()
+    for _ in range(warmup):
+        warm.step()
+    auto = factory()
+    hashes = [world_hash(auto.world)]
+    seconds = 0.
+    for _ in range(steps):
+        start = time.perf_counter()
+        auto.step()
+        seconds += time.perf_counter() - start
+        hashes.append(world_hash(auto.world))
+    return hashes, seconds
+
+
+def world_at(factory, step):
+    auto = factory()
+    for _ in range(step):
+        auto.step()
+    return as_tensor(auto.world).to(torch.float64)
+
+
+class Golden:
+    """
+        Golden trajectories of the reference implementations: the hashes of the world at each step of fixed
+        scenarios (model, seed, size), kept in a JSON file. An alternative backend is replayed against them: the first
+        step where its world differs is reported with the bounding box of the differing cells (found by running the
+        reference again up to that step), and both runs are timed one after the other on this machine.
+    """
+
+    def __init__(self, path="golden.json"):
+        self.path = path
+        self.trajectories = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.trajectories = json.load(f)
+
+    def record(self, name, factory, steps):
+        """
+        Records the golden trajectory of a scenario with its reference factory
+        """
+        hashes, seconds = trajectory(factory, steps)
+        self.trajectories[name] = {"hashes": hashes, "seconds": seconds}
+        with open(self.path, "w") as f:
+            json.dump(self.trajectories, f, indent=1)
+
+    def check(self, name, factory, reference, cells):
+        """
+        Replays a backend on a recorded scenario
+        @param factory: function() -> automaton of the backend
+        @param reference: function() -> automaton of the reference, to locate a divergence
+        @param cells: function(difference) -> (WxH) bool tensor, the cells where the worlds differ, from the
+                      elementwise difference of the worlds (which keeps their layout)
+        @return: dict with "match", "step" and "bbox" (x0, y0, x1, y1) of the first divergence (None if they match),
+                 "cells" (number of differing cells), "reference_seconds" and "seconds" of the steps
+        """
+        golden = self.trajectories[name]
+        hashes, seconds = trajectory(factory, len(golden["hashes"]) - 1)
+        # the recorded seconds may come from another machine, the reference is timed again
+        _, reference_seconds = trajectory(reference, len(golden["hashes"]) - 1)
+        report = {"match": True, "step": None, "bbox": None, "cells": 0, "reference_seconds": reference_seconds, "seconds": seconds}
+
+        step = next((i for i, (a, b) in enumerate(zip(hashes, golden["hashes"])) if a != b), None)
+        if step is None:
+            return report
+        report.update(match=False, step=step)
+        candidate, expected = world_at(factory, step), world_at(reference, step)
+        if candidate.shape != expected.shape:
+            return report
+        differ = cells(candidate != expected).nonzero()
+        report["cells"] = len(differ)
+        if len(differ):
+            (x0, y0), (x1, y1) = differ.min(dim=0).values.tolist(), differ.max(dim=0).values.tolist()
+            report["bbox"] = (x0, y0, x1 + 1, y1 + 1)
+        return report
+
+
+def print_reports(reports):
+    """
+    @param reports: list of (scenario, backend, report of Golden.check), the report being None for a failed run and
+                    "skipped" for a backend that does not support the scenario
+    """
+    print(f"{'scenario':<32}{'backend':<16}{'result':<40}{'reference s':>12}{'backend s':>12}{'speedup':>9}")
+    for scenario, backend, report in reports:
+        if report is None:
+            result, speed = "failed", ""
+        elif report == "skipped":
+            result, speed = "skipped", ""
+        else:
+            result = "match" if report["match"] else f"differs at step {report['step']}, {report['cells']} cells in {report['bbox']}"
+            speed = f"{report['reference_seconds']:>12.3f}{report['seconds']:>12.3f}{report['reference_seconds'] / max(report['seconds'], 1e-9):>8.2f}x"
+        print(f"{scenario:<32}{backend:<16}{result:<40}{speed}")
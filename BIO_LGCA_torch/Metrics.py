@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+
+from Profiler import BUCKETS
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metrics:
+    """
+        Local HTTP endpoint exposing the live metrics of a run in the text exposition format of Prometheus, to be
+        scraped by a dashboard (and to alert when the throughput drops):
+            alife_steps_total, alife_steps_per_second, alife_world_bytes, alife_observables_pending,
+            alife_phase_seconds (histogram of the phases of the profiler, if it is enabled),
+            alife_model_<counter> (see Model.counters)
+        The server runs in a daemon thread and only reads the automaton, the step loop is not touched. The speed is
+        measured over a fixed window of wall-clock time, sampled by another daemon thread, so that it does not depend
+        on how often, or by how many scrapers, the endpoint is read.
+    """
+
+    def __init__(self, auto, model=None, observables=None, port=9100, host="127.0.0.1", window=10.):
+        """
+            @param auto: (Automaton) automaton of the run, its profiler gives the histograms of the phases
+            @param model: (Model) model whose counters are exposed, None for none
+            @param observables: (Observables) recorder whose pending recordings are exposed, None for none
+            @param port: (int) port of the endpoint, http://host:port/metrics
+            @param host: (str) interface listened on, only the local machine by default
+            @param window: (float) seconds over which alife_steps_per_second is measured
+        """
+        self.auto = auto
+        self.counters = {} if model is None else model.counters()
+        self.observables = observables
+        self.address = (host, port)
+        self.server = None
+        self.lock = threading.Lock()
+        self.window = window
+        self.stopped = threading.Event()
+        # (time, steps) sampled every window / 10 seconds, covering the last window
+        self.samples = deque([(time.perf_counter(), auto.steps)])
+
+    def sample(self):
+        with self.lock:
+            now = time.perf_counter()
+            self.samples.append((now, self.auto.steps))
+            # the oldest sample kept is the last one at least a window old
+            while len(self.samples) > 2 and self.samples[1][0] <= now - self.window:
+                self.samples.popleft()
+            return self.samples[0], self.samples[-1]
+
+    def sample_forever(self):
+        while not self.stopped.wait(self.window / 10):
+            self.sample()
+
+    def start(self):
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(self.address, Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        threading.Thread(target=self.sample_forever, daemon=True).start()
+        print(f"Metrics on http://{self.address[0]}:{self.server.server_address[1]}/metrics")
+        return self
+
+    def render(self):
+        """
+        @return: (str) the metrics in the text exposition format
+        """
+        lines = []
+
+        def metric(name, kind, description, samples):
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{labels} {value:.10g}" for labels, value in samples)
+
+        (then, previous), (now, steps) = self.sample()
+        metric("alife_steps_total", "counter", "Steps done by the automaton", [("", steps)])
+        metric("alife_steps_per_second", "gauge", f"Speed over the last {self.window:g} seconds", [("", (steps - previous) / (now - then) if now > then else 0.)])
+        metric("alife_world_bytes", "gauge", "Memory of the tensors of the automaton (world and buffers)", [("", world_bytes(self.auto))])
+        if self.observables is not None:
+            metric("alife_observables_pending", "gauge", "Recordings of the observables waiting to be written", [("", self.observables.length)])
+
+        profiler = getattr(self.auto, "profiler", None)
+        if profiler is not None and profiler.enabled:
+            lines.append("# HELP alife_phase_seconds Duration of the phases of the step and of the render loop")
+            lines.append("# TYPE alife_phase_seconds histogram")
+            for name, phase in list(profiler.phases.items()):
+                cumulated = 0
+                for bound, count in zip(BUCKETS + ("+Inf",), phase.buckets):
+                    cumulated += count
+                    lines.append(f'alife_phase_seconds_bucket{{phase="{name}",le="{bound}"}} {cumulated}')
+                lines.append(f'alife_phase_seconds_sum{{phase="{name}"}} {phase.total / 1e9:.10g}')
+                lines.append(f'alife_phase_seconds_count{{phase="{name}"}} {phase.count}')
+
+        for name, counter in self.counters.items():
+            metric(f"alife_model_{name}", "gauge", f"Counter {name} of the model", [("", counter())])
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        self.stopped.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+
+def world_bytes(auto):
+    """
+    @return: (int) number of bytes of the tensors held by the automaton, read without materializing its world
+    """
+    return sum(t.element_size() * t.nelement() for t in vars(auto).values() if isinstance(t, torch.Tensor))
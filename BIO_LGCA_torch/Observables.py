@@ -0,0 +1,90 @@
+import json
+import os
+
+import numpy as np
+
+import Arrays
+
+try:
+    import torch
+except ImportError:  # only the numpy backend
+    torch = None
+
+
+class Observables:
+    """
+        Time series of reductions of the world (counts of states, populations, ...).
+        The reductions are computed on the device of the automaton every k steps and accumulated
+        in a device buffer, which is flushed in bulk into a columnar file: only a few numbers per
+        recorded step are transferred to the host.
+
+        The columnar file is a directory containing one raw float64 file per column, plus
+        columns.json that lists them. It can be read back with load_observables.
+    """
+
+    def __init__(self, auto, reductions, path, every=1, buffer_size=1024):
+        """
+            @param auto: (Automaton) automaton whose world is observed
+            @param reductions: (dict) name -> function(world) returning a scalar (tensor or number), see Model.observables
+            @param path: (str) directory of the columnar file
+            @param every: (int) number of steps between 2 recordings
+            @param buffer_size: (int) number of recordings kept on the device before a flush
+        """
+        self.auto = auto
+        self.reductions = reductions
+        self.path = path
+        self.every = every
+        self.steps = 0
+
+        self.columns = ["step"] + list(reductions)
+        if auto.policy.numpy:
+            self.buffer = np.zeros((buffer_size, len(self.columns)), dtype=np.float64)
+        else:
+            self.buffer = torch.zeros((buffer_size, len(self.columns)), dtype=torch.float64, device=auto.device)
+        self.length = 0
+
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, "columns.json"), "w") as f:
+            json.dump({"columns": self.columns, "dtype": "float64"}, f)
+        self.files = [open(os.path.join(path, f"{name}.bin"), "wb") for name in self.columns]
+
+    def update(self):
+        """
+        Must be called after each step of the automaton
+        """
+        self.steps += 1
+        if self.steps % self.every == 0:
+            self.record()
+
+    def record(self):
+        world = self.auto.world
+        row = self.buffer[self.length]
+        row[0] = self.steps
+        for i, reduction in enumerate(self.reductions.values()):
+            row[i+1] = reduction(world)
+
+        self.length += 1
+        if self.length == self.buffer.shape[0]:
+            self.flush()
+
+    def flush(self):
+        # single transfer of all the recordings in the buffer
+        values = Arrays.to_numpy(self.buffer[:self.length])
+        for i, f in enumerate(self.files):
+            values[:, i].tofile(f)
+            f.flush()
+        self.length = 0
+
+    def close(self):
+        self.flush()
+        for f in self.files:
+            f.close()
+
+
+def load_observables(path):
+    """
+    Returns the time series recorded in path, as a dict column name -> np.array
+    """
+    with open(os.path.join(path, "columns.json")) as f:
+        columns = json.load(f)["columns"]
+    return {name: np.fromfile(os.path.join(path, f"{name}.bin"), dtype=np.float64) for name in columns}
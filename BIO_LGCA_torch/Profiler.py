@@ -0,0 +1,140 @@
+import bisect
+import contextlib
+import json
+import sys
+import time
+from collections import deque
+
+try:
+    import torch
+except ImportError:  # numpy backend, there is no cuda to synchronize
+    torch = None
+
+# Returned by Profiler.phase when the profiler is disabled, so that the hooks cost a method call and an empty with
+NULL_PHASE = contextlib.nullcontext()
+# Upper bounds in seconds of the buckets of the histograms of the durations of the phases (see Metrics)
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10.)
+
+
+class Profiler:
+    """
+        Instrumentation of the phases of the step and of the render loop (interaction, transport, draw_function,
+        make_surface, display, ...). Each phase is timed with:
+            with profiler.phase("interaction"):
+                ...
+        The profiler keeps rolling statistics of the durations and of the number of allocations of each phase,
+        which can be shown on screen with draw_hud, and can record a Chrome trace (chrome://tracing, Perfetto).
+        It also counts the durations of each phase since the start in the buckets of a histogram, exposed by Metrics.
+        When it is disabled, the hooks cost essentially nothing.
+    """
+
+    def __init__(self, enabled=True, window=120, trace=False, synchronize=True, allocations=True, max_events=1_000_000):
+        """
+            @param enabled: (bool) if False, the phases are not measured
+            @param window: (int) number of last measures used for the statistics of each phase
+            @param trace: (bool) if True, every measure is kept as an event of the Chrome trace
+            @param synchronize: (bool) if True, waits for the cuda kernels at the boundaries of the phases, otherwise
+                                the time of a phase is only the time to launch its kernels
+            @param allocations: (bool) if True, counts the allocated blocks (python objects, and cuda tensors if available)
+            @param max_events: (int) maximum number of events kept for the trace
+        """
+        self.enabled = enabled
+        self.window = window
+        self.trace = trace
+        self.synchronize = synchronize and torch is not None and torch.cuda.is_available()
+        self.allocations = allocations
+        self.max_events = max_events
+
+        self.phases = {}
+        self.events = []
+        self.origin = time.perf_counter_ns()
+        self.font = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return NULL_PHASE
+        if name not in self.phases:
+            self.phases[name] = Phase(self, name)
+        return self.phases[name]
+
+    def allocation_count(self):
+        count = sys.getallocatedblocks()
+        if torch is not None and torch.cuda.is_available():
+            count += torch.cuda.memory_stats().get("allocation.all.allocated", 0)
+        return count
+
+    def stats(self):
+        """
+        Returns a dict phase -> (mean time in ms, max time in ms, mean number of allocations) over the window
+        """
+        return {name: (sum(phase.durations) / len(phase.durations) / 1e6, max(phase.durations) / 1e6,
+                       sum(phase.allocations) / len(phase.allocations) if phase.allocations else 0)
+                for name, phase in self.phases.items() if phase.durations}
+
+    def draw_hud(self, surface, position=(5, 5)):
+        """
+        Draws the statistics of the phases on the top left of the surface
+        """
+        import pygame
+
+        if self.font is None:
+            self.font = pygame.font.SysFont("monospace", 12)
+        lines = [f"{'phase':<14}{'mean ms':>9}{'max ms':>9}{'allocs':>8}"]
+        lines += [f"{name[:13]:<14}{mean:>9.2f}{maximum:>9.2f}{allocs:>8.0f}" for name, (mean, maximum, allocs) in self.stats().items()]
+
+        rendered = [self.font.render(line, True, (255, 255, 255)) for line in lines]
+        background = pygame.Surface((max(r.get_width() for r in rendered) + 6, sum(r.get_height() for r in rendered) + 6))
+        background.set_alpha(160)
+        surface.blit(background, position)
+        y = position[1] + 3
+        for r in rendered:
+            surface.blit(r, (position[0] + 3, y))
+            y += r.get_height()
+
+    def export_trace(self, path):
+        """
+        Writes the recorded events as a Chrome trace JSON file
+        """
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+class Phase:
+    """
+        Context manager that measures one phase of a Profiler. It is reused by every measure of the phase.
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.durations = deque(maxlen=profiler.window)
+        self.allocations = deque(maxlen=profiler.window)
+        # histogram since the start: number of durations in each bucket (the last one is above all the bounds), sum in ns
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0
+
+    def __enter__(self):
+        if self.profiler.synchronize:
+            torch.cuda.synchronize()
+        if self.profiler.allocations:
+            self.allocated = self.profiler.allocation_count()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        if self.profiler.synchronize:
+            torch.cuda.synchronize()
+        end = time.perf_counter_ns()
+        self.durations.append(end - self.start)
+        self.buckets[bisect.bisect_left(BUCKETS, (end - self.start) / 1e9)] += 1
+        self.count += 1
+        self.total += end - self.start
+        if self.profiler.allocations:
+            self.allocations.append(max(self.profiler.allocation_count() - self.allocated, 0))
+
+        if self.profiler.trace and len(self.profiler.events) < self.profiler.max_events:
+            self.profiler.events.append({"name": self.name, "ph": "X", "pid": 0, "tid": 0,
+                                         "ts": (self.start - self.profiler.origin) / 1e3, "dur": (end - self.start) / 1e3,
+                                         "args": {"allocations": self.allocations[-1] if self.profiler.allocations else None}})
+        return False
@@ -0,0 +1,163 @@
+import copy
+import zlib
+from collections import deque
+
+import numpy as np
+
+import Arrays
+
+
+class Rewind:
+    """
+        Memory-bounded history of the recent steps of an automaton, to go back and see how something formed.
+        Every keyframe_every steps, the whole world is kept (a keyframe), and the other steps only keep the indices and
+        values of the elements that changed since the previous step (a delta), both compressed with zlib. The changes are
+        found where the world is (on its device), so that only the changed elements are transferred to the host. The
+        state of the model (step counter of its random numbers, counters, ...) is copied on the keyframes, the other
+        steps only keep its attributes that changed, so that the run can resume from any kept step.
+        When the history exceeds the memory budget, its oldest keyframe and its deltas are dropped.
+
+        It is updated after each step, restore(step) puts the automaton back at a kept step, and the next steps then
+        replace the history that followed it.
+    """
+
+    def __init__(self, auto, model=None, budget=256 * 2**20, keyframe_every=64, level=1):
+        """
+            @param auto: (Automaton) automaton whose world is kept
+            @param model: (Model) model whose attributes are kept and restored with the world, None to ignore
+            @param budget: (int) maximal number of bytes of the history
+            @param keyframe_every: (int) number of steps between 2 keyframes, restoring a step decodes at most as many deltas
+            @param level: (int) zlib compression level, 1 is the fastest
+        """
+        self.auto = auto
+        self.model = model
+        self.budget = budget
+        self.keyframe_every = keyframe_every
+        self.level = level
+        # (step, is a keyframe, compressed bytes, attributes of the model) of the consecutive kept steps
+        self.frames = deque()
+        self.bytes = 0
+        self.last = None  # world of the last kept step, where the world of the automaton is
+        self.state = None  # attributes of the model at the last kept step
+        self.record()
+
+    @property
+    def first_step(self):
+        return self.frames[0][0]
+
+    @property
+    def last_step(self):
+        return self.frames[-1][0]
+
+    def update(self):
+        """
+        Must be called after each step of the automaton
+        """
+        self.record()
+
+    def record(self):
+        step = self.auto.steps
+        # the history after a restored step is replaced
+        while self.frames and self.last_step >= step:
+            self.bytes -= len(self.frames.pop()[2])
+        if self.frames and self.last_step != step - 1:
+            self.clear()
+
+        world = self.auto.world
+        if self.last is None or world.shape != self.last.shape or world.dtype != self.last.dtype or Arrays.device(world) != Arrays.device(self.last):
+            self.clear()
+
+        if not self.frames or step % self.keyframe_every == 0:
+            data = zlib.compress(Arrays.to_numpy(world).tobytes(), self.level)
+            state = None if self.model is None else copy.deepcopy(vars(self.model))
+            self.frames.append((step, True, data, state))
+            self.last = Arrays.clone(world)
+            self.state = state
+        else:
+            changed = Arrays.flatnonzero(world != self.last)
+            values = Arrays.to_numpy(world.reshape(-1)[changed])
+            data = zlib.compress(Arrays.to_numpy(changed).astype(np.int64).tobytes() + values.tobytes(), self.level)
+            state = None if self.model is None else self.changes()
+            self.frames.append((step, False, data, state))
+            self.last[...] = world
+            if state:
+                self.state = {**self.state, **state}
+        self.bytes += len(data)
+
+        # the oldest keyframe and its deltas are dropped, the last one is always kept
+        while self.bytes > self.budget and sum(frame[1] for frame in self.frames) > 1:
+            self.bytes -= len(self.frames.popleft()[2])
+            while not self.frames[0][1]:
+                self.bytes -= len(self.frames.popleft()[2])
+
+    def changes(self):
+        """
+        @return: (dict) copies of the attributes of the model that changed since the last kept step
+        """
+        return {name: copy.deepcopy(value) for name, value in vars(self.model).items()
+                if name not in self.state or not same(value, self.state[name])}
+
+    def clear(self):
+        self.frames.clear()
+        self.bytes = 0
+        self.last = None
+        self.state = None
+
+    def world_at(self, step):
+        """
+        @return: (np.ndarray) world at a kept step, decoded from its keyframe and the following deltas
+        """
+        if not self.first_step <= step <= self.last_step:
+            raise ValueError(f"Step {step} is not kept, the history goes from step {self.first_step} to {self.last_step}")
+        index = step - self.first_step
+        start = index
+        while not self.frames[start][1]:
+            start -= 1
+
+        world = Arrays.to_numpy(Arrays.clone(self.last))
+        world.reshape(-1)[:] = np.frombuffer(zlib.decompress(self.frames[start][2]), dtype=world.dtype)
+        for i in range(start + 1, index + 1):
+            delta = zlib.decompress(self.frames[i][2])
+            n = len(delta) // (8 + world.itemsize)
+            world.reshape(-1)[np.frombuffer(delta[:8 * n], dtype=np.int64)] = np.frombuffer(delta[8 * n:], dtype=world.dtype)
+        return world
+
+    def state_at(self, step):
+        """
+        @return: (dict) attributes of the model at a kept step, from its keyframe and the following changes
+        """
+        index = step - self.first_step
+        start = index
+        while not self.frames[start][1]:
+            start -= 1
+        state = dict(self.frames[start][3])
+        for i in range(start + 1, index + 1):
+            state.update(self.frames[i][3])
+        return state
+
+    def restore(self, step):
+        """
+        Puts the automaton (and the model) back at a kept step
+        """
+        step = min(max(step, self.first_step), self.last_step)
+        world = self.world_at(step)
+        self.auto.world = self.auto.policy.prepare(world)
+        self.auto.steps = step
+        self.last = Arrays.clone(self.auto.world)
+        if self.model is not None:
+            self.state = self.state_at(step)
+            vars(self.model).update(copy.deepcopy(self.state))
+        return step
+
+
+def same(value, kept):
+    # plain values are compared, objects through their attributes, anything else (arrays, ...) is taken as changed
+    if type(value) is not type(kept):
+        return False
+    if isinstance(value, (bool, int, float, str, type(None))):
+        return value == kept
+    if isinstance(value, tuple):
+        return len(value) == len(kept) and all(same(v, k) for v, k in zip(value, kept))
+    if hasattr(value, "__dict__"):
+        return vars(value).keys() == vars(kept).keys() and all(same(v, vars(kept)[k]) for k, v in vars(value).items())
+    return False
@@ -0,0 +1,100 @@
+"""
+Conformance of the alternative backends of the BIO-LGCA models with the reference implementation (the eager
+BioLgcaSquaredAuto on the cpu, built by headless.make_automaton, Game_Of_Life's initial transport included).
+
+The golden trajectories (hash of the world at each step of each scenario) are recorded once with the reference, then
+every backend of BACKENDS is replayed against them: the first step and the region where it diverges are reported,
+and both runs are timed. A backend that does not support a scenario raises a ValueError when it is built, and is
+reported as skipped. The golden trajectories of today's reference are kept in golden.json, next to this script: they
+are only recorded again on purpose, when the reference semantics change. A new backend is added to BACKENDS as a
+function(model name, W, H, seed, params) -> automaton.
+
+Usage: python conformance.py record [--golden golden.json]
+       python conformance.py check [--backend sparse] [--golden golden.json]
+"""
+import argparse
+import os
+
+import torch
+
+import headless
+from ExecutionPolicy import ExecutionPolicy
+from Golden import Golden, print_reports
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden.json")
+
+# model name -> (W, H, steps, parameters of headless.make_automaton), with the seed 0
+SCENARIOS = {
+    "Weird_LGCA": (30, 30, 20, {}),
+    "Depth_Aware_Lattices": (24, 24, 10, {}),
+    "Naive_Seed_Square": (30, 30, 20, {}),
+    "Moving_Lattices": (24, 24, 40, {}),
+    "Reproducing_Pairs": (24, 24, 60, {"nb_lattices": 40}),
+    "Game_Of_Life": (32, 32, 40, {"density": 0.3}),
+}
+
+
+def reference(model_name, W, H, seed, params):
+    return headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy("cpu", verbose=False), **params)[1]
+
+
+def compiled(model_name, W, H, seed, params):
+    if not headless.MODELS[model_name].numpy_compatible:
+        # the loops over the cells of these models break the graphs of dynamo, whose compilation never ends
+        raise ValueError(f"torch.compile does not support the loops of {model_name}")
+    return headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy("cpu", backend="compile", verbose=False), **params)[1]
+
+
+BACKENDS = {
+    "sparse": lambda model_name, W, H, seed, params: headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy("cpu", verbose=False), sparse=True, **params)[1],
+    "compile": compiled,
+    "numpy": lambda model_name, W, H, seed, params: headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy(backend="numpy", verbose=False), **params)[1],
+}
+if torch.cuda.is_available():
+    BACKENDS["cuda"] = lambda model_name, W, H, seed, params: headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy("cuda", verbose=False), **params)[1]
+
+
+def scenario_factory(builder, model_name):
+    W, H, _, params = SCENARIOS[model_name]
+    return lambda: builder(model_name, W, H, 0, params)
+
+
+def record(golden):
+    for model_name, (W, H, steps, params) in SCENARIOS.items():
+        golden.record(model_name, scenario_factory(reference, model_name), steps)
+        print(f"{model_name}: {steps} steps recorded")
+
+
+def check(golden, backends):
+    reports = []
+    for model_name in SCENARIOS:
+        if model_name not in golden.trajectories:
+            print(f"{model_name} has no golden trajectory in {golden.path}, record it first")
+            continue
+        for backend in backends:
+            try:
+                report = golden.check(model_name, scenario_factory(BACKENDS[backend], model_name), scenario_factory(reference, model_name),
+                                      cells=lambda difference: difference.any(dim=2))
+            except ValueError as e:
+                print(f"{model_name} with {backend} skipped: {e}")
+                report = "skipped"
+            except Exception as e:
+                print(f"{model_name} with {backend} failed: {type(e).__name__}: {e}")
+                report = None
+            reports.append((model_name, backend, report))
+    print_reports(reports)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conformance of the backends with the reference implementation")
+    parser.add_argument("command", choices=("record", "check"))
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="backend to check, all by default")
+    parser.add_argument("--golden", default=GOLDEN, help="JSON file of the golden trajectories")
+    args = parser.parse_args()
+
+    golden = Golden(args.golden)
+    if args.command == "record":
+        record(golden)
+    else:
+        check(golden, args.backend or list(BACKENDS))
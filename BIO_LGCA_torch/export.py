@@ -0,0 +1,151 @@
+"""
+Offline video export of a model, run headlessly.
+
+The run is simulated once without drawing, keeping a checkpoint (world and model) at the start of each segment of
+frames. The segments are then simulated again from their checkpoint, drawn and encoded in parallel by a pool of
+processes, and finally joined without re-encoding by ffmpeg (or re-encoded losslessly with OpenCV without ffmpeg).
+
+Usage: python export.py Moving_Lattices 500 500 --steps 10000 [--stride 1] [--scale 2] [--fps 30] [--workers N]
+                        [--out automaton.mkv] [--params '{"nb_lattices": 1000}']
+"""
+import argparse
+import copy
+import json
+import multiprocessing
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+import cv2
+import numpy as np
+
+import headless
+from Automaton import BioLgcaSquaredAuto
+from ExecutionPolicy import ExecutionPolicy
+
+
+def checkpoints(model_name, W, H, frames, segments, seed=0, **params):
+    """
+    Simulates the run without drawing, and returns the checkpoint of the first frame of each segment
+    @param frames: (list of int) steps of the frames, in increasing order
+    @return: list of (steps of the frames of the segment, world, model)
+    """
+    model, auto = headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy(verbose=False), **params)
+    bounds = np.linspace(0, len(frames), segments + 1).astype(int)
+    result = []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if start == end:
+            continue
+        while auto.steps < frames[start]:
+            auto.step()
+        result.append((frames[start:end], auto.world.cpu().clone(), copy.deepcopy(model)))
+    return result
+
+
+def encode(task):
+    """
+    Simulates a segment from its checkpoint, and encodes its frames in a video file
+    """
+    path, (steps, world, model), scale, fps, fourcc = task
+    policy = ExecutionPolicy("cpu", intra_threads=1, verbose=False)
+    auto = BioLgcaSquaredAuto(world.shape[:2], world, model.interaction_function, model.draw_function, policy=policy)
+    auto.steps = steps[0]
+
+    video = None
+    for step in steps:
+        while auto.steps < step:
+            auto.step()
+        auto.draw()
+        # (W,H,3) RGB -> (H,W,3) BGR, each pixel of the drawn frame being a scale x scale block of pixels
+        frame = auto.worldmap.transpose(1, 0, 2)
+        if scale > 1:
+            frame = frame.repeat(scale, axis=0).repeat(scale, axis=1)
+        # sized from the drawn frame, that can be larger than the world (3 pixels per cell for Weird_LGCA)
+        if video is None:
+            video = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), fps, (frame.shape[1], frame.shape[0]))
+        video.write(cv2.cvtColor(np.ascontiguousarray(frame), cv2.COLOR_RGB2BGR))
+    if video is not None:
+        video.release()
+    return path
+
+
+def join(paths, out, fps, fourcc):
+    """
+    Concatenates the segments: without re-encoding with ffmpeg, frame by frame with OpenCV otherwise
+    """
+    if shutil.which("ffmpeg") is not None:
+        with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+            f.writelines(f"file '{os.path.abspath(path)}'\n" for path in paths)
+        try:
+            subprocess.run(["ffmpeg", "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", f.name, "-c", "copy", out], check=True)
+        finally:
+            os.remove(f.name)
+        return
+
+    video = None
+    for path in paths:
+        capture = cv2.VideoCapture(path)
+        ok, frame = capture.read()
+        while ok:
+            if video is None:
+                video = cv2.VideoWriter(out, cv2.VideoWriter_fourcc(*fourcc), fps, (frame.shape[1], frame.shape[0]))
+            video.write(frame)
+            ok, frame = capture.read()
+        capture.release()
+    if video is not None:
+        video.release()
+
+
+def export(model_name, W, H, steps, out="automaton.mkv", stride=1, scale=1, fps=30., workers=None, segments=None, fourcc="FFV1", seed=0, **params):
+    """
+    Exports the frames of the steps 0, stride, 2*stride, ..., steps of a model in a video
+
+    @param scale: (int) side of the block of pixels of a pixel of the drawn frame
+    @param segments: (int) number of segments encoded in parallel, 4 per worker by default to balance them
+    @param fourcc: (str) codec, FFV1 is lossless (use mp4v with a .mp4 file if it is not available)
+    @param params: parameters of headless.make_automaton (density, nb_lattices, ...)
+    """
+    workers = workers or os.cpu_count()
+    segments = segments or 4 * workers
+    frames = list(range(0, steps + 1, stride))
+
+    start = time.perf_counter()
+    tasks = checkpoints(model_name, W, H, frames, segments, seed=seed, **params)
+    print(f"{len(tasks)} segments of {len(frames)} frames, checkpoints in {time.perf_counter() - start:.1f}s")
+
+    directory = tempfile.mkdtemp(prefix="export_", dir=os.path.dirname(os.path.abspath(out)))
+    extension = os.path.splitext(out)[1] or ".mkv"
+    tasks = [(os.path.join(directory, f"segment_{i:05d}{extension}"), task, scale, fps, fourcc) for i, task in enumerate(tasks)]
+    try:
+        # spawn instead of fork, so that the workers can use torch safely
+        with multiprocessing.get_context("spawn").Pool(workers) as pool:
+            for i, path in enumerate(pool.imap_unordered(encode, tasks), 1):
+                print(f"[{i}/{len(tasks)}] {os.path.basename(path)} encoded")
+        join([task[0] for task in tasks], out, fps, fourcc)
+    finally:
+        shutil.rmtree(directory)
+    print(f"{out} written in {time.perf_counter() - start:.1f}s")
+    return out
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline video export of a model")
+    parser.add_argument("model_name", choices=sorted(headless.MODELS), help="model of models.py")
+    parser.add_argument("W", type=int)
+    parser.add_argument("H", type=int)
+    parser.add_argument("--steps", type=int, required=True, help="number of steps simulated")
+    parser.add_argument("--stride", type=int, default=1, help="a frame every `stride` steps")
+    parser.add_argument("--scale", type=int, default=1, help="integer upscaling of the frames")
+    parser.add_argument("--fps", type=float, default=30.)
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all the cores by default")
+    parser.add_argument("--segments", type=int, default=None, help="number of segments, 4 per worker by default")
+    parser.add_argument("--fourcc", default="FFV1", help="codec of the video")
+    parser.add_argument("--out", default="automaton.mkv", help="video file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--params", default="{}", help="JSON parameters of the initialization (density, nb_lattices, ...)")
+    args = parser.parse_args()
+
+    export(args.model_name, args.W, args.H, args.steps, args.out, args.stride, args.scale, args.fps, args.workers,
+           args.segments, args.fourcc, args.seed, **json.loads(args.params))
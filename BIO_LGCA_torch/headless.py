@@ -0,0 +1,85 @@
+import random
+import time
+
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # only the numpy backend is available
+    torch = None
+
+import Arrays
+from Automaton import BioLgcaSquaredAuto, SparseBioLgcaAuto
+from CellRandom import CellRandom
+from ExecutionPolicy import ExecutionPolicy
+from models import *
+
+MODELS = {model.__name__: model for model in (Weird_LGCA, Depth_Aware_Lattices, Naive_Seed_Square, Moving_Lattices, Reproducing_Pairs, Game_Of_Life)}
+
+
+def make_automaton(model_name, W, H, seed=0, density=None, device=None, policy=None, sparse=False, **init_kwargs):
+    """
+    Builds a model and its automaton as main.py does, without any window.
+
+    @param model_name: (str) name of a class of models.py
+    @param W, H: (int) size of the world
+    @param seed: (int) seed of the random numbers of the model (initialization and stochastic rules)
+    @param density: (float) if given, proportion of the sites that are initially alive (nb_lattices for the
+                    models that have one, random custom world for Game_Of_Life)
+    @param policy: (ExecutionPolicy) execution of the automaton, ExecutionPolicy(device=device, verbose=False) by
+                   default. The numpy backend only runs the models that are numpy_compatible
+    @param sparse: (bool) if True, the automaton is a SparseBioLgcaAuto, faster on worlds that are mostly air
+    @param init_kwargs: other parameters of the init_world of the model
+    @return: (model, automaton)
+    """
+    random.seed(seed)
+    np.random.seed(seed)
+    if torch is not None:
+        torch.manual_seed(seed)
+    if policy is None:
+        policy = ExecutionPolicy(device=device, verbose=False)
+
+    model = MODELS[model_name]()
+    if policy.numpy and not model.numpy_compatible:
+        raise ValueError(f"{model_name} can not run with the numpy backend")
+    model.numpy = policy.numpy
+    model.rng = CellRandom(seed)
+    if density is not None:
+        if model_name == "Game_Of_Life":
+            init_kwargs["custom"] = Arrays.cast(model.rng.bernoulli(density, -1, *CellRandom.grid((W, H), numpy=policy.numpy)), "int8")
+        else:
+            init_kwargs["nb_lattices"] = int(density * W * H)
+
+    if sparse:
+        auto = SparseBioLgcaAuto((W, H), model.init_world(W, H, **init_kwargs), model.interaction_function, model.draw_function, locate=model.locate, policy=policy)
+    else:
+        auto = BioLgcaSquaredAuto((W, H), model.init_world(W, H, **init_kwargs), model.interaction_function, model.draw_function, policy=policy)
+    if model_name == "Game_Of_Life":
+        auto.transport()  # necessary for the game of life, see main.py
+    return model, auto
+
+
+def run(model_name, W, H, steps, seed=0, every=10, device=None, policy=None, **params):
+    """
+    Runs a model headlessly for a number of steps, and returns its summary metrics: the final and maximal value of
+    each of its observables (sampled every `every` steps), and the speed of the run.
+    """
+    model, auto = make_automaton(model_name, W, H, seed=seed, device=device, policy=policy, **params)
+    reductions = model.observables()
+    finals, maxima = {}, {}
+
+    start = time.perf_counter()
+    for step in range(1, steps + 1):
+        auto.step()
+        if step % every == 0 or step == steps:
+            world = auto.world
+            for name, reduction in reductions.items():
+                finals[name] = float(reduction(world))
+                maxima[name] = max(maxima.get(name, finals[name]), finals[name])
+    duration = time.perf_counter() - start
+
+    metrics = {"seconds": duration, "steps_per_second": steps / duration if duration > 0 else float("inf")}
+    for name in reductions:
+        metrics[f"final_{name}"] = finals[name]
+        metrics[f"max_{name}"] = maxima[name]
+    return metrics
@@ -1,16 +1,56 @@
+import sys
+import time
+
 import cv2
 import pygame
 
 from Automaton import *
 from Camera import Camera
+from CellRandom import CellRandom
+from Components import Components
+from CycleDetector import CycleDetector
+from DirtyRects import DirtyRects
+from ExecutionPolicy import ExecutionPolicy
 from models import *
+from Metrics import Metrics
+from Observables import Observables
+from Profiler import Profiler
+from Rewind import Rewind
+
+# Seed of the random numbers of the run (initial world and stochastic rules): python main.py <seed> replays a run,
+# a new one is drawn otherwise
+seed = int(sys.argv[1]) if len(sys.argv) > 1 else time.time_ns() % 2**32
+print(f"Seed {seed}, replay the run with: python main.py {seed}")
+torch.manual_seed(seed)
+np.random.seed(seed)
 
 # Initialize the automaton
 W, H = 500, 500
-custom = torch.randint(0, 2, (W, H), dtype=torch.int8, device=torch.device("cuda"))
+custom = torch.randint(0, 2, (W, H), dtype=torch.int8)
 model = Game_Of_Life()
-auto = BioLgcaSquaredAuto((W, H), model.init_world(W, H, custom=custom), model.interaction_function, model.draw_function)
+model.rng = CellRandom(seed)
+# Device, dtype, threads and backend of the automaton. The fastest policy on this machine can be measured once (then
+# read from ./execution_policies.json) with:
+# policy = ExecutionPolicy.autotune(lambda policy: BioLgcaSquaredAuto((W, H), model.init_world(W, H, custom=custom), model.interaction_function, model.draw_function, policy=policy), key=(type(model).__name__, W, H))
+policy = ExecutionPolicy()
+# policy = ExecutionPolicy(backend="numpy")  # numpy arrays on the cpu (faster start for small worlds, vectorized models only, no Components)
+model.numpy = policy.numpy
+auto = BioLgcaSquaredAuto((W, H), model.init_world(W, H, custom=custom), model.interaction_function, model.draw_function, policy=policy)
+# auto = SparseBioLgcaAuto((W, H), model.init_world(W, H, custom=custom), model.interaction_function, model.draw_function, locate=model.locate, policy=policy)  # only the occupied sites, much faster on worlds that are mostly air
 auto.transport()  # necessary for the game of life, to be commented otherwise
+# auto.world = model.solve(auto.world)  # for Depth_Aware_Lattices, starts directly from the converged depths
+observables = None  # Observables(auto, model.observables(), './observables', every=10) to record the model's time series
+components = None  # Components(auto, model.components()["objects"], './components.csv', every=10, connectivity=8) to record the sizes, centroids and bounding boxes of the structures
+rewind = None  # Rewind(auto, model, budget=256 * 2**20) to go back in time: left and right arrows scrub the last steps, 'p' resumes from the shown one
+profiler = Profiler(enabled=False, trace=False)  # enabled=True to measure the phases, 'h' shows them, trace=True exports ./trace.json
+auto.profiler = profiler
+metrics = None  # Metrics(auto, model, observables, port=9100).start() to expose the live metrics of the run on http://127.0.0.1:9100/metrics
+
+# Detection of fixed points and cycles: the run is paused when one is reached, then 'j' jumps jump_steps steps ahead
+detect_cycles = False
+jump_steps = 1_000_000
+if detect_cycles:
+    auto.cycle_detector = CycleDetector(on_cycle=lambda start, period: print(f"Cycle of period {period} reached at step {start}") or True, model=model)
 # =============================================================================
 
 # Initialize the pygame screen
@@ -25,12 +65,17 @@ dt = 5 / fps
 
 # Initialize the world_state array, of size (W,H,3) of RGB values at each position.
 world_state = np.zeros((W, H, 3), dtype=np.uint8)
+
+# Persistent surface, only the regions of the world that changed are redrawn on it
+surface = pygame.Surface((W, H))
+dirty_rects = DirtyRects(auto.world.shape[:2], (W, H))
 # =============================================================================
 
 
 updating = True
 recording = False
 launch_video = True
+show_hud = False
 
 while running:
     # poll for events
@@ -46,8 +91,32 @@ while running:
             if (event.key == pygame.K_r):
                 # Toggle recording
                 recording = not recording
+                dirty_rects.invalidate()
             if (event.key == pygame.K_SPACE):
                 auto.step()
+                if observables is not None: observables.update()
+                if components is not None: components.update()
+                if rewind is not None: rewind.update()
+            if (event.key == pygame.K_LEFT and rewind is not None):
+                # Go back one kept step (and pause)
+                updating = False
+                print(f"Step {rewind.restore(auto.steps - 1)}")
+            if (event.key == pygame.K_RIGHT and rewind is not None):
+                # Go forward one step, from the history if it is kept
+                updating = False
+                if auto.steps < rewind.last_step:
+                    print(f"Step {rewind.restore(auto.steps + 1)}")
+                else:
+                    auto.step()
+                    rewind.update()
+            if (event.key == pygame.K_h):
+                # Toggle the profiler's overlay
+                show_hud = not show_hud
+                dirty_rects.invalidate()
+            if (event.key == pygame.K_j and auto.cycle_detector is not None and auto.cycle_detector.cycle is not None):
+                # Jump ahead in the detected cycle
+                auto.cycle_detector.jump(auto, auto.steps + jump_steps)
+                print(f"Jumped to step {auto.steps}")
 
         # Handle the event loop for the camera
         camera.handle_event(event)
@@ -55,15 +124,34 @@ while running:
     if (updating):
         # Step the automaton if we are updating
         auto.step()
-
-    auto.draw()  # Always draw the automaton
-    # Retrieve the world_state from automaton, np.array (W,H,3)
-    world_state = auto.worldmap
-
-    # Make the viewable surface.
-    surface = pygame.surfarray.make_surface(world_state)
-
-    # For recording
+        if observables is not None: observables.update()
+        if components is not None: components.update()
+        if rewind is not None: rewind.update()
+        if auto.cycle_detector is not None and auto.cycle_detector.stop_requested:
+            auto.cycle_detector.stop_requested = False
+            updating = False
+
+    # Regions that changed since the last frame, None to redraw everything (always the case with the overlays)
+    with profiler.phase("dirty_rects"):
+        rects = dirty_rects.update(auto.world)
+    if recording or show_hud:
+        rects = None
+
+    auto.draw(rects)  # Always draw the automaton, only the regions that changed if there are rects
+    # Retrieve the world_state from automaton, np.array (W,H,3), and update the viewable surface.
+    if rects is None:
+        with profiler.phase("worldmap"):
+            world_state = auto.worldmap
+        with profiler.phase("make_surface"):
+            pygame.surfarray.blit_array(surface, world_state)
+    else:
+        with profiler.phase("make_surface"):
+            pixels = pygame.surfarray.pixels3d(surface)
+            for rect in rects:
+                pixels[rect.left:rect.right, rect.top:rect.bottom] = auto.worldmap_region(rect)
+            del pixels  # unlocks the surface
+
+    # For recording (long runs are faster to export offline, in parallel, with export.py)
     if (recording):
         if (launch_video):
             # Might bug if FFV1 is not installed
@@ -73,9 +161,9 @@ while running:
             vid_loc = './automaton.mkv'
             video_out = cv2.VideoWriter(vid_loc, fourcc, 30.0, (W, H))
 
-        frame_bgr = cv2.cvtColor(auto.worldmap, cv2.COLOR_RGB2BGR)
-        video_out.write(frame_bgr)
-        pygame.draw.circle(surface, (255, 0, 0), (W - 10, H - 10), 2)  # Draw the'recording' red dot
+        with profiler.phase("video_write"):
+            frame_bgr = cv2.cvtColor(world_state, cv2.COLOR_RGB2BGR)
+            video_out.write(frame_bgr)
 
     # Clear the screen
     # screen.fill((0, 0, 0))
@@ -85,14 +173,34 @@ while running:
     #zoomed_surface = camera.apply(surface)
 
     # Blit (draw) the surface on the screen, at (0,0) coordinates
-    screen.blit(surface, (0, 0))
-
-    # 'flips' the display to show it on the screen
-    pygame.display.flip()
+    if rects is None:
+        screen.blit(surface, (0, 0))
+    else:
+        for rect in rects:
+            screen.blit(surface, rect, rect)
+    if recording:
+        pygame.draw.circle(screen, (255, 0, 0), (W - 10, H - 10), 2)  # Draw the'recording' red dot
+    if show_hud:
+        profiler.draw_hud(screen)
+
+    # 'flips' the display to show it on the screen, or only the regions that changed
+    with profiler.phase("display"):
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
 
     clock.tick(fps)  # limits FPS
 
 
 pygame.quit()
 if (not launch_video):  # if video is launched
-    video_out.release()
\ No newline at end of file
+    video_out.release()
+if observables is not None:
+    observables.close()
+if components is not None:
+    components.close()
+if metrics is not None:
+    metrics.close()
+if profiler.trace:
+    profiler.export_trace('./trace.json')
\ No newline at end of file
@@ -1,18 +1,79 @@
-import random
-
-import torch
 import numpy as np
 
+try:
+    import torch
+except ImportError:  # only the models that are numpy_compatible can run, with the numpy backend
+    torch = None
+
+import Arrays
+from CellRandom import CellRandom
+
 class Model:
+    # Random numbers of the stochastic rules and of the initializations, replace it by CellRandom(seed) to change the seed
+    rng = CellRandom(0)
+    # Global (x, y) coordinates of the cells of the world given to interaction_function, when it is only a part of the
+    # grid (see SparseBioLgcaAuto), None when it is the whole grid
+    sites = None
+    # True for the models whose interaction, initialization and observables also run on np.ndarray (see Arrays)
+    numpy_compatible = False
+    # if True, init_world returns a np.ndarray, for the numpy backend of ExecutionPolicy (see headless.make_automaton)
+    numpy = False
+
     def interaction_function(self, world):
         return NotImplementedError('Please subclass "Model" class and define the interaction_function')
 
+    # each cell must be drawn from its own channels only, the function is also called on regions of the world (see
+    # Automaton.draw_rects), its frame being sized from the world it is given
     def draw_function(self, world):
         return NotImplementedError('Please subclass "Model" class and define the draw_function')
 
     def init_world(self, W, H):
         return NotImplementedError('Please subclass "Model" class and define the init_world')
 
+    def locate(self, x, y):
+        self.sites = (x, y)
+
+    def cells(self, world):
+        """
+        @return: (x, y) global coordinates of the cells of the world given to interaction_function, to draw the random
+                 numbers of the stochastic rules
+        """
+        if self.sites is not None:
+            return self.sites
+        if Arrays.is_numpy(world):
+            return CellRandom.grid(world.shape[:2], numpy=True)
+        return CellRandom.grid(world.shape[:2], world.device)
+
+    def observables(self):
+        """
+        Returns the reductions that can be recorded by Observables: dict name -> function(world) returning a scalar.
+        They should only use torch functions, so that they are computed on the device of the world.
+        """
+        return {}
+
+    def counters(self):
+        """
+        Returns the counters of the model that are not in the world, exposed by Metrics: dict name -> function()
+        returning a number. They are read from another thread, so they must not touch the world.
+        """
+        return {}
+
+    def components(self):
+        """
+        Returns the predicates whose connected components can be analysed by Components: dict name -> function(world)
+        returning a (WxH) boolean tensor, computed on the device of the world.
+        """
+        return {}
+
+    def cycle_state(self, world):
+        """
+        Returns the state of the model that drives the next steps besides the world, hashed with it by CycleDetector:
+        a repeated world is only a cycle if this state repeats too. The step t of the random numbers only belongs to it
+        while a random number can still change the evolution, the counters never do. None if the world is the whole
+        state (the default).
+        """
+        return None
+
 class Weird_LGCA(Model):
     """
     This model is a test model. There are 1 type of particle:
@@ -23,6 +84,8 @@ class Weird_LGCA(Model):
 
     Particularity: It is better that W and H are multiple of 3.
     """
+    numpy_compatible = True
+
     def interaction_function(self, world):
         mask = world[:, :, 4] == 1
         # exchange values of index 0 and 2 or 1 and 3 if mask is True
@@ -41,7 +104,9 @@ class Weird_LGCA(Model):
         return world
 
     def draw_function(self, world):
-        res = np.zeros((self.size[0], self.size[1], 3))
+        # each cell is drawn in a 3x3 block, the frame can be larger than the world (W or H not multiple of 3)
+        shape = (self.size[0], self.size[1]) if world.shape[:2] == (self.size[0] // 3, self.size[1] // 3) else (3 * world.shape[0], 3 * world.shape[1])
+        res = np.zeros(shape + (3,))
         res[0::3, 1::3, :] = np.asarray([world[:, :, 0], world[:, :, 0], world[:, :, 0]]).transpose((1, 2, 0))
         res[1::3, 0::3, :] = np.asarray([world[:, :, 1], world[:, :, 1], world[:, :, 1]]).transpose((1, 2, 0))
         res[2::3, 1::3, :] = np.asarray([world[:, :, 2], world[:, :, 2], world[:, :, 2]]).transpose((1, 2, 0))
@@ -53,9 +118,10 @@ class Weird_LGCA(Model):
 
     def init_world(self, W, H):
         self.size = (W, H)
-        init = torch.zeros((W // 3, H // 3, 5), dtype=torch.uint8)
+        init = Arrays.zeros((W // 3, H // 3, 5), "uint8", numpy=self.numpy)
         init[:, 0, 4] = init[0, :, 4] = init[:, -1, 4] = init[-1, :, 4] = 1
-        init[np.random.randint(1, W // 3 - 2, W), np.random.randint(1, H // 3 - 2, W), np.random.randint(1, 4, W)] = 1
+        draws = Arrays.arange(W, numpy=self.numpy)
+        init[self.rng.randint(1, W // 3 - 2, -1, draws, 0, stream=0), self.rng.randint(1, H // 3 - 2, -1, draws, 0, stream=1), self.rng.randint(1, 4, -1, draws, 0, stream=2)] = 1
         return init
 
 class Depth_Aware_Lattices(Model):
@@ -63,31 +129,65 @@ class Depth_Aware_Lattices(Model):
     This model implements a depth awareness for the lattices (depth = depth in a aggregation of alive lattices).
     Each step, each cell communicates to its neighbors its known depth. Then each cell depth become the minimum received depth and add 1.
     Finaly all dead cells remain dead and send nothing around them.
+
+    The iterations converge to the Manhattan distance to the nearest dead cell, in as many steps as the radius of the
+    largest aggregation. solve computes this fixed point directly.
     """
+    numpy_compatible = True
+
     def interaction_function(self, world):
         # Identify dead cells
         mask = world[:, :, 4] == 0
 
         # State updating
-        world[:, :, 4] = torch.min(world[:, :, 0:4], dim=2).values + 1
+        world[:, :, 4] = Arrays.amin(world[:, :, 0:4], 2) + 1
         # neutral channel     =       min of communication channels                  + 1
 
         # Killing cells that were dead but have been updated
         world[:, :, 4][mask] = 0
 
-        # Sending updated state
-        world[:, :, 0:4] = torch.stack([world[:, :, 4], world[:, :, 4], world[:, :, 4], world[:, :, 4]], dim=-1)-1
-        world = torch.where(world < 0, 0, world)
+        # Sending updated state (dead cells send 0)
+        world[:, :, 0:4] = Arrays.stack([world[:, :, 4], world[:, :, 4], world[:, :, 4], world[:, :, 4]], -1)
         return world
 
+    def solve(self, world):
+        """
+        Returns the world at the fixed point of the interaction, as after a step: the depth of each alive cell is its
+        Manhattan distance on the torus to the nearest dead cell, computed with a distance transform in linear time.
+        """
+        dead = world[:, :, 4] == 0
+        if not dead.any():
+            raise ValueError("There is no fixed point without dead cells, the depths grow forever")
+
+        depth = Arrays.where(dead, 0, world.shape[0] + world.shape[1])
+        # the Manhattan distance transform is separable: 1D transform along x, then along y
+        depth = ring_distance_transform(ring_distance_transform(depth, 0), 1)
+
+        # each cell received the depth of its neighbors during the transport
+        res = Arrays.empty_like(world)
+        res[:, :, 4] = depth
+        res[:, :, 0], res[:, :, 1] = Arrays.roll(depth, -1, 0), Arrays.roll(depth, -1, 1)
+        res[:, :, 2], res[:, :, 3] = Arrays.roll(depth, 1, 0), Arrays.roll(depth, 1, 1)
+        return res
+
     def init_world(self, W, H):
         self.target_depth = 7
         self.size = (W, H)
-        init = torch.distributions.Bernoulli(0.9).sample(torch.Size([self.size[0], self.size[1], 5]))
+        x, y = CellRandom.grid(self.size, numpy=self.numpy)
+        init = Arrays.cast(Arrays.stack([self.rng.bernoulli(0.9, -1, x, y, stream=channel) for channel in range(5)], -1), "float32")
         return init
 
+    def observables(self):
+        return {
+            "alive": lambda world: (world[:, :, 4] > 0).sum(),
+            "max_depth": lambda world: world[:, :, 4].max(),
+        }
+
+    def components(self):
+        return {"aggregates": lambda world: world[:, :, 4] > 0}
+
     def draw_function(self, world):
-        res = np.asarray([torch.zeros(self.size), world[:, :, 4]/self.target_depth, torch.zeros(self.size)]).transpose((1, 2, 0))
+        res = np.asarray([np.zeros(world.shape[:2], dtype=np.float32), world[:, :, 4]/self.target_depth, np.zeros(world.shape[:2], dtype=np.float32)]).transpose((1, 2, 0))
         res[res[:, :, 1] == 0] = (0.2, 0.15, 0)
         return res
 
@@ -95,23 +195,28 @@ class Naive_Seed_Square(Model):
     """
     This model implements the growing of a seed into a simple square of size seed_value*2.
     """
+    numpy_compatible = True
+
     def interaction_function(self, world):
         # Growing of a new cell
-        world[:, :, 4] = torch.max(world, dim=2).values
+        world[:, :, 4] = Arrays.amax(world, 2)
 
         # Transmitting state
-        world[:, :, :4] = torch.stack([world[:, :, 4], world[:, :, 4], world[:, :, 4], world[:, :, 4]], dim=-1) - 1
+        world[:, :, :4] = Arrays.stack([world[:, :, 4], world[:, :, 4], world[:, :, 4], world[:, :, 4]], -1) - 1
         return world
 
     def init_world(self, W, H):
         self.size = (W, H)
         self.seed_value = 200
-        init = torch.zeros((W, H, 5), dtype=torch.int16)
+        init = Arrays.zeros((W, H, 5), "int16", numpy=self.numpy)
         init[W//2, H//2, :] = self.seed_value
         return init
 
+    def observables(self):
+        return {"grown": lambda world: (world[:, :, 4] > 0).sum()}
+
     def draw_function(self, world):
-        res = np.asarray([torch.zeros(self.size), world[:, :, 4] / (self.seed_value+1), torch.zeros(self.size)]).transpose((1, 2, 0))
+        res = np.asarray([np.zeros(world.shape[:2], dtype=np.float32), world[:, :, 4] / (self.seed_value+1), np.zeros(world.shape[:2], dtype=np.float32)]).transpose((1, 2, 0))
         return res
 
 class Moving_Lattices(Model):
@@ -129,7 +234,7 @@ class Moving_Lattices(Model):
     RESERVATION = 9
 
     def interaction_function(self, world):
-        def fct(channels):
+        def fct(channels, turn, new_direction):
             # air lattices interactions
             if channels[4] == 0:
                 # if there is a seed in one communication channel, resulting in a new moving lattice
@@ -156,8 +261,7 @@ class Moving_Lattices(Model):
             elif channels[4] == 1:
                 if Moving_Lattices.MOVE in channels[int(((channels[5] + 2) % 4).item())]:
                     direction = channels[5].clone().item()
-                    if torch.distributions.Bernoulli(0.05).sample(torch.Size([1]))[0]: direction = torch.randint(0, 4, (
-                    1,)).item()
+                    if turn: direction = new_direction
                     channels[:] = 0
                     channels[direction] = Moving_Lattices.SEED + direction
                 elif Moving_Lattices.STOP in channels[
@@ -171,19 +275,41 @@ class Moving_Lattices(Model):
                 channels[:4] = torch.where(channels[:4] == Moving_Lattices.RESERVATION, Moving_Lattices.STOP, 0).roll(2)
             return channels
 
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                world[x, y] = fct(world[x, y])
+        # random numbers of all the cells, drawn at once: a moving lattice turns with probability 0.05
+        self.t += 1
+        x, y = self.cells(world)
+        turn = self.rng.bernoulli(0.05, self.t, x, y, stream=0).tolist()
+        new_direction = self.rng.randint(0, 4, self.t, x, y, stream=1).tolist()
+
+        for x in range(world.shape[0]):
+            for y in range(world.shape[1]):
+                world[x, y] = fct(world[x, y], turn[x][y], new_direction[x][y])
         return world
 
     def init_world(self, W, H, nb_lattices=None):
         if nb_lattices is None: nb_lattices = W*2
         self.size = (W, H)
+        self.t = 0
         init = torch.zeros((W, H, 6), dtype=torch.int8)
-        init[torch.randint(0, W, (nb_lattices,)), torch.randint(0, H, (nb_lattices,)), 4] = 1
-        init[:, :, 5] = torch.where(init[:, :, 4] == 1, torch.randint(0, 4, self.size), init[:, :, 1])
+        draws = torch.arange(nb_lattices)
+        init[self.rng.randint(0, W, -1, draws, 0, stream=0), self.rng.randint(0, H, -1, draws, 0, stream=1), 4] = 1
+        init[:, :, 5] = torch.where(init[:, :, 4] == 1, self.rng.randint(0, 4, -1, *CellRandom.grid(self.size), stream=2), init[:, :, 1])
         return init
 
+    def observables(self):
+        # a moving lattice is a SEED signal in a communication channel of an air lattice during its move
+        return {
+            "moving": lambda world: (world[:, :, 4] == 1).sum() + (world[:, :, :4] >= Moving_Lattices.SEED).sum(),
+            "resting": lambda world: (world[:, :, 4] == 2).sum(),
+        }
+
+    def components(self):
+        return {"clusters": lambda world: world[:, :, 4] == 2}
+
+    def cycle_state(self, world):
+        # only the moving lattices turn at random, and none is created once they are all at rest
+        return self.t if self.observables()["moving"](world) > 0 else None
+
     def draw_function(self, world):
         moving_lattices_mask = (world[:, :, 4] == 1) | (world[:, :, 0] >= 10) | (world[:, :, 1] >= 10) | (world[:, :, 2] >= 10) | (world[:, :, 3] >= 10)
         resting_lattices_mask = world[:, :, 4] == 2
@@ -240,7 +366,7 @@ class Reproducing_Pairs(Model):
     CLOCK_CHANNEL = 8
 
     def interaction_function(self, world):
-        def fct(channels):
+        def fct(channels, choice):
             # Interactions
             if channels[Reproducing_Pairs.STATE_CHANNEL] == 0:  # air
                 # if there is a seed in one communication channel, resulting in a new free lattice
@@ -272,7 +398,7 @@ class Reproducing_Pairs(Model):
                         channels[Reproducing_Pairs.COMM_CHANNELS] = torch.where(channels[Reproducing_Pairs.COMM_CHANNELS] == Reproducing_Pairs.SIGNAL_PAIR_RESERVATION, Reproducing_Pairs.SIGNAL_MOVE, 0).roll(2).to(torch.int16)
                     # there are more than 1 reservation
                     else:
-                        channels[torch.where(channels == Reproducing_Pairs.SIGNAL_PAIR_RESERVATION)[0][torch.randint(0, torch.sum(channels[channels == Reproducing_Pairs.SIGNAL_PAIR_RESERVATION])/Reproducing_Pairs.SIGNAL_PAIR_RESERVATION, (1,)).item()]] = channels[channels != Reproducing_Pairs.SIGNAL_PAIR_RESERVATION] = 0
+                        channels[torch.where(channels == Reproducing_Pairs.SIGNAL_PAIR_RESERVATION)[0][int(choice * torch.sum(channels[channels == Reproducing_Pairs.SIGNAL_PAIR_RESERVATION]).item() / Reproducing_Pairs.SIGNAL_PAIR_RESERVATION)]] = channels[channels != Reproducing_Pairs.SIGNAL_PAIR_RESERVATION] = 0
                         channels[channels == Reproducing_Pairs.SIGNAL_PAIR_RESERVATION] = 0
                         channels[Reproducing_Pairs.COMM_CHANNELS] = torch.roll(channels[Reproducing_Pairs.COMM_CHANNELS], 2)
 
@@ -302,7 +428,7 @@ class Reproducing_Pairs(Model):
                         if dir_grabbed == channels[Reproducing_Pairs.DIR_CHANNEL]:  # flip
                             channels[Reproducing_Pairs.DIR_CHANNEL] = (channels[Reproducing_Pairs.DIR_CHANNEL] + 2) % 4
                         channels[Reproducing_Pairs.MEMORY_CHANNEL] = 1
-                        return fct(channels)
+                        return fct(channels, choice)
 
                     # You have been grabbed !
                     # set all comm channels to FLIP, except the one to dir_grabbed which must be GRABED and if a travelling pair tries to make a reservation
@@ -429,14 +555,19 @@ class Reproducing_Pairs(Model):
                     channels[Reproducing_Pairs.MEMORY_CHANNEL] = 0
             return channels
 
-        for x in range(self.size[0]):
-            for y in range(self.size[1]):
-                world[x, y] = fct(world[x, y])
+        # random numbers of all the cells, drawn at once: choice of a pair reservation among several
+        self.t += 1
+        choice = self.rng.uniform(self.t, *self.cells(world)).tolist()
+
+        for x in range(world.shape[0]):
+            for y in range(world.shape[1]):
+                world[x, y] = fct(world[x, y], choice[x][y])
         return world
 
     def init_world(self, W, H, nb_lattices=None):
         if nb_lattices is None: nb_lattices = W*3
         self.size = (W, H)
+        self.t = 0
         self.reproductions_number = 0
         init = torch.zeros((W, H, 9), dtype=torch.int16)
 
@@ -447,9 +578,10 @@ class Reproducing_Pairs(Model):
 
         # Random simulation
         if rand:
-            init[torch.randint(0, W, (nb_lattices,)), torch.randint(0, H, (nb_lattices,)), Reproducing_Pairs.STATE_CHANNEL] = 1
-            init[:, :, Reproducing_Pairs.DIR_CHANNEL] = torch.where(init[:, :, Reproducing_Pairs.STATE_CHANNEL] == 1, torch.randint(0, 4, self.size), init[:, :, Reproducing_Pairs.DIR_CHANNEL])
-            init[:, :, Reproducing_Pairs.DNA_CHANNEL] = torch.where(init[:, :, Reproducing_Pairs.STATE_CHANNEL] == 1, torch.randint(0, 4, self.size), init[:, :, Reproducing_Pairs.DNA_CHANNEL])
+            draws = torch.arange(nb_lattices)
+            init[self.rng.randint(0, W, -1, draws, 0, stream=0), self.rng.randint(0, H, -1, draws, 0, stream=1), Reproducing_Pairs.STATE_CHANNEL] = 1
+            init[:, :, Reproducing_Pairs.DIR_CHANNEL] = torch.where(init[:, :, Reproducing_Pairs.STATE_CHANNEL] == 1, self.rng.randint(0, 4, -1, *CellRandom.grid(self.size), stream=2), init[:, :, Reproducing_Pairs.DIR_CHANNEL])
+            init[:, :, Reproducing_Pairs.DNA_CHANNEL] = torch.where(init[:, :, Reproducing_Pairs.STATE_CHANNEL] == 1, self.rng.randint(0, 4, -1, *CellRandom.grid(self.size), stream=3), init[:, :, Reproducing_Pairs.DNA_CHANNEL])
 
         # toy example horizontal
         if hori:
@@ -471,6 +603,46 @@ class Reproducing_Pairs(Model):
             init[5, 6, Reproducing_Pairs.STATE_CHANNEL], init[5, 6, Reproducing_Pairs.DIR_CHANNEL] = Reproducing_Pairs.STATE_TRAVELLING, 1040
         return init
 
+    def observables(self):
+        state = lambda world: world[:, :, Reproducing_Pairs.STATE_CHANNEL]
+        # free lattices that are moving and travelling pairs that are moving are signals in the communication channels
+        moving_free = lambda world: world[:, :, Reproducing_Pairs.COMM_CHANNELS] // Reproducing_Pairs.SIGNAL_SEED == 1
+        moving_travelling = lambda world: world[:, :, Reproducing_Pairs.COMM_CHANNELS] // Reproducing_Pairs.SIGNAL_TRAVELLING_SEED == 1
+
+        def dna_population(dna):
+            def reduction(world):
+                # the DNA of a travelling lattice is the 2nd digit of its seed, the one of a moving lattice the 2nd digit of its signal
+                lattices = ((state(world) == Reproducing_Pairs.STATE_FREE) | (state(world) == Reproducing_Pairs.STATE_GRABBER) | (state(world) < 0)) & (world[:, :, Reproducing_Pairs.DNA_CHANNEL] == dna)
+                travelling = (state(world) == Reproducing_Pairs.STATE_TRAVELLING) & (world[:, :, Reproducing_Pairs.DNA_CHANNEL] // 10 % 10 == dna)
+                moving = (moving_free(world) | moving_travelling(world)) & (world[:, :, Reproducing_Pairs.COMM_CHANNELS] // 10 % 10 == dna)
+                return lattices.sum() + travelling.sum() + moving.sum()
+            return reduction
+
+        return {
+            "free": lambda world: (state(world) == Reproducing_Pairs.STATE_FREE).sum() + moving_free(world).sum(),
+            "grabber": lambda world: (state(world) == Reproducing_Pairs.STATE_GRABBER).sum(),
+            "travelling": lambda world: (state(world) == Reproducing_Pairs.STATE_TRAVELLING).sum() + moving_travelling(world).sum(),
+            "recovery": lambda world: (state(world) < 0).sum(),
+            "A": dna_population(0),
+            "G": dna_population(1),
+            "T": dna_population(2),
+            "C": dna_population(3),
+            # each reproduction is counted by the 2 lattices of the pair
+            "reproductions": lambda world: self.reproductions_number / 2,
+        }
+
+    def counters(self):
+        # each reproduction is counted by the 2 lattices of the pair
+        return {"reproductions": lambda: self.reproductions_number / 2}
+
+    def cycle_state(self, world):
+        # a choice among several pair reservations can happen at any step
+        return self.t
+
+    def components(self):
+        # the lattices at rest (free, grabbers, pairs and chains being built, recovering): their organisms
+        return {"organisms": lambda world: world[:, :, Reproducing_Pairs.STATE_CHANNEL] != 0}
+
     def draw_function(self, world):
         in_move_lattices_mask = (world[:, :, 0] // Reproducing_Pairs.SIGNAL_SEED == 1) | (world[:, :, 1] // Reproducing_Pairs.SIGNAL_SEED == 1) | (world[:, :, 2] // Reproducing_Pairs.SIGNAL_SEED == 1) | (world[:, :, 3] // Reproducing_Pairs.SIGNAL_SEED == 1)
         grabber_lattices_mask = (world[:, :, Reproducing_Pairs.STATE_CHANNEL] == Reproducing_Pairs.STATE_GRABBER) | (world[:, :, 4] < 0)
@@ -507,6 +679,8 @@ class Game_Of_Life(Model):
 
         current problem: on initialisation, the information for the neighbors isn't transmitted (in automaton, interaction then migration)
     """
+    numpy_compatible = True
+
     def interaction_function(self, world):
         self.step = not self.step
         if self.step:
@@ -515,23 +689,34 @@ class Game_Of_Life(Model):
             world[:, :, 0] = world[:, :, 2] = world[:, :, 1] + world[:, :, 3]
             world[:, :, 1] = world[:, :, 3] = temp
         else:
-            world[:, :, 5] = world[:, :, 5] + ((world[:, :, 0] + world[:, :, 1] + world[:, :, 2] + world[:, :, 3])/2).to(torch.int8)
-            world[:, :, 4] = torch.where(((world[:, :, 5] == 3) | (world[:, :, 4] & (world[:, :, 5] == 2))).to(torch.bool), 1, 0)
+            world[:, :, 5] = world[:, :, 5] + Arrays.cast((world[:, :, 0] + world[:, :, 1] + world[:, :, 2] + world[:, :, 3])/2, "int8")
+            world[:, :, 4] = Arrays.where(Arrays.cast((world[:, :, 5] == 3) | (world[:, :, 4] & (world[:, :, 5] == 2)), "bool"), 1, 0)
             world[:, :, 5] = 0
             world[:, :, 0] = world[:, :, 1] = world[:, :, 2] = world[:, :, 3] = world[:, :, 4]
         return world
 
     def init_world(self, W, H, custom=None):
         self.step = False
-        init = torch.zeros((W, H, 6), dtype=torch.int8)
+        init = Arrays.zeros((W, H, 6), "int8", numpy=self.numpy)
         if custom is None:
             init[5:8, 3, 4] = 1
             init[5:7, 6:8, 4] = 1
         else: init[:, :, 4] = custom
 
-        init[:, :, 0] = init[:, :, 1] = init[:, :, 2] = init[:, :, 3] = torch.where(init[:, :, 4] == 1, 1, 0)
+        init[:, :, 0] = init[:, :, 1] = init[:, :, 2] = init[:, :, 3] = Arrays.where(init[:, :, 4] == 1, 1, 0)
         return init
 
+    def observables(self):
+        return {"alive": lambda world: world[:, :, 4].sum()}
+
+    def components(self):
+        # the objects of the game of life are connected by their diagonals too: use them with connectivity=8
+        return {"objects": lambda world: world[:, :, 4] == 1}
+
+    def cycle_state(self, world):
+        # the next step sums the neighbours or updates the cells
+        return self.step
+
     def draw_function(self, world):
         # Convert the boolean array to a uint8 NumPy array
         numpy_array = world[:, :, 4].astype(np.uint8)
@@ -544,6 +729,24 @@ class Game_Of_Life(Model):
         return res
 
 
+def ring_distance_transform(values, dim):
+    """
+    1D min-plus transform on a ring, along dim: res[i] = min over j of values[j] + |i - j|, |i - j| being the
+    distance on the ring. Since values[j] + i - j = i + (values[j] - j), the part j <= i is a cumulative min (and
+    the part j >= i a reversed one), computed on the values repeated twice to go around the ring.
+    """
+    # the scans are faster along the last, contiguous, dimension
+    values = Arrays.cast(Arrays.movedim(values, dim, -1), "int32")
+    n = values.shape[-1]
+    doubled = Arrays.cat([values, values], -1)
+    numpy = Arrays.is_numpy(values)
+    index = Arrays.cast(Arrays.arange(2*n, numpy=numpy, device=None if numpy else values.device), "int32")
+
+    from_left = (Arrays.cummin(doubled - index, -1) + index)[..., n:]
+    from_right = (Arrays.flip(Arrays.cummin(Arrays.flip(doubled + index, -1), -1), -1) - index)[..., :n]
+    return Arrays.movedim(Arrays.minimum(from_left, from_right), -1, dim)
+
+
 def extract_digit(value, channels_number):
     res = []
     for i in range(channels_number):
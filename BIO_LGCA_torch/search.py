@@ -0,0 +1,205 @@
+"""
+Evolutionary search of initial configurations of a BIO-LGCA model (self-replicating ones for Reproducing_Pairs).
+
+A population of candidate configurations of w x h cells is evaluated as a single batched simulation: the candidates
+are the tiles of a mosaic world simulated by a SparseBioLgcaAuto, each tile being its own torus. The fitness of a
+candidate is the growth of an observable of the model (Model.observables) over the run, computed on the device.
+Between generations, the best candidates are kept, and the others are replaced by children of tournament winners:
+a crossover of 2 parents along x, then each cell replaced by the one of a fresh random configuration with a small
+probability (its random numbers are drawn with CellRandom). The fresh configurations of a generation are drawn at once,
+as a single mosaic world. The whole population stays on the device.
+
+A checkpoint is written after each generation, an interrupted search with the same parameters resumes from it.
+
+Usage: python search.py Reproducing_Pairs --fitness travelling [--tile 32 32] [--population 64] [--generations 100]
+                        [--steps 200] [--elite 8] [--mutation 0.02] [--out search.pt] [--params '{"nb_lattices": 20}']
+"""
+import argparse
+import json
+import os
+import time
+
+import torch
+
+import headless
+from Automaton import SparseBioLgcaAuto
+from CellRandom import CellRandom
+from ExecutionPolicy import ExecutionPolicy
+
+
+def random_configurations(model, tile, n, rng, generation, **params):
+    """
+    @return: (torch.Tensor, n x w x h x C) n random initial configurations of the model, drawn with their own seeds.
+             The cells of the game of life are drawn alive with probability 1/2, unless a custom world is given
+    """
+    configurations = []
+    for i in range(n):
+        model.rng = CellRandom(int(rng.bits(generation, i, 0, stream=3)))
+        if type(model).__name__ == "Game_Of_Life" and "custom" not in params:
+            cells = model.rng.bernoulli(0.5, -1, *CellRandom.grid(tile)).to(torch.int8)
+            configurations.append(model.init_world(tile[0], tile[1], custom=cells, **params))
+        else:
+            configurations.append(model.init_world(tile[0], tile[1], **params))
+    configurations = torch.stack(configurations)
+    if n > 1 and (configurations == configurations[0]).all():
+        raise ValueError(f"The initialization of {type(model).__name__} does not use its random numbers, all the configurations are the same")
+    return configurations
+
+
+def donors(model, tile, n, rng, generation, device=None, **params):
+    """
+    @return: (torch.Tensor, n x w x h x C) n random configurations drawn at once on the device, as the tiles of a single
+             random world of n*w x h cells (nb_lattices being given for each configuration). Unlike the ones of
+             random_configurations, the lattices of a tile can come from a neighbouring one, they are only used to
+             mutate cells
+    """
+    w, h = tile
+    model.rng = CellRandom(int(rng.bits(generation, 0, 0, stream=3)))
+    if "nb_lattices" in params:
+        params = dict(params, nb_lattices=n * params["nb_lattices"])
+    # the tensors created by init_world are created on the device
+    with torch.device(device or "cpu"):
+        if type(model).__name__ == "Game_Of_Life" and "custom" not in params:
+            cells = model.rng.bernoulli(0.5, -1, *CellRandom.grid((n * w, h))).to(torch.int8)
+            world = model.init_world(n * w, h, custom=cells, **params)
+        else:
+            world = model.init_world(n * w, h, **params)
+    return world.to(device).view(n, w, h, -1)
+
+
+def mosaic(model, population, policy):
+    """
+    @param population: (torch.Tensor, P x w x h x C)
+    @return: (SparseBioLgcaAuto) the mosaic world, whose candidate i is the tile of the rows [i*w, (i+1)*w). The random
+             numbers of a cell are drawn with its coordinates in its tile, so that a candidate evolves as alone in a
+             w x h world, wherever its tile is
+    """
+    P, w, h, C = population.shape
+    return SparseBioLgcaAuto((P * w, h), population.reshape(P * w, h, C), model.interaction_function, model.draw_function,
+                             locate=lambda x, y: model.locate(x % w, y % h), tiles=(w, h), policy=policy)
+
+
+def evaluate(model_name, model, population, steps, fitness, policy):
+    """
+    Runs all the candidates at once, and returns their fitness: the growth of the observable over the run
+    @param population: (torch.Tensor, P x w x h x C)
+    @return: (torch.Tensor, P) on the device of the policy
+    """
+    P, w, h, C = population.shape
+    # the reduction of a world, mapped over the candidates in one batched call
+    reduction = torch.vmap(model.observables()[fitness])
+    auto = mosaic(model, population, policy)
+    if model_name == "Game_Of_Life":
+        auto.transport()  # necessary for the game of life, see main.py
+
+    def measure():
+        return reduction(auto.world.view(P, w, h, C)).to(torch.float64)
+
+    start = measure()
+    for _ in range(steps):
+        auto.step()
+    return measure() - start
+
+
+def next_generation(population, fitness, elite, mutation, donors, rng, generation):
+    """
+    @return: the elite candidates, followed by the children of tournaments between random candidates
+    """
+    P, w, h, C = population.shape
+    device = population.device
+    order = torch.argsort(fitness, descending=True)
+    children = P - elite
+    index = torch.arange(children, device=device)
+
+    def tournament(stream):
+        a = rng.randint(0, P, generation, index, 0, stream=stream).to(device)
+        b = rng.randint(0, P, generation, index, 1, stream=stream).to(device)
+        return torch.where(fitness[a] >= fitness[b], a, b)
+
+    # crossover: the rows before the cut come from the first parent, the others from the second one
+    first, second = population[tournament(0)], population[tournament(1)]
+    cut = rng.randint(0, w + 1, generation, index, 0, stream=2).to(device)
+    before = (torch.arange(w, device=device).view(1, -1) < cut.view(-1, 1)).view(children, w, 1, 1)
+    offspring = torch.where(before, first, second)
+
+    # mutation: a cell is replaced by the one of a random configuration
+    x = torch.arange(children * w, device=device).view(children, w, 1)
+    y = torch.arange(h, device=device).view(1, 1, h)
+    mutated = rng.bernoulli(mutation, generation, x, y, stream=4).unsqueeze(-1)
+    offspring = torch.where(mutated, donors, offspring)
+    return torch.cat((population[order[:elite]], offspring))
+
+
+def search(model_name, fitness=None, tile=(32, 32), population=64, generations=100, steps=200, elite=8, mutation=0.02,
+           out="search.pt", seed=0, device=None, **params):
+    """
+    @param fitness: (str) observable of the model whose growth is maximized, its first one by default. It must be
+                    computed from the world: the counters of the model are shared by all the candidates, and rejected
+    @param tile: (w,h) size of a candidate configuration
+    @param population: (int) number of candidates, simulated together
+    @param steps: (int) steps of the evaluation of a candidate
+    @param elite: (int) number of best candidates kept as they are
+    @param mutation: (float) probability that a cell of a child is replaced
+    @param out: (str) checkpoint of the search, the best configuration is also saved in <out>_best.pt
+    @param params: parameters of the init_world of the model (nb_lattices, ...)
+    @return: (best configuration, its fitness)
+    """
+    model = headless.MODELS[model_name]()
+    fitness = fitness or next(iter(model.observables()))
+    if fitness not in model.observables():
+        raise ValueError(f"Unknown observable {fitness} of {model_name}, expected one of {sorted(model.observables())}")
+    if fitness in model.counters():
+        raise ValueError(f"{fitness} is a counter of {model_name}, shared by all the candidates, it can not be a fitness")
+    policy = ExecutionPolicy(device=device, verbose=False)
+    rng = CellRandom(seed)
+    config = {"model_name": model_name, "fitness": fitness, "tile": list(tile), "population": population, "steps": steps,
+              "elite": elite, "mutation": mutation, "seed": seed, "params": params}
+
+    state = torch.load(out) if os.path.exists(out) else None
+    if state is not None and state["config"] == config:
+        first, candidates, history = state["generation"] + 1, state["population"].to(policy.device), state["history"]
+        print(f"Resumed at generation {first}")
+    else:
+        first, history = 0, []
+        candidates = random_configurations(model, tile, population, rng, -1, **params).to(policy.device)
+
+    for generation in range(first, generations):
+        start = time.perf_counter()
+        # draws the mutations first: init_world also resets the state of the model (step counter, clock size, ...)
+        mutations = donors(model, tile, population - elite, rng, generation, policy.device, **params)
+        model.rng = CellRandom(seed)
+        scores = evaluate(model_name, model, candidates, steps, fitness, policy)
+
+        best = int(torch.argmax(scores))
+        history.append({"generation": generation, "best": float(scores[best]), "mean": float(scores.mean())})
+        print(f"generation {generation}: best {history[-1]['best']:.1f}, mean {history[-1]['mean']:.2f} ({time.perf_counter() - start:.1f}s)")
+        torch.save({"configuration": candidates[best].cpu(), "fitness": float(scores[best]), "config": config}, os.path.splitext(out)[0] + "_best.pt")
+
+        candidates = next_generation(candidates, scores, elite, mutation, mutations, rng, generation)
+        # written then renamed, so that an interrupted write never replaces the previous checkpoint
+        torch.save({"config": config, "generation": generation, "population": candidates.cpu(), "history": history}, out + ".tmp")
+        os.replace(out + ".tmp", out)
+
+    best = torch.load(os.path.splitext(out)[0] + "_best.pt")
+    return best["configuration"], best["fitness"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evolutionary search of initial configurations")
+    parser.add_argument("model_name", choices=sorted(headless.MODELS), help="model of models.py")
+    parser.add_argument("--fitness", default=None, help="observable whose growth is maximized, the first one by default")
+    parser.add_argument("--tile", type=int, nargs=2, default=(32, 32), help="size of a configuration")
+    parser.add_argument("--population", type=int, default=64)
+    parser.add_argument("--generations", type=int, default=100)
+    parser.add_argument("--steps", type=int, default=200, help="steps of the evaluation")
+    parser.add_argument("--elite", type=int, default=8, help="number of best configurations kept")
+    parser.add_argument("--mutation", type=float, default=0.02, help="probability that a cell is mutated")
+    parser.add_argument("--out", default="search.pt", help="checkpoint of the search")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--device", default=None, help="torch device of the search")
+    parser.add_argument("--params", default="{}", help="JSON parameters of the initialization (nb_lattices, ...)")
+    args = parser.parse_args()
+
+    configuration, score = search(args.model_name, args.fitness, tuple(args.tile), args.population, args.generations,
+                                  args.steps, args.elite, args.mutation, args.out, args.seed, args.device, **json.loads(args.params))
+    print(f"Best configuration: fitness {score}, saved in {os.path.splitext(args.out)[0]}_best.pt")
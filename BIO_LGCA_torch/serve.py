@@ -0,0 +1,54 @@
+"""
+Runs a model headlessly, and publishes its frames in shared memory for the viewers that attach to it (viewer.py).
+The frames are only drawn while a viewer is watching, the simulation runs at full speed otherwise.
+
+Usage: python serve.py Moving_Lattices 500 500 [--name alife] [--steps N] [--every 1] [--device cuda] [--seed 0]
+       python viewer.py alife    (from any number of other terminals, at any time)
+       With --metrics 9100, the live metrics of the run are exposed on http://127.0.0.1:9100/metrics (see Metrics)
+"""
+import argparse
+import time
+
+import torch
+
+import headless
+from FrameServer import FrameServer
+from Metrics import Metrics
+from Profiler import Profiler
+
+parser = argparse.ArgumentParser(description="Headless run of a model, with a frame server")
+parser.add_argument("model_name", choices=sorted(headless.MODELS), help="model of models.py")
+parser.add_argument("W", type=int)
+parser.add_argument("H", type=int)
+parser.add_argument("--name", default="alife", help="name of the shared memory, given to the viewers")
+parser.add_argument("--steps", type=int, default=None, help="number of steps, endless by default")
+parser.add_argument("--every", type=int, default=1, help="a frame is published every `every` steps")
+parser.add_argument("--device", default=None, help="torch device of the simulation")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--metrics", type=int, default=None, help="port of the metrics endpoint, none by default")
+args = parser.parse_args()
+
+model, auto = headless.make_automaton(args.model_name, args.W, args.H, seed=args.seed, device=None if args.device is None else torch.device(args.device))
+server = FrameServer(args.name, (args.W, args.H))
+metrics = None
+if args.metrics is not None:
+    auto.profiler = Profiler(window=16, synchronize=False, allocations=False)
+    metrics = Metrics(auto, model, port=args.metrics).start()
+print(f"Serving on '{args.name}', watch with: python viewer.py {args.name}")
+
+start = report = time.perf_counter()
+try:
+    while args.steps is None or auto.steps < args.steps:
+        auto.step()
+        if auto.steps % args.every == 0 and server.watched():
+            auto.draw()
+            server.publish(auto.worldmap)
+        if time.perf_counter() - report > 10:
+            report = time.perf_counter()
+            print(f"step {auto.steps}, {auto.steps / (report - start):.1f} steps/s")
+except KeyboardInterrupt:
+    pass
+finally:
+    server.close()
+    if metrics is not None:
+        metrics.close()
@@ -0,0 +1,98 @@
+"""
+Parameter sweep of the BIO-LGCA models, run headlessly on a pool of processes.
+
+The grid is a JSON file mapping each parameter of headless.run to a list of values, for example:
+    {"model_name": ["Moving_Lattices"], "W": [100, 200], "H": [100], "steps": [500],
+     "nb_lattices": [100, 200, 400], "seed": [0, 1, 2]}
+Every combination is a run. The metrics of each run are saved in <out>/runs/<run id>.json as soon as it is
+complete, so an interrupted sweep resumes where it stopped, then all the runs are gathered in <out>/summary.csv.
+
+Usage: python sweep.py grid.json --out sweep [--workers N] [--device cpu]
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+
+import torch
+
+import headless
+from ExecutionPolicy import ExecutionPolicy
+
+
+def combinations(grid):
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def run_id(params):
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def execute(task):
+    path, params, device = task
+    # each process uses a single thread, the parallelism comes from the pool
+    policy = ExecutionPolicy(device=device, intra_threads=1, verbose=False)
+    try:
+        metrics = headless.run(policy=policy, **params)
+    except Exception as e:
+        return params, f"{type(e).__name__}: {e}"
+
+    # written then renamed, so that an interrupted run is never considered complete
+    with open(path + ".tmp", "w") as f:
+        json.dump({"params": params, "metrics": metrics}, f)
+    os.replace(path + ".tmp", path)
+    return params, None
+
+
+def sweep(grid, out, workers=None, device="cpu"):
+    """
+    Runs all the combinations of the grid that are not complete yet, then writes the summary table.
+    @return: (str) path of the summary table
+    """
+    runs_dir = os.path.join(out, "runs")
+    os.makedirs(runs_dir, exist_ok=True)
+
+    tasks = [(os.path.join(runs_dir, run_id(params) + ".json"), params, device) for params in combinations(grid)]
+    todo = [task for task in tasks if not os.path.exists(task[0])]
+    print(f"{len(tasks) - len(todo)} runs already complete, {len(todo)} to run")
+
+    if todo:
+        # spawn instead of fork, so that the workers can use cuda
+        with multiprocessing.get_context("spawn").Pool(workers or os.cpu_count()) as pool:
+            for i, (params, error) in enumerate(pool.imap_unordered(execute, todo), 1):
+                print(f"[{i}/{len(todo)}] {params}" + (f" failed: {error}" if error else ""))
+
+    return summarize(tasks, os.path.join(out, "summary.csv"))
+
+
+def summarize(tasks, path):
+    rows = []
+    for result, _, _ in tasks:
+        if os.path.exists(result):
+            with open(result) as f:
+                run = json.load(f)
+            rows.append({"run_id": os.path.basename(result)[:-len(".json")], **run["params"], **run["metrics"]})
+
+    columns = list(dict.fromkeys(key for row in rows for key in row))
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return path
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parameter sweep of the BIO-LGCA models")
+    parser.add_argument("grid", help="JSON file: parameter -> list of values")
+    parser.add_argument("--out", default="sweep", help="directory of the results")
+    parser.add_argument("--workers", type=int, default=None, help="number of processes, all the cores by default")
+    parser.add_argument("--device", default="cpu", help="torch device of the runs")
+    args = parser.parse_args()
+
+    with open(args.grid) as f:
+        grid = json.load(f)
+    print(f"Summary written in {sweep(grid, args.out, args.workers, torch.device(args.device))}")
@@ -0,0 +1,28 @@
+import headless
+from CycleDetector import CycleDetector
+from ExecutionPolicy import ExecutionPolicy
+
+
+def detect(model_name, W, H, steps, seed=1, **params):
+    model, auto = headless.make_automaton(model_name, W, H, seed=seed, policy=ExecutionPolicy("cpu", verbose=False), **params)
+    auto.cycle_detector = CycleDetector(model=model, on_cycle=lambda start, period: True)
+    for _ in range(steps):
+        auto.step()
+        if auto.cycle_detector.stop_requested:
+            break
+    return model, auto
+
+
+def test_moving_lattices_at_rest():
+    # the step t of the random numbers grows, but once every lattice is at rest the world alone is the state
+    model, auto = detect("Moving_Lattices", 10, 10, 100, nb_lattices=60)
+    assert model.observables()["moving"](auto.world) == 0
+    assert auto.cycle_detector.cycle is not None
+
+
+def test_game_of_life_blinker_period():
+    # a blinker has a period of 2 generations, each one taking 2 steps of the BIO LGCA (Game_Of_Life.step)
+    custom = headless.torch.zeros((10, 10), dtype=headless.torch.int8)
+    custom[4, 3:6] = 1
+    _, auto = detect("Game_Of_Life", 10, 10, 20, custom=custom)
+    assert auto.cycle_detector.cycle[1] == 4
@@ -0,0 +1,36 @@
+import os
+import time
+
+import pytest
+
+from FrameServer import FrameServer, FrameViewer
+
+
+@pytest.fixture
+def name():
+    return f"test_frames_{os.getpid()}"
+
+
+def test_idle_server_is_not_taken_over(name):
+    # no frame is published for several timeouts (a slow step), the server is still alive
+    server = FrameServer(name, (8, 6), timeout=0.2)
+    try:
+        time.sleep(1.)
+        with pytest.raises(FileExistsError):
+            FrameServer(name, (8, 6), timeout=0.2)
+        viewer = FrameViewer(name)
+        assert viewer.open
+        viewer.close()
+    finally:
+        server.close()
+
+
+def test_crashed_server_is_replaced(name):
+    crashed = FrameServer(name, (8, 6), timeout=0.2)
+    # a crash: the heartbeats stop, the shared memory is left behind
+    crashed.stopped.set()
+    crashed.heart.join()
+    time.sleep(0.5)
+    server = FrameServer(name, (8, 6), timeout=0.2)
+    server.close()
+    crashed.shm.close()
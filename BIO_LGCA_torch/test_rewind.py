@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+import Arrays
+import headless
+from ExecutionPolicy import ExecutionPolicy
+from Rewind import Rewind
+
+
+@pytest.mark.parametrize("model_name, backend", [("Moving_Lattices", None), ("Reproducing_Pairs", None), ("Game_Of_Life", "numpy")])
+def test_restore_and_resume(model_name, backend):
+    model, auto = headless.make_automaton(model_name, 24, 20, seed=1, policy=ExecutionPolicy("cpu", backend=backend, verbose=False))
+    rewind = Rewind(auto, model, keyframe_every=8)
+    worlds, states = [Arrays.to_numpy(auto.world).copy()], [dict(vars(model))]
+    for _ in range(30):
+        auto.step()
+        rewind.update()
+        worlds.append(Arrays.to_numpy(auto.world).copy())
+        states.append(dict(vars(model)))
+
+    for step in (0, 5, 8, 13, 30):
+        assert np.array_equal(rewind.world_at(step), worlds[step])
+
+    # the run resumes from a step between 2 keyframes as it went the first time
+    assert rewind.restore(13) == 13
+    assert {name: repr(value) for name, value in vars(model).items()} == {name: repr(value) for name, value in states[13].items()}
+    for step in range(14, 31):
+        auto.step()
+        rewind.update()
+        assert np.array_equal(Arrays.to_numpy(auto.world), worlds[step])
+    assert np.array_equal(rewind.world_at(30), worlds[30])
+
+
+def test_budget_keeps_the_last_keyframe():
+    model, auto = headless.make_automaton("Moving_Lattices", 24, 20, seed=1, policy=ExecutionPolicy("cpu", verbose=False))
+    rewind = Rewind(auto, model, budget=1, keyframe_every=4)
+    for _ in range(10):
+        auto.step()
+        rewind.update()
+    assert rewind.first_step == 8 and rewind.last_step == 10
@@ -0,0 +1,70 @@
+import pytest
+import torch
+
+import headless
+import search
+from Automaton import BioLgcaSquaredAuto
+from CellRandom import CellRandom
+from ExecutionPolicy import ExecutionPolicy
+
+
+def test_tile_evolves_as_a_standalone_world():
+    # each candidate of the mosaic must evolve exactly as the same configuration run alone in a dense world
+    tile, steps = (16, 12), 20
+    model = headless.MODELS["Moving_Lattices"]()
+    population = search.random_configurations(model, tile, 3, CellRandom(0), 0, nb_lattices=12)
+    policy = ExecutionPolicy("cpu", verbose=False)
+
+    model.rng, model.t = CellRandom(5), 0
+    auto = search.mosaic(model, population, policy)
+    for _ in range(steps):
+        auto.step()
+    mosaic = auto.world.view(3, tile[0], tile[1], -1)
+
+    for i in range(3):
+        alone = headless.MODELS["Moving_Lattices"]()
+        alone.init_world(*tile, nb_lattices=12)
+        alone.rng = CellRandom(5)
+        dense = BioLgcaSquaredAuto(tile, population[i].clone(), alone.interaction_function, alone.draw_function, policy=policy)
+        for _ in range(steps):
+            dense.step()
+        assert torch.equal(mosaic[i], dense.world)
+
+
+def test_configurations_differ():
+    configurations = search.random_configurations(headless.MODELS["Game_Of_Life"](), (8, 8), 4, CellRandom(0), 0)
+    assert len({configuration.numpy().tobytes() for configuration in configurations}) == 4
+
+    with pytest.raises(ValueError):
+        search.random_configurations(headless.MODELS["Naive_Seed_Square"](), (8, 8), 4, CellRandom(0), 0)
+
+
+def test_counters_are_not_fitnesses(tmp_path):
+    with pytest.raises(ValueError):
+        search.search("Reproducing_Pairs", "reproductions", tile=(8, 8), population=2, generations=1, steps=1, elite=1, out=str(tmp_path / "search.pt"))
+
+
+@pytest.mark.parametrize("model_name, params", [("Moving_Lattices", {"nb_lattices": 6}), ("Reproducing_Pairs", {}), ("Game_Of_Life", {})])
+def test_donors(model_name, params):
+    model = headless.MODELS[model_name]()
+    donors = search.donors(model, (8, 6), 5, CellRandom(0), 3, **params)
+    alone = model.init_world(8, 6, **params)
+    assert donors.shape == (5,) + tuple(alone.shape) and donors.dtype == alone.dtype
+    assert len({donor.numpy().tobytes() for donor in donors}) > 1
+
+
+def test_fitness_of_each_candidate():
+    # the batched reduction gives the growth of the observable in each tile
+    model = headless.MODELS["Moving_Lattices"]()
+    population = search.random_configurations(model, (12, 10), 4, CellRandom(0), 0, nb_lattices=10)
+    policy = ExecutionPolicy("cpu", verbose=False)
+    model.rng, model.t = CellRandom(5), 0
+    scores = search.evaluate("Moving_Lattices", model, population, 15, "resting", policy)
+
+    resting = model.observables()["resting"]
+    model.rng, model.t = CellRandom(5), 0
+    auto = search.mosaic(model, population, policy)
+    for _ in range(15):
+        auto.step()
+    world = auto.world.view(population.shape)
+    assert scores.tolist() == [float(resting(world[i]) - resting(population[i])) for i in range(4)]
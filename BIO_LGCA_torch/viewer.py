@@ -0,0 +1,55 @@
+"""
+Viewer of a simulation published by a FrameServer (see serve.py), in its own process: the simulation does not pay
+for the display, and several viewers can watch the same run. Closing the viewer does not stop the simulation.
+
+Usage: python viewer.py <name of the frame server> [--fps 60]
+"""
+import argparse
+
+import pygame
+
+from Camera import Camera
+from FrameServer import FrameViewer
+
+parser = argparse.ArgumentParser(description="Viewer of a frame server")
+parser.add_argument("name", help="name of the shared memory of the frame server")
+parser.add_argument("--fps", type=int, default=60, help="maximal number of frames per second")
+args = parser.parse_args()
+
+viewer = FrameViewer(args.name)
+W, H = viewer.size
+
+# Initialize the pygame screen
+pygame.init()
+screen = pygame.display.set_mode((W, H), flags=pygame.SCALED | pygame.RESIZABLE)
+pygame.display.set_caption(f"{args.name}")
+clock = pygame.time.Clock()
+camera = Camera(W, H)
+surface = pygame.Surface((W, H))
+incoming = pygame.Surface((W, H))
+
+running = True
+last_seq = None
+while running and viewer.open:
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+        camera.handle_event(event)
+
+    viewer.beat()
+    seq, frame = viewer.latest()
+    if seq is not None and seq != last_seq:
+        # copied from the shared memory in a second surface, then shown only if the server did not overwrite it meanwhile
+        pygame.surfarray.blit_array(incoming, frame)
+        if viewer.valid(seq):
+            surface, incoming = incoming, surface
+            last_seq = seq
+
+    screen.blit(camera.apply(surface), (0, 0))
+    pygame.display.flip()
+    clock.tick(args.fps)
+
+if not viewer.open:
+    print("The frame server is closed")
+viewer.close()
+pygame.quit()
@@ -1,7 +1,14 @@
 import numpy as np
-import torch
 import time
 
+try:
+    import torch
+except ImportError:  # only the numpy backend of GOLAuto is available
+    torch = None
+
+from ExecutionPolicy import ExecutionPolicy
+from MemmapWorld import MemmapWorld
+
 class Automaton:
     """
         Class that internalizes the rules and evolution of 
@@ -24,7 +31,8 @@ class Automaton:
 
         # This self._worldmap should be changed in the draw function.
         # It should contains floats from 0 to 1 of RGB values.
-        self._worldmap = np.random.uniform(size=(self.w, self.h, 3))
+        # Zeros are only allocated when written, which keeps the worlds larger than the screen cheap when not drawn.
+        self._worldmap = np.zeros((self.w, self.h, 3))
 
     def step(self):
         # Should you ABC abstract classes but oh well.
@@ -40,26 +48,252 @@ class Automaton:
 
 
 class GOLAuto(Automaton):
-    def __init__(self, size, init_state=None):
+    def __init__(self, size, init_state=None, policy=None):
         """
             GOL on GPU
 
             @param size: (W,H)
-            @param init_state: (torch.BoolTensor) initial state of the world, if None, random
+            @param init_state: (torch.BoolTensor, or np.ndarray) initial state of the world, if None, random
+            @param policy: (ExecutionPolicy) device, dtype, threads and backend, ExecutionPolicy() by default. With the
+                           numpy backend, the world is a np.ndarray
         """
         super().__init__(size)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Running on {'GPU' if torch.cuda.is_available() else 'CPU'}")
-        self.world = torch.rand((size[0], size[1]), device=self.device) > 0.5 if init_state is None else init_state.to(self.device)
+        self.policy = ExecutionPolicy() if policy is None else policy
+        self.policy.apply()
+        self.device = self.policy.device
+        if init_state is None:
+            init_state = np.random.rand(size[0], size[1]) > 0.5 if self.policy.numpy else torch.rand((size[0], size[1]), device=self.device) > 0.5
+        self.world = self.policy.prepare(init_state)
+        self.rule = life_numpy if self.policy.numpy else self.policy.compile(life)
+
+        # number of steps done, and optional CycleDetector updated after each step
+        self.steps = 0
+        self.cycle_detector = None
 
     def step(self):
-        neigh = torch.zeros(self.size, dtype=torch.uint8).to(self.device)
-        for i in (-1, 0, 1):
-            for j in (-1, 0, 1):
-                if i == j == 0: continue
-                neigh += self.world.roll((i, j), dims=(0, 1))
-        # apply the rules
-        self.world = (neigh == 3) | (self.world & (neigh == 2))
+        self.world = self.rule(self.world)
+        self.steps += 1
+
+        if self.cycle_detector is not None:
+            self.cycle_detector.update(self)
 
     def draw(self):
-        self._worldmap = self.world.unsqueeze(2).repeat(1, 1, 3).float().cpu().numpy()
\ No newline at end of file
+        if self.policy.numpy:
+            self._worldmap = np.repeat(self.world[:, :, None], 3, axis=2).astype(np.float32)
+            return
+        self._worldmap = self.world.unsqueeze(2).repeat(1, 1, 3).float().cpu().numpy()
+
+
+class LtLAuto(GOLAuto):
+    # methods of the neighbourhood sums
+    METHODS = ("rolls", "sat", "fft")
+
+    def __init__(self, size, init_state=None, radius=1, birth=(3, 3), survive=(2, 3), middle=False, neighbourhood="moore", method=None, policy=None):
+        """
+            Larger than Life: outer totalistic automaton of radius R, a dead cell is born if the number of alive cells
+            in its neighbourhood is in the birth range, an alive cell survives if it is in the survive range.
+            The default parameters are the game of life.
+
+            @param radius: (int) R, the Moore neighbourhood is the (2R+1)x(2R+1) square around the cell
+            @param birth: (int, int) inclusive range of the sums of a birth
+            @param survive: (int, int) inclusive range of the sums of a survival
+            @param middle: (bool) if True, the cell itself is counted in its sum
+            @param neighbourhood: (str) "moore" (square) or "von_neumann" (diamond |dx| + |dy| <= R)
+            @param method: (str) how the sums are computed: "rolls" (one roll per cell of the neighbourhood),
+                           "sat" (toroidal summed-area tables, O(1) per cell for any R, only for the Moore
+                           neighbourhood) or "fft" (convolution). If None, rolls for R = 1, otherwise the fastest
+                           of sat and fft on the initial world
+        """
+        if neighbourhood not in ("moore", "von_neumann"):
+            raise ValueError(f"Unknown neighbourhood {neighbourhood}, expected moore or von_neumann")
+        if method is not None and method not in self.METHODS:
+            raise ValueError(f"Unknown method {method}, expected one of {self.METHODS}")
+        if method == "sat" and neighbourhood != "moore":
+            raise ValueError("The summed-area tables only compute the sums of the Moore neighbourhood")
+        if 2 * radius + 1 > min(size):
+            raise ValueError(f"The neighbourhood of radius {radius} is larger than the world")
+
+        super().__init__(size, init_state, policy)
+        if self.policy.numpy:
+            raise ValueError("LtLAuto has no numpy backend")
+        self.radius = radius
+        self.birth = birth
+        self.survive = survive
+        self.middle = middle
+        self.neighbourhood = neighbourhood
+        # offsets of the cells of the neighbourhood, without the cell itself
+        self.offsets = [(i, j) for i in range(-radius, radius + 1) for j in range(-radius, radius + 1)
+                        if (i, j) != (0, 0) and (neighbourhood == "moore" or abs(i) + abs(j) <= radius)]
+        kernel = torch.zeros(size, device=self.device)
+        for i, j in self.offsets:
+            kernel[i % size[0], j % size[1]] = 1
+        self.kernel = torch.fft.rfft2(kernel)
+
+        if method is None:
+            # the cheapest method is measured on the initial world
+            # the rolls cost (2R+1)^2 operations per cell, they are only worth it for R = 1
+            candidates = ["rolls"] if radius <= 1 else [m for m in ("sat", "fft") if m != "sat" or neighbourhood == "moore"]
+            method = min(candidates, key=self.time_sums) if len(candidates) > 1 else candidates[0]
+        self.method = method
+        self.rule = self.policy.compile(self.next)
+
+    @classmethod
+    def from_rule(cls, size, rule, init_state=None, method=None, policy=None):
+        """
+        @param rule: (str) rule in the format of Golly, e.g. "R5,C0,M1,S34..58,B34..45,NM" (Bosco's rule)
+        """
+        params = parse_rule(rule)
+        return cls(size, init_state, method=method, policy=policy, **params)
+
+    def time_sums(self, method):
+        # a first call warms the method up (allocations, fft plans), the second one is timed
+        self.method = method
+        self.sums(self.world)
+        self.policy.synchronize()
+        start = time.perf_counter()
+        self.sums(self.world)
+        self.policy.synchronize()
+        return time.perf_counter() - start
+
+    def sums(self, world):
+        """
+        @return: (torch.IntTensor) number of alive cells in the neighbourhood of each cell, the cell excluded
+        """
+        if self.method == "rolls":
+            sums = torch.zeros(world.shape, dtype=torch.int32, device=world.device)
+            for i, j in self.offsets:
+                sums += world.roll((i, j), dims=(0, 1))
+            return sums
+        if self.method == "fft":
+            return torch.fft.irfft2(torch.fft.rfft2(world.float()) * self.kernel, s=world.shape).round().to(torch.int32)
+        return box_sum(box_sum(world.to(torch.int32), self.radius, 0), self.radius, 1) - world.to(torch.int32)
+
+    def next(self, world):
+        sums = self.sums(world)
+        if self.middle:
+            sums += world.to(torch.int32)
+        born = ~world & (sums >= self.birth[0]) & (sums <= self.birth[1])
+        survives = world & (sums >= self.survive[0]) & (sums <= self.survive[1])
+        return born | survives
+
+
+def box_sum(values, radius, dim):
+    """
+    Sums of the values in the windows [i - radius, i + radius] along dim, on the torus: differences of a cumulative
+    sum of the values padded by the wrapped radius on each side, O(1) per cell for any radius. Applied along both
+    dimensions, it gives the sums of the (2R+1)x(2R+1) squares from a toroidal summed-area table.
+    """
+    n = values.shape[dim]
+    padded = torch.cat((values.narrow(dim, n - radius, radius), values, values.narrow(dim, 0, radius)), dim=dim)
+    cumulated = padded.cumsum(dim, dtype=torch.int32)
+    # sum of padded[i..i+2R] = cumulated[i+2R] - cumulated[i] + padded[i]
+    return cumulated.narrow(dim, 2 * radius, n) - cumulated.narrow(dim, 0, n) + padded.narrow(dim, 0, n)
+
+
+def parse_rule(rule):
+    """
+    Parses a Larger than Life rule in the format of Golly: R<radius>,C<states>,M<0|1>,S<min>..<max>,B<min>..<max>,N<M|N>
+    @return: dict of the parameters of LtLAuto
+    """
+    params = {"radius": 1, "middle": False, "neighbourhood": "moore"}
+    for part in rule.replace(" ", "").upper().split(","):
+        if not part:
+            raise ValueError(f"Empty part in the rule {rule}")
+        key, value = part[0], part[1:]
+        if key == "R":
+            params["radius"] = int(value)
+        elif key == "C":
+            if int(value) > 2:
+                raise ValueError(f"Only the rules of 2 states are supported, not {part}")
+        elif key == "M":
+            params["middle"] = value == "1"
+        elif key in "SB":
+            low, high = value.split("..") if ".." in value else (value, value)
+            params["survive" if key == "S" else "birth"] = (int(low), int(high))
+        elif key == "N":
+            if value not in ("M", "N"):
+                raise ValueError(f"Unknown neighbourhood {part}, expected NM (Moore) or NN (von Neumann)")
+            params["neighbourhood"] = "moore" if value == "M" else "von_neumann"
+        else:
+            raise ValueError(f"Unknown part {part} of the rule {rule}")
+    return params
+
+
+class MemmapGOLAuto(Automaton):
+    def __init__(self, size, directory, init_state=None, band=256, view=(1024, 1024), policy=None):
+        """
+            GOL on a world larger than the memory, stored in memory-mapped files (see MemmapWorld), the bands being
+            computed on the device of the policy. Only a view of the world is drawn.
+
+            @param size: (W,H)
+            @param directory: (str) directory of the files, the run resumes from it if it already has a world of this size
+            @param init_state: function(x0, x1) -> (torch.BoolTensor, (x1-x0)xH) rows of the initial world, random if None
+            @param band: (int) number of rows of a band
+            @param view: (w,h) size of the drawn region of the world, whose top left corner is self.origin
+            @param policy: (ExecutionPolicy) device, threads and backend, ExecutionPolicy() by default
+        """
+        # the worldmap only covers the view
+        super().__init__((min(view[0], size[0]), min(view[1], size[1])))
+        self.w, self.h = self.size = size
+        self.origin = (0, 0)
+        self.policy = ExecutionPolicy() if policy is None else policy
+        if self.policy.numpy:
+            raise ValueError("MemmapGOLAuto has no numpy backend")
+        self.policy.apply()
+        self.device = self.policy.device
+        self.rule = self.policy.compile(life)
+
+        self.storage = MemmapWorld(directory, size, np.bool_, axis=0, band=band, halo=1)
+        if self.storage.created:
+            self.storage.fill((lambda x0, x1: torch.rand((x1 - x0, self.h)) > 0.5) if init_state is None else init_state)
+        self.steps = self.storage.steps
+        self.cycle_detector = None
+
+    @property
+    def world(self):
+        """
+        Current world, a cpu tensor mapped on its file: slices of it are only read from the disk when used
+        """
+        return torch.from_numpy(self.storage.current)
+
+    def step(self):
+        # the rows of the halo are wrong after the rule (the band is not a torus along x), they are dropped
+        self.storage.step(lambda band, x0, x1: self.rule(band.to(self.device))[1:-1])
+        self.steps += 1
+
+        if self.cycle_detector is not None:
+            self.cycle_detector.update(self)
+
+    def draw(self):
+        x, y = self.origin
+        w, h = self._worldmap.shape[:2]
+        region = np.take(np.take(self.storage.current, np.arange(x, x + w) % self.w, axis=0), np.arange(y, y + h) % self.h, axis=1)
+        self._worldmap = np.repeat(region[:, :, None], 3, axis=2).astype(np.float32)
+
+    def close(self):
+        self.storage.close()
+
+
+def life(world):
+    neigh = torch.zeros(world.shape, dtype=torch.uint8, device=world.device)
+    for i in (-1, 0, 1):
+        for j in (-1, 0, 1):
+            if i == j == 0: continue
+            neigh += world.roll((i, j), dims=(0, 1))
+    # apply the rules
+    return (neigh == 3) | (world & (neigh == 2))
+
+
+def life_numpy(world):
+    """
+    life on a np.ndarray: the sums of the 3x3 squares are computed separably (rows, then columns), in place
+    """
+    rows = world.astype(np.uint8)
+    rows += np.roll(world, 1, axis=0)
+    rows += np.roll(world, -1, axis=0)
+    neigh = rows.copy()
+    neigh += np.roll(rows, 1, axis=1)
+    neigh += np.roll(rows, -1, axis=1)
+    neigh -= world
+    # apply the rules
+    return (neigh == 3) | (world & (neigh == 2))
@@ -0,0 +1,87 @@
+import math
+
+import numpy as np
+import pygame
+
+
+class LodCamera:
+    """
+        Camera over a world larger than the screen, that can zoom out until the whole world is visible.
+        It renders the view from the level of a Pyramid whose pixels are at least one screen pixel,
+        so that the frame transferred from the device is never larger than the screen.
+    """
+
+    def __init__(self, width, height, world_size, max_zoom=20):
+        """
+            @param width, height: (int) size of the screen
+            @param world_size: (W,H) size of the world
+        """
+        self.size = pygame.Rect(0, 0, width, height)
+        self.world = pygame.Rect(0, 0, *world_size)
+        self.position = pygame.Vector2(self.world.center)  # world coordinates of the center of the screen
+        self.min_zoom = min(1., width / world_size[0], height / world_size[1])
+        self.max_zoom = max_zoom
+        self.zoom = self.min_zoom  # screen pixels per cell
+        self.drag_start = None
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if event.button == 4:  # Scroll wheel up
+                self.zoom *= 1.1
+            elif event.button == 5:  # Scroll wheel down
+                self.zoom /= 1.1
+            elif event.button == 1:  # Left mouse button
+                self.drag_start = pygame.mouse.get_pos()
+            self.zoom = max(min(self.zoom, self.max_zoom), self.min_zoom)
+
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if event.button == 1:  # Left mouse button
+                self.drag_start = None
+        elif event.type == pygame.MOUSEMOTION:
+            if self.drag_start is not None:
+                x, y = event.pos
+                x0, y0 = self.drag_start
+                self.position.x += (x0 - x) / self.zoom
+                self.position.y += (y0 - y) / self.zoom
+                self.drag_start = event.pos
+
+        self.constrainCam()
+
+    def constrainCam(self):
+        # the view stays in the world, centered if the world is smaller than it
+        for axis, screen, world in ((0, self.size.w, self.world.w), (1, self.size.h, self.world.h)):
+            half = screen / self.zoom / 2
+            self.position[axis] = world / 2 if 2 * half >= world else max(min(self.position[axis], world - half), half)
+
+    @property
+    def level(self):
+        # level whose pixels cover at least one screen pixel
+        return max(0, math.ceil(math.log2(1 / self.zoom) - 1e-9))
+
+    def render(self, pyramid):
+        """
+        @param pyramid: (Pyramid) of the world
+        @return: (pygame.Surface) view of the screen
+        """
+        level = min(self.level, len(pyramid.sizes) - 1)
+        scale = 2 ** level
+        w, h = pyramid.sizes[level]
+
+        # visible region, in pixels of the level
+        x0 = self.position.x - self.size.w / self.zoom / 2
+        y0 = self.position.y - self.size.h / self.zoom / 2
+        lx0, ly0 = max(int(x0 // scale), 0), max(int(y0 // scale), 0)
+        lx1 = min(math.ceil((x0 + self.size.w / self.zoom) / scale), w)
+        ly1 = min(math.ceil((y0 + self.size.h / self.zoom) / scale), h)
+
+        frame = pyramid.region(level, lx0, lx1, ly0, ly1).cpu().numpy()
+        if frame.shape[2] == 1:
+            frame = np.repeat(frame, 3, axis=2)
+        surface = pygame.surfarray.make_surface(frame)
+
+        # region scaled to the screen, at its position in the view
+        left, top = round((lx0 * scale - x0) * self.zoom), round((ly0 * scale - y0) * self.zoom)
+        right, bottom = round((lx1 * scale - x0) * self.zoom), round((ly1 * scale - y0) * self.zoom)
+        view = pygame.Surface((self.size.w, self.size.h))
+        view.blit(pygame.transform.scale(surface, (max(right - left, 1), max(bottom - top, 1))), (left, top))
+        return view
@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+import torch
+
+
+class Pyramid:
+    """
+        Multi-resolution pyramid of the frame of a world, to view worlds larger than the screen.
+        Level 0 is the frame itself, each level above averages 2x2 pixels of the level below (density of alive
+        cells for the game of life), all computed and kept on the device of the world.
+
+        The levels are divided in tiles, computed only when a view needs them (from the tiles of the level below,
+        recursively) and invalidated when the world changes, so that only the tiles of the current view are
+        refreshed. The levels are stored as uint8 RGB or gray values, to keep their memory at 1/3 of the world.
+    """
+
+    def __init__(self, source, size, channels=1, tile=128):
+        """
+            @param source: function(x0, x1, y0, y1) -> (torch.ByteTensor, (x1-x0)x(y1-y0)xchannels) frame of a region
+                           of the world, on the device
+            @param size: (W,H) size of the world
+            @param channels: (int) number of channels of the frame, 1 (gray) or 3 (RGB)
+            @param tile: (int) side of the tiles, in pixels of their level
+        """
+        self.source = source
+        self.channels = channels
+        self.tile = tile
+        self.sizes = [tuple(size)]
+        while max(self.sizes[-1]) > tile:
+            self.sizes.append(tuple(math.ceil(s / 2) for s in self.sizes[-1]))
+        self.levels = [None] * len(self.sizes)  # allocated when first needed
+        self.valid = [np.zeros((math.ceil(w / tile), math.ceil(h / tile)), dtype=bool) for w, h in self.sizes]
+
+    def invalidate(self):
+        """
+        To call when the world changed
+        """
+        for valid in self.valid:
+            valid[:] = False
+
+    def region(self, level, x0, x1, y0, y1):
+        """
+        @return: (torch.ByteTensor) pixels [x0:x1, y0:y1] of a level, on the device
+        """
+        if level == 0:
+            return self.source(x0, x1, y0, y1)
+        self.refresh(level, x0, x1, y0, y1)
+        return self.levels[level][x0:x1, y0:y1]
+
+    def refresh(self, level, x0, x1, y0, y1):
+        # recomputes the bounding box of the invalid tiles of the region, from the level below
+        t = self.tile
+        missing = ~self.valid[level][x0 // t:math.ceil(x1 / t), y0 // t:math.ceil(y1 / t)]
+        if not missing.any():
+            return
+        xs, ys = np.flatnonzero(missing.any(axis=1)), np.flatnonzero(missing.any(axis=0))
+        tx0, tx1 = x0 // t + xs[0], x0 // t + xs[-1] + 1
+        ty0, ty1 = y0 // t + ys[0], y0 // t + ys[-1] + 1
+
+        w, h = self.sizes[level]
+        bw, bh = self.sizes[level - 1]
+        px0, px1, py0, py1 = tx0 * t, min(tx1 * t, w), ty0 * t, min(ty1 * t, h)
+        below = self.region(level - 1, 2 * px0, min(2 * px1, bw), 2 * py0, min(2 * py1, bh))
+        # the windows overflowing the odd borders average only the pixels inside
+        averaged = torch.nn.functional.avg_pool2d(below.permute(2, 0, 1).unsqueeze(0).float(), 2, ceil_mode=True)
+
+        if self.levels[level] is None:
+            self.levels[level] = torch.zeros((w, h, self.channels), dtype=torch.uint8, device=below.device)
+        self.levels[level][px0:px1, py0:py1] = averaged[0].permute(1, 2, 0).round().to(torch.uint8)
+        self.valid[level][tx0:tx1, ty0:ty1] = True
@@ -0,0 +1,106 @@
+"""
+Conformance of the alternative backends of the game of life with the reference implementation (the eager GOLAuto on
+the cpu).
+
+The golden trajectories (hash of the world at each step of each scenario) are recorded once with the reference, then
+every backend of BACKENDS is replayed against them: the first step and the region where it diverges are reported,
+and both runs are timed. A backend that does not support a scenario raises a ValueError when it is built, and is
+reported as skipped. The golden trajectories of today's reference are kept in golden.json, next to this script: they
+are only recorded again on purpose, when the reference semantics change. A new backend is added to BACKENDS as a
+function(size, initial world) -> automaton.
+
+Usage: python conformance.py record [--golden golden.json]
+       python conformance.py check [--backend memmap] [--golden golden.json]
+"""
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+
+import torch
+
+from Automaton import GOLAuto, LtLAuto, MemmapGOLAuto
+from ExecutionPolicy import ExecutionPolicy
+from Golden import Golden, print_reports
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden.json")
+
+# name -> (size, density of the initial world, seed, steps)
+SCENARIOS = {
+    "random_128": ((128, 128), 0.5, 0, 100),
+    "sparse_333x201": ((333, 201), 0.1, 1, 100),
+    "dense_64x500": ((64, 500), 0.7, 2, 50),
+}
+
+
+def initial_world(size, density, seed):
+    return torch.rand(size, generator=torch.Generator().manual_seed(seed)) < density
+
+
+def memmap(size, init):
+    directory = tempfile.mkdtemp(prefix="conformance_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return MemmapGOLAuto(size, directory, lambda x0, x1: init[x0:x1], band=48, policy=ExecutionPolicy("cpu", verbose=False))
+
+
+BACKENDS = {
+    "compile": lambda size, init: GOLAuto(size, init, policy=ExecutionPolicy("cpu", backend="compile", verbose=False)),
+    "ltl_rolls": lambda size, init: LtLAuto(size, init, method="rolls", policy=ExecutionPolicy("cpu", verbose=False)),
+    "ltl_sat": lambda size, init: LtLAuto(size, init, method="sat", policy=ExecutionPolicy("cpu", verbose=False)),
+    "ltl_fft": lambda size, init: LtLAuto(size, init, method="fft", policy=ExecutionPolicy("cpu", verbose=False)),
+    "memmap": memmap,
+    "numpy": lambda size, init: GOLAuto(size, init, policy=ExecutionPolicy(backend="numpy", verbose=False)),
+}
+if torch.cuda.is_available():
+    BACKENDS["cuda"] = lambda size, init: GOLAuto(size, init, policy=ExecutionPolicy("cuda", verbose=False))
+
+
+def reference(size, init):
+    return GOLAuto(size, init, policy=ExecutionPolicy("cpu", verbose=False))
+
+
+def scenario_factory(builder, name):
+    size, density, seed, _ = SCENARIOS[name]
+    return lambda: builder(size, initial_world(size, density, seed))
+
+
+def record(golden):
+    for name, (_, _, _, steps) in SCENARIOS.items():
+        golden.record(name, scenario_factory(reference, name), steps)
+        print(f"{name}: {steps} steps recorded")
+
+
+def check(golden, backends):
+    reports = []
+    for name in SCENARIOS:
+        if name not in golden.trajectories:
+            print(f"{name} has no golden trajectory in {golden.path}, record it first")
+            continue
+        for backend in backends:
+            try:
+                report = golden.check(name, scenario_factory(BACKENDS[backend], name), scenario_factory(reference, name),
+                                      cells=lambda difference: difference)
+            except ValueError as e:
+                print(f"{name} with {backend} skipped: {e}")
+                report = "skipped"
+            except Exception as e:
+                print(f"{name} with {backend} failed: {type(e).__name__}: {e}")
+                report = None
+            reports.append((name, backend, report))
+    print_reports(reports)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conformance of the backends with the reference implementation")
+    parser.add_argument("command", choices=("record", "check"))
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="backend to check, all by default")
+    parser.add_argument("--golden", default=GOLDEN, help="JSON file of the golden trajectories")
+    args = parser.parse_args()
+
+    golden = Golden(args.golden)
+    if args.command == "record":
+        record(golden)
+    else:
+        check(golden, args.backend or list(BACKENDS))
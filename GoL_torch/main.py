@@ -1,6 +1,11 @@
 import pygame
 from Camera import Camera
 from Automaton import *
+from CycleDetector import CycleDetector
+from ExecutionPolicy import ExecutionPolicy
+from LodCamera import LodCamera
+from Pyramid import Pyramid
+import patterns
 import cv2
 import time
 
@@ -20,8 +25,36 @@ dt = 5 / fps
 # Initialize the world_state array, of size (W,H,3) of RGB values at each position.
 world_state = np.random.randint(0, 255, (W, H, 3), dtype=np.uint8)
 
-# Initialize the automaton
-auto = GOLAuto((W, H))
+# Size of the world, it can be larger than the window (e.g. (20000, 20000)): the view can then zoom out, rendered
+# from a pyramid of the frame computed on the device
+world_size = (W, H)
+
+# Initialize the automaton, with a pattern file (.rle or .mc of Golly) at the center of an empty world, random if None
+pattern = None
+init_state = None
+if pattern is not None:
+    pattern = patterns.load(pattern)
+    init_state = patterns.place(torch.zeros(world_size, dtype=torch.bool), pattern, (world_size[0] - pattern.shape[0]) // 2, (world_size[1] - pattern.shape[1]) // 2)
+
+# Device, dtype, threads and backend of the automaton. The fastest policy on this machine can be measured once (then
+# read from ./execution_policies.json) with:
+# policy = ExecutionPolicy.autotune(lambda policy: GOLAuto(world_size, init_state, policy=policy), key=("GOLAuto",) + world_size)
+policy = ExecutionPolicy()
+# policy = ExecutionPolicy(backend="numpy")  # numpy arrays on the cpu, no torch needed (faster start for small worlds)
+auto = GOLAuto(world_size, init_state, policy=policy)
+# auto = LtLAuto.from_rule(world_size, "R5,C0,M1,S34..58,B34..45,NM", init_state, policy=policy)  # Larger than Life, e.g. Bosco's rule
+# auto = MemmapGOLAuto(world_size, './world', policy=policy)  # for worlds larger than the memory, e.g. (100000, 100000), stored on the disk (random, or resumed from ./world)
+
+lod = world_size != (W, H)
+if lod:
+    camera = LodCamera(W, H, world_size)
+    pyramid = Pyramid(lambda x0, x1, y0, y1: auto.world[x0:x1, y0:y1].to(torch.uint8).mul_(255).unsqueeze(2), world_size)
+
+# Detection of fixed points and cycles: the run is paused when one is reached, then 'j' jumps jump_steps steps ahead
+detect_cycles = False
+jump_steps = 1_000_000
+if detect_cycles:
+    auto.cycle_detector = CycleDetector(on_cycle=lambda start, period: print(f"Cycle of period {period} reached at step {start}") or True)
 
 updating = True
 recording = False
@@ -41,6 +74,10 @@ while running:
             if (event.key == pygame.K_r):
                 # Toggle recording
                 recording = not recording
+            if (event.key == pygame.K_j and auto.cycle_detector is not None and auto.cycle_detector.cycle is not None):
+                # Jump ahead in the detected cycle
+                auto.cycle_detector.jump(auto, auto.steps + jump_steps)
+                print(f"Jumped to step {auto.steps}")
 
         # Handle the event loop for the camera
         camera.handle_event(event)
@@ -48,13 +85,23 @@ while running:
     if (updating):
         # Step the automaton if we are updating
         auto.step()
-
-    auto.draw()  # Always draw the automaton
-    # Retrieve the world_state from automaton, np.array (W,H,3)
-    world_state = auto.worldmap
-
-    # Make the viewable surface.
-    surface = pygame.surfarray.make_surface(world_state)
+        if lod:
+            pyramid.invalidate()
+        if auto.cycle_detector is not None and auto.cycle_detector.stop_requested:
+            auto.cycle_detector.stop_requested = False
+            updating = False
+
+    if lod:
+        # Only the visible part of the world is rendered, at the resolution of the screen
+        surface = camera.render(pyramid)
+        world_state = pygame.surfarray.array3d(surface)
+    else:
+        auto.draw()  # Always draw the automaton
+        # Retrieve the world_state from automaton, np.array (W,H,3)
+        world_state = auto.worldmap
+
+        # Make the viewable surface.
+        surface = pygame.surfarray.make_surface(world_state)
 
     # For recording
     if (recording):
@@ -66,7 +113,7 @@ while running:
             vid_loc = 'Videos/lgca1.mkv'
             video_out = cv2.VideoWriter(vid_loc, fourcc, 30.0, (W, H))
 
-        frame_bgr = cv2.cvtColor(auto.worldmap, cv2.COLOR_RGB2BGR)
+        frame_bgr = cv2.cvtColor(world_state, cv2.COLOR_RGB2BGR)
         video_out.write(frame_bgr)
         pygame.draw.circle(surface, (255, 0, 0), (W - 10, H - 10), 2)  # Draw the'recording' red dot
 
@@ -75,7 +122,7 @@ while running:
 
     # Draw the scaled surface on the window (zoomed)
     # Understanding how the camera works is not important
-    zoomed_surface = camera.apply(surface)
+    zoomed_surface = surface if lod else camera.apply(surface)
 
     # Blit (draw) the surface on the screen, at (0,0) coordinates
     screen.blit(zoomed_surface, (0, 0))
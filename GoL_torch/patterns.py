@@ -0,0 +1,337 @@
+"""
+Import and export of Life patterns, in the RLE (.rle) and macrocell (.mc) formats of Golly.
+
+The patterns are (w,h) torch.BoolTensor indexed [x, y] like the worlds of GOLAuto, y going down as the rows of
+the files. The decoding and encoding are vectorized with numpy (on the runs and on the nodes, never cell by cell),
+and only two states patterns are supported.
+
+    world = torch.zeros((W, H), dtype=torch.bool)
+    place(world, load("gosper.rle"), 100, 50)
+    auto = GOLAuto((W, H), world)
+"""
+import re
+
+import numpy as np
+import torch
+
+RULE = "B3/S23"
+
+
+def load(path):
+    """
+    Reads a pattern file, in the format given by its extension (.rle or .mc)
+    """
+    if path.endswith(".mc"):
+        return read_macrocell(path)
+    return read_rle(path)
+
+
+def save(path, pattern):
+    """
+    Writes a pattern file, in the format given by its extension (.rle or .mc)
+    """
+    if path.endswith(".mc"):
+        return write_macrocell(path, pattern)
+    return write_rle(path, pattern)
+
+
+def place(world, pattern, x, y):
+    """
+    Copies a pattern in a world, its cell (0,0) at (x,y). The world is a torus: the pattern wraps around the borders.
+
+    @param world: (torch.BoolTensor, WxH) modified in place
+    @param pattern: (torch.BoolTensor or np.ndarray, wxh)
+    @return: the world
+    """
+    pattern = torch.as_tensor(pattern, device=world.device).to(world.dtype)
+    if pattern.shape[0] > world.shape[0] or pattern.shape[1] > world.shape[1]:
+        raise ValueError(f"Pattern of size {tuple(pattern.shape)} larger than the world {tuple(world.shape)}")
+    xs = (x + torch.arange(pattern.shape[0], device=world.device)) % world.shape[0]
+    ys = (y + torch.arange(pattern.shape[1], device=world.device)) % world.shape[1]
+    world[xs.view(-1, 1), ys.view(1, -1)] = pattern
+    return world
+
+
+# RLE
+
+def read_rle(path):
+    """
+    @return: (torch.BoolTensor, wxh) pattern of size given by the header (or by the cells, if they do not fit in it)
+    """
+    width = height = 0
+    with open(path, "rb") as f:
+        # comments and header, then the whole body at once
+        for line in f:
+            if line.startswith(b"#") or not line.strip():
+                continue
+            header = re.match(rb"\s*x\s*=\s*(\d+)\s*,\s*y\s*=\s*(\d+)", line)
+            if header is None:
+                raise ValueError(f"{path}: missing RLE header 'x = ..., y = ...'")
+            width, height = int(header.group(1)), int(header.group(2))
+            break
+        body = f.read()
+    return decode_rle(body, width, height)
+
+
+def decode_rle(body, width=0, height=0):
+    """
+    Decodes the body of a RLE file (the runs until '!').
+    Each token is an optional count followed by 'b' (dead), '$' (end of row) or another letter (alive), the counts
+    and the positions of the tokens are computed with cumulative sums over all the tokens.
+    """
+    body = body.split(b"!", 1)[0].translate(None, b" \t\r\n")
+    chars = np.frombuffer(body, dtype=np.uint8)
+    is_digit = (chars >= ord("0")) & (chars <= ord("9"))
+    tokens = np.flatnonzero(~is_digit)
+
+    # count of each token: the digits before it, 1 without digits
+    digits = np.flatnonzero(is_digit)
+    owner = np.searchsorted(tokens, digits)  # token following each digit
+    if len(digits) and owner[-1] == len(tokens):
+        raise ValueError("RLE body ending with a count")
+    exponent = tokens[owner] - digits - 1
+    counts = np.zeros(len(tokens), dtype=np.int64)
+    np.add.at(counts, owner, (chars[digits] - ord("0")).astype(np.int64) * 10 ** exponent)
+    counts[np.bincount(owner, minlength=len(tokens)) == 0] = 1
+
+    kinds = chars[tokens]
+    is_row = kinds == ord("$")
+    is_alive = ~is_row & (kinds != ord("b")) & (kinds != ord("."))
+
+    # row of each token, and its x: the cells advanced since the last end of row
+    rows = np.cumsum(np.where(is_row, counts, 0)) - np.where(is_row, counts, 0)
+    advance = np.cumsum(np.where(is_row, 0, counts))
+    row_start = np.maximum.accumulate(np.where(is_row, advance, 0))
+    xs = advance - np.where(is_row, 0, counts) - row_start
+
+    xs, rows, counts = xs[is_alive], rows[is_alive], counts[is_alive]
+    if len(counts):
+        width = max(width, int((xs + counts).max()))
+        height = max(height, int(rows.max()) + 1)
+
+    # all the cells of the alive runs, as flat indices x*height + y
+    pattern = np.zeros(width * height, dtype=bool)
+    first = np.cumsum(counts) - counts
+    offsets = np.arange(counts.sum()) - np.repeat(first, counts)
+    pattern[np.repeat(xs * height + rows, counts) + offsets * height] = True
+    return torch.from_numpy(pattern.reshape(width, height))
+
+
+def write_rle(path, pattern, rule=RULE, line_length=70):
+    """
+    Writes a pattern in RLE, its lines being at most line_length characters long
+    """
+    pattern = torch.as_tensor(pattern).bool().cpu().numpy()
+    width, height = pattern.shape
+    with open(path, "wb") as f:
+        f.write(f"x = {width}, y = {height}, rule = {rule}\n".encode())
+        f.write(encode_rle(pattern, line_length))
+
+
+def encode_rle(pattern, line_length=70):
+    """
+    @param pattern: (np.ndarray, wxh) bool
+    @return: (bytes) body of the RLE file, ended by '!'
+    """
+    rows = np.ascontiguousarray(pattern.T)
+    height, width = rows.shape
+    # runs of the cells, a run starting at each change and at each row
+    cells = rows.ravel()
+    starts = np.ones(len(cells), dtype=bool)
+    starts[1:] = cells[1:] != cells[:-1]
+    starts[::max(width, 1)] = True
+    edges = np.flatnonzero(starts)
+    lengths = np.diff(np.append(edges, len(cells)))
+    values = cells[edges]
+    run_rows = edges // max(width, 1)
+
+    # the dead runs at the end of the rows are not written
+    keep = values.copy()
+    keep[:-1] |= values[1:] & (run_rows[1:] == run_rows[:-1])
+    lengths, values, run_rows = lengths[keep], values[keep], run_rows[keep]
+
+    # tokens: the runs, preceded by a '$' each time they change of row, and the final '!'
+    skipped = np.diff(run_rows, prepend=0)
+    position = np.arange(len(lengths)) + np.cumsum(skipped > 0)
+    counts = np.ones(position[-1] + 2 if len(position) else 1, dtype=np.int64)
+    letters = np.full(len(counts), ord("!"), dtype=np.uint8)
+    counts[position] = lengths
+    letters[position] = np.where(values, ord("o"), ord("b"))
+    counts[position[skipped > 0] - 1] = skipped[skipped > 0]
+    letters[position[skipped > 0] - 1] = ord("$")
+
+    digits = np.where(counts > 1, _digits(counts), 0)
+    # a line break after the tokens ending in a new block of line_length - longest token + 1 characters
+    ends = np.cumsum(digits + 1)
+    lines = (ends - 1) // max(line_length - int(digits.max()), 1)
+    newlines = np.append(lines[1:] != lines[:-1], True)
+    return _ascii(counts, digits, letters, newlines)
+
+
+def _digits(numbers):
+    # number of decimal digits of positive integers
+    return np.searchsorted(10 ** np.arange(19, dtype=np.int64), numbers, side="right")
+
+
+def _ascii(numbers, digits, suffixes, newlines):
+    """
+    Text of integers written with the given number of digits (0 to omit them), each followed by a suffix character
+    and optionally by a line break, assembled in a single buffer
+    """
+    sizes = digits + 1 + newlines
+    starts = np.cumsum(sizes) - sizes
+    text = np.empty(int(sizes.sum()), dtype=np.uint8)
+    for k in range(int(digits.max()) if len(digits) else 0):
+        has = digits > k
+        text[starts[has] + k] = ord("0") + numbers[has] // 10 ** (digits[has] - 1 - k) % 10
+    text[starts + digits] = suffixes
+    text[(starts + digits + 1)[newlines]] = ord("\n")
+    return text.tobytes()
+
+
+# Macrocell
+
+LEAF = 8  # side of the leaves of the macrocell files (level 3)
+
+
+def read_macrocell(path, max_cells=1 << 31):
+    """
+    @param max_cells: (int) size above which the pattern is considered too large to be dense
+    @return: (torch.BoolTensor, wxh) smallest pattern containing all the alive cells
+    """
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    lines = [line for line in lines if line and line[0] not in "[#"]
+    if not lines:
+        raise ValueError(f"{path}: no node in the macrocell file")
+
+    # nodes numbered from 1 in their order in the file, 0 being the empty node
+    is_leaf = np.array([line[0] in ".*$" for line in lines])
+    number = np.arange(1, len(lines) + 1)
+    levels = np.zeros(len(lines) + 1, dtype=np.int64)
+    children = np.zeros((len(lines) + 1, 4), dtype=np.int64)
+    blocks = np.zeros((len(lines) + 1, LEAF, LEAF), dtype=bool)  # dense content of the nodes of level <= 3
+
+    levels[number[is_leaf]] = 3
+    _leaves(blocks, number[is_leaf], [line for line, leaf in zip(lines, is_leaf) if leaf])
+    nodes = np.array(" ".join(line for line, leaf in zip(lines, is_leaf) if not leaf).split(), dtype=np.int64).reshape(-1, 5)
+    levels[number[~is_leaf]] = nodes[:, 0]
+    children[number[~is_leaf]] = nodes[:, 1:]
+    # the nodes of level 1 (children being cells) to 3 that are not written as leaves, rare
+    for node in number[~is_leaf][nodes[:, 0] <= 3]:
+        half = 1 << (levels[node] - 1)
+        for i, child in enumerate(children[node]):
+            quadrant = blocks[node, (i % 2) * half:(i % 2 + 1) * half, (i // 2) * half:(i // 2 + 1) * half]
+            quadrant[...] = child != 0 if half == 1 else blocks[child, :half, :half]
+
+    # from the root down to the nodes of level 3, level by level: (node, x, y) of all the non empty instances
+    root = len(lines)
+    level = levels[root]
+    nodes, xs, ys = np.array([root]), np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+    while level > 3:
+        half = 1 << (level - 1)
+        nodes = children[nodes].ravel()
+        xs = (xs[:, None] + np.array([0, half, 0, half])).ravel()
+        ys = (ys[:, None] + np.array([0, 0, half, half])).ravel()
+        nonempty = nodes != 0
+        nodes, xs, ys = nodes[nonempty], xs[nonempty], ys[nonempty]
+        level -= 1
+    if not len(nodes):
+        return torch.zeros((0, 0), dtype=torch.bool)
+
+    x0, y0 = xs.min(), ys.min()
+    width, height = int(xs.max() - x0 + LEAF), int(ys.max() - y0 + LEAF)
+    if width * height > max_cells:
+        raise ValueError(f"{path}: pattern of {width}x{height} cells, too large to be dense")
+    pattern = np.zeros((width, height), dtype=bool)
+    cell = np.arange(LEAF)
+    pattern[(xs - x0)[:, None, None] + cell[None, :, None], (ys - y0)[:, None, None] + cell[None, None, :]] = blocks[nodes]
+
+    alive_x, alive_y = np.flatnonzero(pattern.any(axis=1)), np.flatnonzero(pattern.any(axis=0))
+    if not len(alive_x):
+        return torch.zeros((0, 0), dtype=torch.bool)
+    return torch.from_numpy(np.ascontiguousarray(pattern[alive_x[0]:alive_x[-1] + 1, alive_y[0]:alive_y[-1] + 1]))
+
+
+def _leaves(blocks, numbers, lines):
+    """
+    Decodes the leaves lines in blocks[numbers]: 8x8 blocks written as rows ended by '$', '.' dead, '*' alive,
+    the dead cells at the end of the rows and the empty rows at the end of the leaf being omitted
+    """
+    chars = np.frombuffer(("\n".join(lines) + "\n").encode(), dtype=np.uint8)
+    is_row, is_line = chars == ord("$"), chars == ord("\n")
+    position = np.arange(len(chars))
+    leaf = np.cumsum(is_line) - is_line
+    rows_before = np.cumsum(is_row) - is_row
+    line_start = np.concatenate(([0], position[is_line][:-1] + 1))
+    row = rows_before - rows_before[line_start][leaf]
+    x = position - np.maximum.accumulate(np.where(is_row | is_line, position, -1)) - 1
+
+    alive = (chars == ord("*")) & (x < LEAF) & (row < LEAF)
+    blocks[numbers[leaf[alive]], x[alive], row[alive]] = True
+
+
+def write_macrocell(path, pattern, rule=RULE):
+    """
+    Writes a pattern in macrocell, its (0,0) cell at the top left of the root node.
+    The identical nodes are merged level by level with np.unique, as the hash-consing of Hashlife would.
+    """
+    pattern = torch.as_tensor(pattern).bool().cpu().numpy()
+    side = LEAF
+    while side < max(pattern.shape):
+        side *= 2
+    pattern = np.pad(pattern, ((0, side - pattern.shape[0]), (0, side - pattern.shape[1])))
+
+    with open(path, "wb") as f:
+        f.write(f"[M2] (Alife_bachelor_project)\n#R {rule}\n".encode())
+
+        # leaves: the 64 cells of each 8x8 block, rows by rows, are packed in a key
+        n = side // LEAF
+        keys = np.packbits(pattern.reshape(n, LEAF, n, LEAF).transpose(0, 2, 3, 1).reshape(n, n, LEAF * LEAF), axis=2)
+        unique, ids = np.unique(keys.view(np.uint64)[..., 0], return_inverse=True)
+        empty = unique == 0
+        f.write(_leaf_lines(np.unpackbits(unique[~empty].view(np.uint8)).reshape(-1, LEAF, LEAF)))
+        ids, offset = _number(ids.reshape(n, n), empty, 0)
+
+        # upper levels: the key of a node is its four children (nw, ne, sw, se)
+        level = 3
+        while n > 1:
+            n //= 2
+            level += 1
+            quads = ids.reshape(n, 2, n, 2).transpose(0, 2, 3, 1).reshape(-1, 4)
+            unique, ids = np.unique(quads, axis=0, return_inverse=True)
+            empty = ~unique.any(axis=1)
+            lines = np.concatenate((np.full((int((~empty).sum()), 1), level), unique[~empty]), axis=1).ravel()
+            spaces = np.tile(np.array([ord(" ")] * 4 + [ord("\n")], dtype=np.uint8), len(lines) // 5)
+            f.write(_ascii(lines, _digits(np.maximum(lines, 1)), spaces, np.zeros(len(lines), dtype=bool)))
+            ids, offset = _number(ids.reshape(n, n), empty, offset)
+
+        if offset == 0:
+            f.write(b"$\n")  # empty pattern: all its nodes are the empty node, the root is written as an empty leaf
+
+
+def _number(ids, empty, offset):
+    # indices of the unique nodes of a level -> numbers in the file (0 for the empty node), after the previous levels
+    numbers = np.cumsum(~empty) + offset
+    numbers[empty] = 0
+    return numbers[ids], offset + int((~empty).sum())
+
+
+def _leaf_lines(leaves):
+    """
+    @param leaves: (np.ndarray, Nx8x8) rows of the blocks
+    @return: (bytes) their '.*$' lines
+    """
+    if not len(leaves):
+        return b""
+    row_length = (leaves * np.arange(1, LEAF + 1)).max(axis=2)  # up to the last alive cell
+    rows = ((row_length > 0) * np.arange(1, LEAF + 1)).max(axis=1)  # up to the last non empty row
+    chars = np.full((len(leaves), LEAF, LEAF + 1), ord("$"), dtype=np.uint8)
+    chars[:, :, :LEAF] = np.where(leaves, ord("*"), ord("."))
+    keep = np.arange(LEAF + 1) < row_length[:, :, None]
+    keep[:, :, LEAF] = True
+    keep &= (np.arange(LEAF) < rows[:, None])[:, :, None]
+
+    chars = np.concatenate((chars.reshape(len(leaves), -1), np.full((len(leaves), 1), ord("\n"), dtype=np.uint8)), axis=1)
+    keep = np.concatenate((keep.reshape(len(leaves), -1), np.ones((len(leaves), 1), dtype=bool)), axis=1)
+    return chars[keep].tobytes()
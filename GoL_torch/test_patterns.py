@@ -0,0 +1,51 @@
+import pytest
+import torch
+
+import patterns
+
+
+def trimmed(pattern):
+    # smallest pattern containing all the alive cells, as read from a macrocell file
+    xs, ys = pattern.any(dim=1).nonzero().view(-1), pattern.any(dim=0).nonzero().view(-1)
+    if not len(xs):
+        return torch.zeros((0, 0), dtype=torch.bool)
+    return pattern[xs[0]:xs[-1] + 1, ys[0]:ys[-1] + 1]
+
+
+def random_pattern(w, h, seed=0):
+    pattern = torch.rand((w, h), generator=torch.Generator().manual_seed(seed)) < 0.3
+    pattern[0, 0] = pattern[-1, -1] = True  # the bounding box is the whole pattern
+    return pattern
+
+
+PATTERNS = {
+    "empty": torch.zeros((20, 20), dtype=torch.bool),
+    "empty_leaf": torch.zeros((8, 8), dtype=torch.bool),
+    "single_cell": torch.ones((1, 1), dtype=torch.bool),
+    "non_power_of_2": random_pattern(13, 37),
+    "several_levels": random_pattern(70, 9, seed=1),
+}
+
+
+@pytest.mark.parametrize("name", PATTERNS)
+def test_rle_round_trip(tmp_path, name):
+    pattern = PATTERNS[name]
+    path = str(tmp_path / "pattern.rle")
+    patterns.save(path, pattern)
+    assert torch.equal(patterns.load(path), pattern)
+
+
+@pytest.mark.parametrize("name", PATTERNS)
+def test_macrocell_round_trip(tmp_path, name):
+    pattern = PATTERNS[name]
+    path = str(tmp_path / "pattern.mc")
+    patterns.save(path, pattern)
+    assert torch.equal(patterns.load(path), trimmed(pattern))
+
+
+def test_rle_to_macrocell(tmp_path):
+    # an all dead pattern read from RLE can be written and read back as macrocell
+    rle, mc = str(tmp_path / "pattern.rle"), str(tmp_path / "pattern.mc")
+    patterns.save(rle, torch.zeros((20, 20), dtype=torch.bool))
+    patterns.save(mc, patterns.load(rle))
+    assert patterns.load(mc).shape == (0, 0)
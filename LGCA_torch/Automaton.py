@@ -1,7 +1,14 @@
 import numpy as np
-import torch
 import time
 
+try:
+    import torch
+except ImportError:  # only the numpy backend of LGCAAuto is available
+    torch = None
+
+from ExecutionPolicy import ExecutionPolicy
+from MemmapWorld import MemmapWorld
+
 class Automaton:
     """
         Class that internalizes the rules and evolution of 
@@ -39,61 +46,322 @@ class Automaton:
         return (255 * self._worldmap).astype(dtype=np.uint8)
 
 class LGCAAuto(Automaton):
-    def __init__(self, size, init_world, colors=True):
+    # (dx, dy) shift of each direction channel during one transport
+    SHIFTS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+
+    def __init__(self, size, init_world, colors=True, lazy_transport=False, obstacles=None, walls=True, policy=None):
         """
             LGCA on GPU
 
             @param size: (W,H)
             @param init_world: (torch.BoolTensor, 4xWxH) initial state of the world
             @param colors: (bool) if True, the particles are colored
+            @param lazy_transport: (bool) if True, the transport only records the offset of each direction channel,
+                                   the shift and the bounces on the border are done when the world is read (see materialize)
+            @param obstacles: (torch.BoolTensor, WxH) solid cells on which the particles bounce back, None for no obstacle
+            @param walls: (bool) if True, the particles bounce back on the border of the world, else the world is a torus
+            @param policy: (ExecutionPolicy) device, threads and backend (the world stays boolean), ExecutionPolicy() by
+                           default. With the numpy backend, the world and the obstacles are np.ndarray
         """
         super().__init__(size)
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        print(f"Running on {'GPU' if torch.cuda.is_available() else 'CPU'}")
-        self.world = init_world.to(self.device)
+        self.policy = ExecutionPolicy() if policy is None else policy
+        self.policy.apply()
+        self.device = self.policy.device
+        self.collisions = collisions_numpy if self.policy.numpy else self.policy.compile(collisions)
+        self.lazy_transport = lazy_transport
+        self._buffer = None
+        if self.policy.numpy:
+            self.obstacles = None if obstacles is None else self.policy.prepare(obstacles).astype(np.bool_)
+            init_world = self.policy.prepare(init_world)
+        else:
+            self.obstacles = None if obstacles is None else obstacles.to(self.device, torch.bool)
+            init_world = init_world.to(self.device)
+        self.compile_boundary(walls)
+        if self.obstacles is not None:
+            init_world = init_world & ~self.obstacles
+        self.world = init_world
 
         self.colors = colors
+        # optional Tracers and CoarseGrain, updated at each step
+        self.tracers = None
+        self.coarse_grain = None
 
-    def collision(self):
-        collisions = torch.zeros((2, self.w, self.h), dtype=torch.bool, device=self.device)
-        for i in (0, 1):
-            # we check for opposing directions
-            collisions[i] = self.world[i] & self.world[i+2]
+    @property
+    def world(self):
+        """
+        World in its canonical layout. With the lazy transport, the tensor is reused as a buffer
+        by the next materialization, so it must not be kept across steps (clone it if needed).
+        """
+        self.materialize()
+        return self._world
 
-            # we check if it is not a 3 or 4 particles collision
-            collisions[i] = collisions[i] & ~(self.world[i+1] | self.world[((i+3) % 4)])
+    @world.setter
+    def world(self, world):
+        self._world = world
+        self.offsets = [(0, 0) for _ in self.SHIFTS]
+
+    def collision(self):
+        world = self.world
+        collisions = self.collisions(world)
 
         # we apply the collisions
         for i in (0, 1):
             for j in (0, 1, 2, 3):
-                self.world[j] ^= collisions[i]
+                world[j] ^= collisions[i]
 
     def transport(self):
+        if self.lazy_transport:
+            # the bounces on the border depend on the positions before each transport, so the offsets cannot be
+            # accumulated over several transports: the previous one is materialized first (no-op after a collision)
+            self.materialize()
+            self.offsets = list(self.SHIFTS)
+            return
+
+        # the particles of the reflecting links are taken out before the roll, and put back reversed after it
+        reflected = self.take_reflected(self._world)
         # we do the same for each direction
         for i in (0, 1):
             # we roll the tensor in the direction of the flow
-            self.world[i] = self.world[i].roll(-1, dims=i % 2)
-            self.world[i+2] = self.world[i+2].roll(1, dims=i % 2)
+            if self.policy.numpy:
+                self._world[i] = np.roll(self._world[i], -1, axis=i % 2)
+                self._world[i+2] = np.roll(self._world[i+2], 1, axis=i % 2)
+                continue
+            self._world[i] = self._world[i].roll(-1, dims=i % 2)
+            self._world[i+2] = self._world[i+2].roll(1, dims=i % 2)
 
-        # if particles are on the border, they are moved to the other direction
-        self.world[0, -1, :] = self.world[2, -1, :]
-        self.world[2, -1, :] = torch.zeros(self.world[2, -1, :].shape, dtype=torch.bool, device=self.device)
+        self.put_reflected(self._world, reflected)
 
-        self.world[2, 0, :] = self.world[0, 0, :]
-        self.world[0, 0, :] = torch.zeros(self.world[0, 0, :].shape, dtype=torch.bool, device=self.device)
+    def compile_boundary(self, walls):
+        """
+        Computes once the reflecting links: (direction, cell) of the particles next to an obstacle or a wall, that
+        would hit it during the transport. Such a particle stays in its cell and is reversed instead of moving (bounce
+        back), so that no particle enters a solid cell and the number of particles is conserved. They are kept as flat
+        indices in the world tensor: bounce_src, and their reversed links bounce_dst. A reversed link is always empty
+        after the roll, its particle would come from the solid cell (or from across the wall, a reflecting link too).
+        """
+        if self.policy.numpy:
+            self.compile_boundary_numpy(walls)
+            return
+        W, H = self.size
+        obstacles = torch.zeros(self.size, dtype=torch.bool, device=self.device) if self.obstacles is None else self.obstacles
+        # blocked[d, x, y]: the particle in (x, y) moving in the direction d hits something
+        self.blocked = torch.zeros((4, W, H), dtype=torch.bool, device=self.device)
+        for d, (dx, dy) in enumerate(self.SHIFTS):
+            self.blocked[d] = obstacles.roll((-dx, -dy), dims=(0, 1))
+            if walls:
+                # the walls are between the last and the first rows and columns of the torus
+                if dx: self.blocked[d, 0 if dx < 0 else -1, :] = True
+                if dy: self.blocked[d, :, 0 if dy < 0 else -1] = True
+        self.blocked &= ~obstacles
 
-        self.world[1, :, -1] = self.world[3, :, -1]
-        self.world[3, :, -1] = torch.zeros(self.world[3, :, -1].shape, dtype=torch.bool, device=self.device)
+        self.bounce_src = self.blocked.view(-1).nonzero().squeeze(1)
+        # the opposite direction of d is (d+2)%4, its channel is 2 channels away
+        channel = self.bounce_src // (W * H)
+        self.bounce_dst = self.bounce_src + ((channel + 2) % 4 - channel) * (W * H)
 
-        self.world[3, :, 0] = self.world[1, :, 0]
-        self.world[1, :, 0] = torch.zeros(self.world[1, :, 0].shape, dtype=torch.bool, device=self.device)
+    def compile_boundary_numpy(self, walls):
+        # same as compile_boundary, with np.ndarray
+        W, H = self.size
+        obstacles = np.zeros(self.size, dtype=np.bool_) if self.obstacles is None else self.obstacles
+        self.blocked = np.zeros((4, W, H), dtype=np.bool_)
+        for d, (dx, dy) in enumerate(self.SHIFTS):
+            self.blocked[d] = np.roll(obstacles, (-dx, -dy), axis=(0, 1))
+            if walls:
+                if dx: self.blocked[d, 0 if dx < 0 else -1, :] = True
+                if dy: self.blocked[d, :, 0 if dy < 0 else -1] = True
+        self.blocked &= ~obstacles
+
+        self.bounce_src = np.flatnonzero(self.blocked)
+        channel = self.bounce_src // (W * H)
+        self.bounce_dst = self.bounce_src + ((channel + 2) % 4 - channel) * (W * H)
+
+    def take_reflected(self, world):
+        """
+        Removes the particles of the reflecting links from the world, before the roll of the transport
+        @return: their values, to be given to put_reflected after the roll
+        """
+        if not len(self.bounce_src):
+            return None
+        flat = world.reshape(-1) if self.policy.numpy else world.view(-1)
+        reflected = flat[self.bounce_src]
+        if self.policy.numpy:
+            flat[self.bounce_src] = False
+        else:
+            flat.index_fill_(0, self.bounce_src, False)
+        return reflected
+
+    def put_reflected(self, world, reflected):
+        # the particles taken by take_reflected are back in their cell, in the opposite direction
+        if reflected is None:
+            return
+        flat = world.reshape(-1) if self.policy.numpy else world.view(-1)
+        flat[self.bounce_dst] = reflected
+
+    def materialize(self):
+        """
+        Applies the pending offsets of the direction channels, with the bounces on the walls and the obstacles. Each
+        value is written once, in a second buffer that is swapped with the world, instead of a roll followed by a copy
+        back.
+        """
+        if not any(x or y for x, y in self.offsets):
+            return
+
+        world = self._world
+        if self._buffer is None or self._buffer.shape != world.shape or (not self.policy.numpy and self._buffer.device != world.device):
+            self._buffer = np.empty_like(world) if self.policy.numpy else torch.empty_like(world)
+        reflected = self.take_reflected(world)
+        for c, offset in enumerate(self.offsets):
+            roll_into(self._buffer[c], world[c], offset)
+        self.put_reflected(self._buffer, reflected)
+
+        self._buffer, self._world = world, self._buffer
+        self.offsets = [(0, 0) for _ in self.SHIFTS]
 
     def step(self):
+        if self.tracers is not None:
+            self.tracers.update(self.world)
         self.collision()
         self.transport()
+        if self.coarse_grain is not None:
+            self.coarse_grain.update()
+
+    def draw(self):
+        world = self.world if self.policy.numpy else self.world.cpu().numpy()
+        if self.colors: self._worldmap = (world[0:3] | world[3]).transpose((1, 2, 0))
+        else:
+            pixels = world[0] | world[1] | world[2] | world[3]
+            self._worldmap = np.stack((pixels, pixels, pixels), axis=-1)
+
+        if self.obstacles is not None:
+            # the obstacles are drawn in gray
+            self._worldmap = self._worldmap.astype(np.float32)
+            self._worldmap[self.obstacles if self.policy.numpy else self.obstacles.cpu().numpy()] = 0.5
+
+
+class MemmapLGCAAuto(Automaton):
+    def __init__(self, size, directory, init_world=None, colors=True, walls=True, band=256, view=(1024, 1024), policy=None):
+        """
+            LGCA on a world larger than the memory, stored in memory-mapped files (see MemmapWorld), the bands being
+            computed on the device of the policy. Only a view of the world is drawn. There is no obstacle.
+
+            @param size: (W,H)
+            @param directory: (str) directory of the files, the run resumes from it if it already has a world of this size
+            @param init_world: function(x0, x1) -> (torch.BoolTensor, 4x(x1-x0)xH) rows of the initial world, a
+                               particle in each channel with probability 0.1 if None
+            @param colors: (bool) if True, the particles are colored
+            @param walls: (bool) if True, the particles bounce back on the border of the world, else the world is a torus
+            @param band: (int) number of rows of a band
+            @param view: (w,h) size of the drawn region of the world, whose top left corner is self.origin
+            @param policy: (ExecutionPolicy) device, threads and backend, ExecutionPolicy() by default
+        """
+        # the worldmap only covers the view
+        super().__init__((min(view[0], size[0]), min(view[1], size[1])))
+        self.w, self.h = self.size = size
+        self.origin = (0, 0)
+        self.policy = ExecutionPolicy() if policy is None else policy
+        if self.policy.numpy:
+            raise ValueError("MemmapLGCAAuto has no numpy backend")
+        self.policy.apply()
+        self.device = self.policy.device
+        self.collisions = self.policy.compile(collisions)
+        self.colors = colors
+        self.walls = walls
+
+        self.storage = MemmapWorld(directory, (4,) + tuple(size), np.bool_, axis=1, band=band, halo=1)
+        if self.storage.created:
+            self.storage.fill((lambda x0, x1: torch.rand((4, x1 - x0, self.h)) < 0.1) if init_world is None else init_world)
+
+    @property
+    def world(self):
+        """
+        Current world, a cpu tensor mapped on its file: slices of it are only read from the disk when used
+        """
+        return torch.from_numpy(self.storage.current)
+
+    def band_step(self, band, x0, x1):
+        """
+        Collision and transport of the rows [x0, x1), from the rows [x0 - 1, x1 + 1) of the world
+        """
+        world = band.to(self.device)
+        collisions = self.collisions(world)
+        for i in (0, 1):
+            for j in (0, 1, 2, 3):
+                world[j] ^= collisions[i]
+
+        # the particles moving along x come from the halo, the ones moving along y stay in the band
+        res = torch.empty((4, x1 - x0, self.h), dtype=torch.bool, device=self.device)
+        res[0], res[2] = world[0, 2:], world[2, :-2]
+        res[1], res[3] = world[1, 1:-1].roll(-1, dims=1), world[3, 1:-1].roll(1, dims=1)
+
+        if self.walls:
+            # same bounces as LGCAAuto: the particles of the reflecting links of the border stay in their cell,
+            # reversed, in place of the particles that came from across the wall (reflected on the other side)
+            links = [(1, (slice(None), 0)), (3, (slice(None), -1))]
+            if x0 == 0: links.append((0, (0, slice(None))))
+            if x1 == self.w: links.append((2, (-1, slice(None))))
+            inner = world[:, 1:-1]  # the rows of the band, before the transport
+            for d, cells in links:
+                res[(d + 2) % 4][cells] = inner[d][cells]
+        return res
+
+    def step(self):
+        self.storage.step(self.band_step)
 
     def draw(self):
-        if self.colors: self._worldmap = (self.world[0:3].cpu().numpy() | self.world[3].cpu().numpy()).transpose((1, 2, 0))
+        x, y = self.origin
+        w, h = self._worldmap.shape[:2]
+        region = np.take(np.take(self.storage.current, np.arange(x, x + w) % self.w, axis=1), np.arange(y, y + h) % self.h, axis=2)
+        if self.colors: self._worldmap = (region[0:3] | region[3]).transpose((1, 2, 0))
         else:
-            pixels = (self.world[0] | self.world[1] | self.world[2] | self.world[3]).cpu().numpy()
+            pixels = region[0] | region[1] | region[2] | region[3]
             self._worldmap = np.stack((pixels, pixels, pixels), axis=-1)
+
+    def close(self):
+        self.storage.close()
+
+
+def collisions(world):
+    """
+    @return: (torch.BoolTensor, 2xWxH) cells where the particles of directions i and i+2 collide
+    """
+    collisions = torch.zeros((2,) + world.shape[1:], dtype=torch.bool, device=world.device)
+    for i in (0, 1):
+        # we check for opposing directions
+        collisions[i] = world[i] & world[i+2]
+
+        # we check if it is not a 3 or 4 particles collision
+        collisions[i] = collisions[i] & ~(world[i+1] | world[((i+3) % 4)])
+    return collisions
+
+
+def collisions_numpy(world):
+    """
+    collisions on a np.ndarray, computed in place
+    """
+    collisions = np.empty((2,) + world.shape[1:], dtype=np.bool_)
+    others = np.empty(world.shape[1:], dtype=np.bool_)
+    for i in (0, 1):
+        np.logical_and(world[i], world[i+2], out=collisions[i])
+        np.logical_or(world[i+1], world[(i+3) % 4], out=others)
+        collisions[i] &= ~others
+    return collisions
+
+
+def roll_into(dst, src, shifts):
+    """
+    Writes src rolled by shifts = (dx, dy) on its two first dimensions into dst, i.e. dst[x, y] = src[x-dx, y-dy]
+    on the torus. It is done with at most 4 block copies, without temporary tensor.
+    """
+    for src_x, dst_x in cyclic_blocks(shifts[0], src.shape[0]):
+        for src_y, dst_y in cyclic_blocks(shifts[1], src.shape[1]):
+            dst[dst_x, dst_y] = src[src_x, src_y]
+
+
+def cyclic_blocks(shift, n):
+    """
+    Returns the (source, destination) slices that make a cyclic shift of length n
+    """
+    shift %= n
+    if shift == 0:
+        return [(slice(0, n), slice(0, n))]
+    return [(slice(0, n - shift), slice(shift, n)), (slice(n - shift, n), slice(0, shift))]
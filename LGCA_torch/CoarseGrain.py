@@ -0,0 +1,124 @@
+import glob
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+
+FIELDS = ("density", "jx", "jy")
+
+
+class CoarseGrain:
+    """
+        Hydrodynamic fields of an LGCAAuto averaged over blocks of block x block cells: the density (number of
+        particles per cell) and the two components of the momentum (jx = particles moving to +x - particles moving to
+        -x, jy likewise, per cell). They are computed on the device every k steps, optionally averaged over the last
+        steps before, and appended to a chunked array file: only the blocks are transferred to the host.
+
+        The file is a directory containing meta.json, and for each chunk of frames fields_<i>.npy (T x 3 x W/block x
+        H/block, float32) and steps_<i>.npy. It can be read back with load_fields.
+
+        It is attached to the automaton like the Tracers (auto.coarse_grain = CoarseGrain(auto, path)), which updates
+        it after each step.
+    """
+
+    def __init__(self, auto, path, block=16, every=10, average=1, chunk=64, append=False):
+        """
+            @param auto: (LGCAAuto) automaton whose world is coarse-grained, not on the numpy backend
+            @param path: (str) directory of the chunked array file
+            @param block: (int) side of the blocks, the blocks of the border are smaller if it does not divide the size
+            @param every: (int) number of steps between 2 frames
+            @param average: (int) number of steps averaged in a frame, the last ones up to its step (at most every)
+            @param chunk: (int) number of frames of a chunk
+            @param append: (bool) if True, the frames are appended to the chunks already in path (recorded with the
+                           same block and shape), their steps following the last one recorded, else the chunks already
+                           in path are removed
+        """
+        if auto.policy.numpy:
+            raise ValueError("CoarseGrain has no numpy backend, use an ExecutionPolicy with torch")
+        self.auto = auto
+        self.path = path
+        self.block = block
+        self.every = every
+        self.average = min(max(average, 1), every)
+        self.chunk = chunk
+        self.steps = 0
+        self.chunks = 0
+        self.frames, self.frame_steps = [], []
+        self.sum = None
+        self.count = 0
+
+        os.makedirs(path, exist_ok=True)
+        shape = [len(FIELDS), -(-auto.w // block), -(-auto.h // block)]
+        chunks = sorted(glob.glob(os.path.join(path, "fields_*.npy")))
+        if append and chunks:
+            with open(os.path.join(path, "meta.json")) as f:
+                meta = json.load(f)
+            if meta["block"] != block or meta["shape"] != shape:
+                raise ValueError(f"{path} holds fields of block {meta['block']} and shape {meta['shape']}, not {block} and {shape}")
+            self.chunks = len(chunks)
+            self.steps = int(np.load(steps_path(chunks[-1]))[-1])
+        else:
+            for chunk in chunks:
+                os.remove(chunk)
+                os.remove(steps_path(chunk))
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump({"fields": FIELDS, "block": block, "every": every, "average": self.average, "shape": shape, "dtype": "float32"}, f)
+
+    def fields(self, world):
+        """
+        @return: (torch.FloatTensor, 3 x W/block x H/block) density, jx and jy averaged over the blocks
+        """
+        n = world.float()
+        # the channels 0 and 2 move to -x and +x, the channels 1 and 3 to -y and +y (see LGCAAuto.SHIFTS)
+        cells = torch.stack((n.sum(dim=0), n[2] - n[0], n[3] - n[1]))
+        return F.avg_pool2d(cells.unsqueeze(0), self.block, ceil_mode=True).squeeze(0)
+
+    def update(self):
+        """
+        Called by the automaton at the end of each step, its world is only read on the steps that are recorded
+        """
+        self.steps += 1
+        if self.steps % self.every > self.every - self.average or self.steps % self.every == 0:
+            fields = self.fields(self.auto.world)
+            self.sum = fields if self.sum is None else self.sum + fields
+            self.count += 1
+        if self.steps % self.every == 0:
+            self.frames.append(self.sum / self.count)
+            self.frame_steps.append(self.steps)
+            self.sum, self.count = None, 0
+            if len(self.frames) == self.chunk:
+                self.flush()
+
+    def flush(self):
+        if not self.frames:
+            return
+        np.save(os.path.join(self.path, f"fields_{self.chunks:05d}.npy"), torch.stack(self.frames).cpu().numpy())
+        np.save(os.path.join(self.path, f"steps_{self.chunks:05d}.npy"), np.asarray(self.frame_steps, dtype=np.int64))
+        self.chunks += 1
+        self.frames, self.frame_steps = [], []
+
+    def close(self):
+        self.flush()
+
+
+def load_fields(path):
+    """
+    Reads a chunked array file written by CoarseGrain
+    @return: (steps (T,), dict field -> (T x W/block x H/block) np.ndarray)
+    """
+    with open(os.path.join(path, "meta.json")) as f:
+        meta = json.load(f)
+    chunks = sorted(glob.glob(os.path.join(path, "fields_*.npy")))
+    if not chunks:
+        return np.zeros(0, dtype=np.int64), {field: np.zeros([0] + meta["shape"][1:], dtype=np.float32) for field in meta["fields"]}
+    fields = np.concatenate([np.load(chunk) for chunk in chunks])
+    steps = np.concatenate([np.load(steps_path(chunk)) for chunk in chunks])
+    return steps, {field: fields[:, i] for i, field in enumerate(meta["fields"])}
+
+
+def steps_path(chunk):
+    # steps_<i>.npy of the chunk fields_<i>.npy
+    directory, name = os.path.split(chunk)
+    return os.path.join(directory, name.replace("fields_", "steps_"))
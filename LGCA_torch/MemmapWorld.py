@@ -0,0 +1,126 @@
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+try:
+    import torch
+except ImportError:  # the memory-mapped worlds need torch, imported without it by Automaton
+    torch = None
+
+
+class MemmapWorld:
+    """
+        World larger than the memory, stored in two memory-mapped files of a directory: the current state and the
+        next one, swapped after each step. A step streams the world by bands of rows along x: each band is read with a
+        halo of rows on both sides (wrapping around the torus), computed, and written to the next file. A thread reads
+        the next band and writes the previous one while a band is computed, so the peak memory is a few bands and the
+        throughput stays close to the sequential bandwidth of the disk.
+
+        The directory keeps the state between runs (meta.json): a run on an existing directory resumes from it.
+    """
+
+    def __init__(self, directory, shape, dtype=np.bool_, axis=0, band=256, halo=1):
+        """
+            @param directory: (str) directory of the files, created if needed
+            @param shape: (tuple) shape of the world, e.g. (W,H) or (4,W,H)
+            @param axis: (int) axis of x in the shape, along which the world is cut in bands
+            @param band: (int) number of rows of x of a band
+            @param halo: (int) number of rows read on each side of a band, the radius of the rule
+        """
+        self.directory = directory
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.axis = axis
+        self.band = band
+        self.halo = halo
+        os.makedirs(directory, exist_ok=True)
+
+        meta = self.read_meta()
+        self.created = meta is None or tuple(meta["shape"]) != self.shape or meta["dtype"] != self.dtype.str
+        if self.created:
+            self.current_file, self.steps = 0, 0
+        else:
+            self.current_file, self.steps = meta["current"], meta["steps"]
+        mode = "w+" if self.created else "r+"
+        # files are created sparse, the disk space is only used once written
+        self.files = [np.memmap(self.path(i), dtype=self.dtype, mode=mode, shape=self.shape) for i in (0, 1)]
+        self.pool = ThreadPoolExecutor(max_workers=2)
+        if self.created:
+            self.write_meta()
+
+    def path(self, i):
+        return os.path.join(self.directory, f"world_{i}.dat")
+
+    def read_meta(self):
+        path = os.path.join(self.directory, "meta.json")
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def write_meta(self):
+        with open(os.path.join(self.directory, "meta.json"), "w") as f:
+            json.dump({"shape": self.shape, "dtype": self.dtype.str, "current": self.current_file, "steps": self.steps}, f)
+
+    @property
+    def current(self):
+        return self.files[self.current_file]
+
+    @property
+    def length(self):
+        # number of rows along x
+        return self.shape[self.axis]
+
+    def rows(self, x0, x1):
+        # index of the rows [x0, x1) along the axis of x
+        return (slice(None),) * self.axis + (slice(x0, x1),)
+
+    def read(self, x0, x1):
+        """
+        @return: (np.ndarray) copy of the rows [x0, x1) of the current world, wrapping around the torus
+        """
+        return np.asarray(np.take(self.current, np.arange(x0, x1) % self.length, axis=self.axis))
+
+    def fill(self, function):
+        """
+        Writes the world band by band
+        @param function: function(x0, x1) -> (np.ndarray or torch.Tensor) rows [x0, x1) of the world
+        """
+        for x0 in range(0, self.length, self.band):
+            x1 = min(x0 + self.band, self.length)
+            self.current[self.rows(x0, x1)] = np.asarray(function(x0, x1))
+        self.current.flush()
+
+    def step(self, function):
+        """
+        Computes the next world band by band, and swaps the files
+        @param function: function(band, x0, x1) -> band of the next world, band being the rows [x0 - halo, x1 + halo)
+                         of the current world (torch.Tensor on the cpu), and the result its rows [x0, x1)
+        """
+        following = self.files[1 - self.current_file]
+        starts = list(range(0, self.length, self.band))
+        reading = self.pool.submit(self.read, -self.halo, min(self.band, self.length) + self.halo)
+        writing = None
+        for i, x0 in enumerate(starts):
+            x1 = min(x0 + self.band, self.length)
+            band = reading.result()
+            if i + 1 < len(starts):
+                reading = self.pool.submit(self.read, starts[i + 1] - self.halo, min(starts[i + 1] + self.band, self.length) + self.halo)
+            result = function(torch.from_numpy(band), x0, x1).cpu().numpy()
+            if writing is not None:
+                writing.result()
+            writing = self.pool.submit(following.__setitem__, self.rows(x0, x1), result)
+        writing.result()
+        following.flush()
+
+        self.current_file = 1 - self.current_file
+        self.steps += 1
+        self.write_meta()
+
+    def close(self):
+        self.pool.shutdown()
+        for file in self.files:
+            file.flush()
+        self.files = []
@@ -0,0 +1,129 @@
+import struct
+
+import numpy as np
+import torch
+
+MAGIC = b"LGCATRC1"
+# magic, number of tracers, W, H
+HEADER = struct.Struct("<8sqqq")
+
+
+class Tracers:
+    """
+        Identity of a subset of the particles of an LGCAAuto, to measure diffusion and mixing. The tracers are kept
+        as (direction, x, y) arrays on the device, and follow the rules of the automaton by only looking at their own
+        cell: they turn by a quarter (direction d -> d+1) in a head-on collision, and move, or bounce back (stay in
+        their cell, reversed) on the reflecting links of the walls and obstacles. The particles being conserved, a
+        tracer is never lost.
+        Each step costs O(tracers) on top of the automaton.
+
+        The trajectories are recorded every k steps in a binary file, with unwrapped positions (the displacements
+        across the borders of the torus are not folded back), see load_trajectories.
+        It is attached with auto.tracers = Tracers(auto, ...), the automaton updates it at each step.
+    """
+
+    def __init__(self, auto, tracers, path=None, every=1, buffer_size=256):
+        """
+            @param auto: (LGCAAuto) automaton of the tracers, not on the numpy backend
+            @param tracers: (torch.LongTensor, Nx3) (direction, x, y) of particles of the world, see Tracers.sample
+            @param path: (str) binary file of the trajectories, None to only keep the current positions
+            @param every: (int) number of steps between 2 recordings
+            @param buffer_size: (int) number of recordings kept on the device before they are written
+        """
+        if auto.policy.numpy:
+            raise ValueError("Tracers has no numpy backend, use an ExecutionPolicy with torch")
+        self.auto = auto
+        self.every = every
+        self.steps = 0
+        tracers = tracers.to(auto.device, torch.long)
+        self.direction, self.x, self.y = tracers[:, 0].clone(), tracers[:, 1].clone(), tracers[:, 2].clone()
+        # unwrapped positions
+        self.ux, self.uy = self.x.clone(), self.y.clone()
+        self.dx = torch.tensor([dx for dx, _ in auto.SHIFTS], device=auto.device)
+        self.dy = torch.tensor([dy for _, dy in auto.SHIFTS], device=auto.device)
+
+        self.file = None
+        if path is not None:
+            self.file = open(path, "wb")
+            self.file.write(HEADER.pack(MAGIC, len(tracers), auto.w, auto.h))
+        self.buffer = torch.zeros((buffer_size, 3, len(tracers)), dtype=torch.int32, device=auto.device)
+        self.buffer_steps = []
+        self.record()
+
+    @staticmethod
+    def sample(auto, n, seed=0):
+        """
+        @return: (torch.LongTensor, nx3) (direction, x, y) of n random particles of the world
+        """
+        particles = auto.world.nonzero()
+        generator = torch.Generator().manual_seed(seed)
+        return particles[torch.randperm(len(particles), generator=generator)[:n].to(particles.device)]
+
+    def update(self, world):
+        """
+        Moves the tracers by one step, must be called by the automaton with its world before the collision
+        """
+        d = self.direction
+        cell = world[:, self.x, self.y]  # (4, N) particles of the cell of each tracer
+
+        # head-on collision of the axis of the tracer, as in collisions
+        i = d % 2
+        channel = lambda c: cell.gather(0, c.view(1, -1)).squeeze(0)
+        collide = channel(i) & channel(i + 2) & ~(channel(i + 1) | channel((i + 3) % 4))
+        d = torch.where(collide, (d + 1) % 4, d)
+
+        # transport, with the bounces of LGCAAuto.take_reflected: a tracer on a reflecting link stays in its cell,
+        # reversed
+        reflected = self.auto.blocked[d, self.x, self.y]
+        dx, dy = torch.where(reflected, 0, self.dx[d]), torch.where(reflected, 0, self.dy[d])
+        self.x, self.y = (self.x + dx) % self.auto.w, (self.y + dy) % self.auto.h
+        self.ux, self.uy = self.ux + dx, self.uy + dy
+        self.direction = torch.where(reflected, (d + 2) % 4, d)
+
+        self.steps += 1
+        if self.steps % self.every == 0:
+            self.record()
+
+    def record(self):
+        if self.file is None:
+            return
+        self.buffer[len(self.buffer_steps)] = torch.stack((self.direction, self.ux, self.uy)).to(torch.int32)
+        self.buffer_steps.append(self.steps)
+        if len(self.buffer_steps) == self.buffer.shape[0]:
+            self.flush()
+
+    def flush(self):
+        """
+        Writes the buffered recordings: for each one, its step (int64) then the directions, x and y (int32)
+        """
+        if self.file is None or not self.buffer_steps:
+            return
+        frames = self.buffer[:len(self.buffer_steps)].cpu().numpy()
+        for step, frame in zip(self.buffer_steps, frames):
+            self.file.write(struct.pack("<q", step))
+            self.file.write(frame.tobytes())
+        self.buffer_steps = []
+
+    def close(self):
+        if self.file is not None:
+            self.flush()
+            self.file.close()
+            self.file = None
+
+
+def load_trajectories(path):
+    """
+    Reads a file of trajectories written by Tracers
+    @return: dict with "size": (W,H), "step": (T,) int64, "direction", "x", "y": (T, N) int32, the positions being
+             unwrapped (x % W, y % H on the torus)
+    """
+    with open(path, "rb") as f:
+        magic, n, W, H = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a file of trajectories")
+        data = np.frombuffer(f.read(), dtype=np.uint8)
+    frame = 8 + 3 * 4 * n
+    data = data[:len(data) // frame * frame].reshape(-1, frame)
+    steps = data[:, :8].copy().view(np.int64).reshape(-1)
+    values = data[:, 8:].copy().view(np.int32).reshape(-1, 3, n)
+    return {"size": (W, H), "step": steps, "direction": values[:, 0], "x": values[:, 1], "y": values[:, 2]}
@@ -0,0 +1,113 @@
+"""
+Conformance of the alternative backends of the LGCA with the reference implementation (the eager LGCAAuto on the
+cpu, with the transport done at each step).
+
+The golden trajectories (hash of the world at each step of each scenario) are recorded once with the reference, then
+every backend of BACKENDS is replayed against them: the first step and the region where it diverges are reported,
+and both runs are timed. A backend that does not support a scenario raises a ValueError when it is built, and is
+reported as skipped. The golden trajectories of today's reference are kept in golden.json, next to this script: they
+are only recorded again on purpose, when the reference semantics change. A new backend is added to BACKENDS as a
+function(size, initial world, obstacles, walls) -> automaton.
+
+Usage: python conformance.py record [--golden golden.json]
+       python conformance.py check [--backend lazy_transport] [--golden golden.json]
+"""
+import argparse
+import atexit
+import os
+import shutil
+import tempfile
+
+import torch
+
+from Automaton import LGCAAuto, MemmapLGCAAuto
+from ExecutionPolicy import ExecutionPolicy
+from Golden import Golden, print_reports
+
+GOLDEN = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden.json")
+
+# name -> (size, density of each channel, seed, walls, radius of a central cylinder obstacle (0 for none), steps)
+SCENARIOS = {
+    "walls_128": ((128, 128), 0.2, 0, True, 0, 100),
+    "torus_200x90": ((200, 90), 0.3, 1, False, 0, 100),
+    "cylinder_160x100": ((160, 100), 0.25, 2, True, 12, 100),
+    "cylinder_torus_120x80": ((120, 80), 0.3, 3, False, 10, 100),
+}
+
+
+def initial_world(size, density, seed):
+    return torch.rand((4,) + size, generator=torch.Generator().manual_seed(seed)) < density
+
+
+def cylinder(size, radius):
+    if radius == 0:
+        return None
+    return (torch.arange(size[0]).view(-1, 1) - size[0] // 2) ** 2 + (torch.arange(size[1]).view(1, -1) - size[1] // 2) ** 2 < radius ** 2
+
+
+def memmap(size, init, obstacles, walls):
+    if obstacles is not None:
+        raise ValueError("MemmapLGCAAuto has no obstacles")
+    directory = tempfile.mkdtemp(prefix="conformance_")
+    atexit.register(shutil.rmtree, directory, ignore_errors=True)
+    return MemmapLGCAAuto(size, directory, lambda x0, x1: init[:, x0:x1], walls=walls, band=48, policy=ExecutionPolicy("cpu", verbose=False))
+
+
+BACKENDS = {
+    "lazy_transport": lambda size, init, obstacles, walls: LGCAAuto(size, init, lazy_transport=True, obstacles=obstacles, walls=walls, policy=ExecutionPolicy("cpu", verbose=False)),
+    "compile": lambda size, init, obstacles, walls: LGCAAuto(size, init, obstacles=obstacles, walls=walls, policy=ExecutionPolicy("cpu", backend="compile", verbose=False)),
+    "memmap": memmap,
+    "numpy": lambda size, init, obstacles, walls: LGCAAuto(size, init, obstacles=obstacles, walls=walls, policy=ExecutionPolicy(backend="numpy", verbose=False)),
+}
+if torch.cuda.is_available():
+    BACKENDS["cuda"] = lambda size, init, obstacles, walls: LGCAAuto(size, init, obstacles=obstacles, walls=walls, policy=ExecutionPolicy("cuda", verbose=False))
+
+
+def reference(size, init, obstacles, walls):
+    return LGCAAuto(size, init, obstacles=obstacles, walls=walls, policy=ExecutionPolicy("cpu", verbose=False))
+
+
+def scenario_factory(builder, name):
+    size, density, seed, walls, radius, _ = SCENARIOS[name]
+    return lambda: builder(size, initial_world(size, density, seed), cylinder(size, radius), walls)
+
+
+def record(golden):
+    for name, scenario in SCENARIOS.items():
+        golden.record(name, scenario_factory(reference, name), scenario[-1])
+        print(f"{name}: {scenario[-1]} steps recorded")
+
+
+def check(golden, backends):
+    reports = []
+    for name in SCENARIOS:
+        if name not in golden.trajectories:
+            print(f"{name} has no golden trajectory in {golden.path}, record it first")
+            continue
+        for backend in backends:
+            try:
+                report = golden.check(name, scenario_factory(BACKENDS[backend], name), scenario_factory(reference, name),
+                                      cells=lambda difference: difference.any(dim=0))
+            except ValueError as e:
+                print(f"{name} with {backend} skipped: {e}")
+                report = "skipped"
+            except Exception as e:
+                print(f"{name} with {backend} failed: {type(e).__name__}: {e}")
+                report = None
+            reports.append((name, backend, report))
+    print_reports(reports)
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Conformance of the backends with the reference implementation")
+    parser.add_argument("command", choices=("record", "check"))
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="backend to check, all by default")
+    parser.add_argument("--golden", default=GOLDEN, help="JSON file of the golden trajectories")
+    args = parser.parse_args()
+
+    golden = Golden(args.golden)
+    if args.command == "record":
+        record(golden)
+    else:
+        check(golden, args.backend or list(BACKENDS))
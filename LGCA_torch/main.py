@@ -4,6 +4,9 @@ import torch
 
 from Camera import Camera
 from Automaton import *
+from CoarseGrain import CoarseGrain
+from ExecutionPolicy import ExecutionPolicy
+from Tracers import Tracers
 import cv2
 import time
 
@@ -27,7 +30,23 @@ nb_part = W*H
 init[np.random.randint(0, 4, nb_part), np.random.randint(0, W/2, nb_part), np.random.randint(0, H/2, nb_part)] = True
 
 
-auto = LGCAAuto((W, H), init_world=init, colors=True)
+# Obstacles (torch.BoolTensor, WxH) on which the particles bounce back as on the walls of the border, e.g. a cylinder:
+# obstacles = (torch.arange(W).view(-1, 1) - W // 2) ** 2 + (torch.arange(H).view(1, -1) - H // 2) ** 2 < (H // 8) ** 2
+obstacles = None
+
+# Device, threads and backend of the automaton. The fastest policy on this machine can be measured once (then read
+# from ./execution_policies.json) with:
+# policy = ExecutionPolicy.autotune(lambda policy: LGCAAuto((W, H), init, obstacles=obstacles, policy=policy), key=("LGCAAuto", W, H))
+policy = ExecutionPolicy()
+# policy = ExecutionPolicy(backend="numpy")  # numpy arrays on the cpu (faster start for small worlds, no Tracers nor CoarseGrain)
+auto = LGCAAuto((W, H), init_world=init, colors=True, obstacles=obstacles, policy=policy)
+# auto = MemmapLGCAAuto((100000, 100000), './world', policy=policy)  # for worlds larger than the memory, stored on the disk (random, or resumed from ./world), only its top left corner is drawn
+# Tracers following some particles, whose trajectories are written in ./tracers.bin (see load_trajectories)
+tracers = None  # Tracers(auto, Tracers.sample(auto, 1000), './tracers.bin')
+auto.tracers = tracers
+# CoarseGrain recording the density and momentum fields in ./fields (see load_fields)
+coarse_grain = None  # CoarseGrain(auto, './fields', block=16, every=10)
+auto.coarse_grain = coarse_grain
 
 updating = True
 recording = False
@@ -99,4 +118,8 @@ while running:
 
 pygame.quit()
 if (not launch_video):  # if video is launched
-    video_out.release()
\ No newline at end of file
+    video_out.release()
+if tracers is not None:
+    tracers.close()
+if coarse_grain is not None:
+    coarse_grain.close()
\ No newline at end of file
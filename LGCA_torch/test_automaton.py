@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+import torch
+
+from Automaton import LGCAAuto
+from ExecutionPolicy import ExecutionPolicy
+from Tracers import Tracers
+
+W, H = 40, 30
+
+
+def disk(cx, cy, r):
+    x, y = torch.meshgrid(torch.arange(W), torch.arange(H), indexing="ij")
+    return (x - cx) ** 2 + (y - cy) ** 2 <= r ** 2
+
+
+def make(walls, lazy_transport=False, backend=None):
+    init = torch.rand((4, W, H), generator=torch.Generator().manual_seed(0)) < 0.3
+    # an obstacle crossing the border of the torus, and a thin wall one cell wide
+    obstacles = disk(3, 15, 5)
+    obstacles[25, 5:20] = True
+    policy = ExecutionPolicy("cpu", backend=backend, verbose=False)
+    if backend == "numpy":
+        init, obstacles = init.numpy(), obstacles.numpy()
+    return LGCAAuto((W, H), init_world=init, obstacles=obstacles, walls=walls, lazy_transport=lazy_transport, policy=policy)
+
+
+@pytest.mark.parametrize("walls", [False, True])
+@pytest.mark.parametrize("lazy_transport, backend", [(False, None), (True, None), (False, "numpy"), (True, "numpy")])
+def test_bounce_back_conserves_particles(walls, lazy_transport, backend):
+    auto = make(walls, lazy_transport, backend)
+    obstacles = np.asarray(auto.obstacles)
+    particles = int(auto.world.sum())
+    for _ in range(100):
+        auto.step()
+        world = np.asarray(auto.world)
+        assert int(world.sum()) == particles
+        assert not world[:, obstacles].any()
+
+
+def test_tracers_follow_their_particles():
+    auto = make(walls=False)
+    auto.tracers = Tracers(auto, Tracers.sample(auto, 200))
+    for _ in range(50):
+        auto.step()
+        tracers = auto.tracers
+        assert auto.world[tracers.direction, tracers.x, tracers.y].all()
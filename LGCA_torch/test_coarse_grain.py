@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+import torch
+
+from Automaton import LGCAAuto
+from CoarseGrain import CoarseGrain, load_fields
+from ExecutionPolicy import ExecutionPolicy
+
+
+def run(path, steps, **kwargs):
+    init = torch.rand((4, 32, 24), generator=torch.Generator().manual_seed(0)) < 0.2
+    auto = LGCAAuto((32, 24), init_world=init, policy=ExecutionPolicy("cpu", verbose=False))
+    auto.coarse_grain = CoarseGrain(auto, path, block=8, every=2, chunk=3, **kwargs)
+    for _ in range(steps):
+        auto.step()
+    auto.coarse_grain.close()
+    return auto
+
+
+def test_fields_of_the_steps(tmp_path):
+    # the automaton updates the coarse grain itself, the last frame being its world after the last step
+    auto = run(str(tmp_path), 14)
+    steps, fields = load_fields(str(tmp_path))
+    assert steps.tolist() == [2, 4, 6, 8, 10, 12, 14]
+    assert fields["density"].shape == (7, 4, 3)
+    density = auto.world.float().sum(dim=0).view(4, 8, 3, 8).mean(dim=(1, 3))
+    assert np.allclose(fields["density"][-1], density.numpy())
+
+
+def test_rerun_replaces_the_chunks(tmp_path):
+    # a shorter second run must not leave the chunks of the first one behind
+    run(str(tmp_path), 20)
+    run(str(tmp_path), 6)
+    steps, _ = load_fields(str(tmp_path))
+    assert steps.tolist() == [2, 4, 6]
+
+
+def test_append(tmp_path):
+    run(str(tmp_path), 8)
+    run(str(tmp_path), 6, append=True)
+    steps, fields = load_fields(str(tmp_path))
+    assert steps.tolist() == [2, 4, 6, 8, 10, 12, 14]
+    assert len(fields["jx"]) == 7
+    with pytest.raises(ValueError):
+        init = torch.zeros((4, 16, 16), dtype=torch.bool)
+        CoarseGrain(LGCAAuto((16, 16), init_world=init, policy=ExecutionPolicy("cpu", verbose=False)), str(tmp_path), block=8, append=True)